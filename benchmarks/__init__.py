@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks für PRO ANALYZER (offline, mit lokalem Ollama-Ersatz)."""
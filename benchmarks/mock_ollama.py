@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lokaler Ersatz für einen Ollama-Server (ohne GPU, ohne Netzwerk).
+
+Beantwortet /api/generate (gestreamt und blockierend), /api/embed,
+/api/tags und /api/ps. Einstellbar sind die Wartezeit bis zum ersten Chunk
+(Laden + Prefill), Anzahl und Größe der Chunks, der Abstand zwischen zwei
+Chunks und eine Fehlerquote (HTTP 500). Damit lässt sich der Eigenaufwand
+der App getrennt von der Modellzeit messen. Embeddings sind Feature-Hashing
+über die Wörter: deterministisch, und Texte mit gemeinsamen Wörtern liegen
+nah beieinander.
+
+Eigenständig starten:
+    python -m benchmarks.mock_ollama --port 11434 --latency 0.5
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # abgebrochene Verbindungen (Abbrechen, Keep-Alive) sind hier normal
+
+
+@dataclass
+class MockSettings:
+    model: str = "qwen2.5vl:7b"
+    latency: float = 0.0  # Sekunden bis zum ersten Chunk (Laden + Prefill)
+    chunks: int = 20  # Anzahl gestreamter Chunks (≈ Tokens)
+    chunk_size: int = 8  # Zeichen pro Chunk
+    chunk_interval: float = 0.0  # Sekunden zwischen zwei Chunks
+    failure_rate: float = 0.0  # Anteil der Anfragen, die mit HTTP 500 scheitern
+    embed_dim: int = 256  # Dimensionen der /api/embed-Vektoren
+    seed: int = 0
+
+
+def hashing_embedding(text: str, dim: int) -> list:
+    """Wörter per Hash auf dim Dimensionen verteilt (mit Vorzeichen), normiert."""
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        h = int.from_bytes(
+            hashlib.blake2b(word.encode(), digest_size=8).digest(), "big"
+        )
+        vector[h % dim] += 1.0 if h >> 63 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class MockOllamaServer:
+    """Threading-HTTP-Server; port=0 wählt einen freien Port (siehe url)."""
+
+    def __init__(self, settings: MockSettings = None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self._random = random.Random(self.settings.seed)
+        self._random_lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self._server = _QuietHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _should_fail(self) -> bool:
+        with self._random_lock:
+            self.requests += 1
+            failed = self._random.random() < self.settings.failure_rate
+            self.failures += failed
+            return failed
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Header und Body gehen getrennt raus; ohne TCP_NODELAY kostet
+            # Nagle + Delayed ACK sonst ~40 ms pro blockierender Antwort
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, obj, status=200):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                model = {"name": server.settings.model, "model": server.settings.model}
+                if self.path == "/api/tags" or self.path == "/api/ps":
+                    self._send_json({"models": [model]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                settings = server.settings
+                if self.path == "/api/embed":
+                    inputs = payload.get("input") or []
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    self._send_json(
+                        {
+                            "model": payload.get("model"),
+                            "embeddings": [
+                                hashing_embedding(text, settings.embed_dim)
+                                for text in inputs
+                            ],
+                        }
+                    )
+                    return
+                if self.path != "/api/generate":
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+                start = time.perf_counter_ns()
+                if not payload.get("prompt"):
+                    # Vorwärmen: nur Modell "laden"
+                    self._send_json({"model": settings.model, "done": True})
+                    return
+                time.sleep(settings.latency)
+                if server._should_fail():
+                    self._send_json({"error": "mock failure"}, status=500)
+                    return
+                prefill_done = time.perf_counter_ns()
+                text = ("x" * (settings.chunk_size - 1) + " ") * settings.chunks
+                pieces = [
+                    text[i : i + settings.chunk_size]
+                    for i in range(0, len(text), settings.chunk_size)
+                ]
+
+                def stats():
+                    now = time.perf_counter_ns()
+                    return {
+                        "model": settings.model,
+                        "done": True,
+                        "total_duration": now - start,
+                        "load_duration": 0,
+                        "prompt_eval_count": 1 + len(payload.get("images") or []) * 256,
+                        "prompt_eval_duration": prefill_done - start,
+                        "eval_count": len(pieces),
+                        "eval_duration": max(now - prefill_done, 1),
+                    }
+
+                if not payload.get("stream", True):
+                    time.sleep(settings.chunk_interval * len(pieces))
+                    self._send_json({"response": text, **stats()})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for piece in pieces:
+                        self._write_chunk(
+                            {"model": settings.model, "response": piece, "done": False}
+                        )
+                        if settings.chunk_interval:
+                            time.sleep(settings.chunk_interval)
+                    self._write_chunk({"response": "", **stats()})
+                    self.wfile.write(b"0\r\n\r\n")
+                except OSError:
+                    pass  # Client hat abgebrochen
+
+            def _write_chunk(self, obj):
+                line = (json.dumps(obj) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-ollama", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default=MockSettings.model)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunks", type=int, default=MockSettings.chunks)
+    parser.add_argument("--chunk-size", type=int, default=MockSettings.chunk_size)
+    parser.add_argument("--chunk-interval", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    settings = MockSettings(
+        model=args.model,
+        latency=args.latency,
+        chunks=args.chunks,
+        chunk_size=args.chunk_size,
+        chunk_interval=args.chunk_interval,
+        failure_rate=args.failure_rate,
+    )
+    server = MockOllamaServer(settings, args.host, args.port).start()
+    print(f"Mock-Ollama läuft unter {server.url} (Strg+C beendet)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
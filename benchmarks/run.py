@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark-Suite für PRO ANALYZER: misst den Eigenaufwand der App getrennt
+von der Modellzeit. Läuft ohne GPU und ohne Netzwerk gegen einen lokalen
+MockOllamaServer; Datenbank und Reports landen in einem Temp-Verzeichnis.
+
+    python -m benchmarks.run                        # alle Benchmarks
+    python -m benchmarks.run --quick                # wenige Wiederholungen (CI)
+    python -m benchmarks.run --only pdf e2e         # nur ausgewählte Gruppen
+    python -m benchmarks.run --only startup         # Import- und Startzeiten
+    python -m benchmarks.run --only semantic        # Vektorsuche und Einbetten
+    python -m benchmarks.run --compare alt.json     # Median gegen frühere Messung
+
+Ergebnis: JSON mit Umgebung und je Benchmark min/median/mean/p95 in ms
+(Standard: benchmarks/results/bench-<zeit>.json).
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from PIL import Image as PILImage
+
+from benchmarks.mock_ollama import MockOllamaServer, MockSettings
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+IMAGE_SIZES = {
+    "vga": (640, 480),
+    "fullhd": (1920, 1080),
+    "12mp": (4000, 3000),
+}
+HISTORY_LENGTHS = (1, 10, 50)
+GROUPS = ("startup", "encode", "db", "pdf", "e2e", "semantic")
+VECTOR_INDEX_SIZES = (20_000, 200_000)
+VECTOR_DIM = 768  # wie nomic-embed-text
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Je Messung ein frischer Interpreter; "python" ist die Grundlinie ohne App
+STARTUP_COMMANDS = {
+    "python": "pass",
+    "import_launcher": "import pro_analyzer_app",
+    "import_core": "import pro_analyzer.core",
+    "build_ui": "from pro_analyzer.ui import build_ui; build_ui()",
+}
+
+
+def make_image(size, seed=0) -> PILImage.Image:
+    """Synthetisches Foto: glatter Verlauf plus Rauschen (komprimiert ähnlich wie echte Fotos)."""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    noise = rng.normal(0, 12, size=(height, width, 3))
+    return PILImage.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def jpeg_bytes(image: PILImage.Image, quality=90) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def summarize(name, params, samples, **extra) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "name": name,
+        "params": params,
+        "n": len(ms),
+        "min_ms": ms[0],
+        "median_ms": statistics.median(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p95_ms": ms[min(len(ms) - 1, int(round(0.95 * len(ms))) - 1)],
+        **extra,
+    }
+
+
+def measure(fn, repeat, setup=None, warmup=1):
+    """Führt fn repeat-mal aus (setup jeweils ungemessen davor); liefert Sekunden je Lauf."""
+    samples = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def load_app(mock_url, workdir):
+    """Importiert den Kern so, dass er nur den Mock und das Temp-Verzeichnis benutzt."""
+    os.environ["OLLAMA_BACKENDS"] = mock_url
+    os.chdir(workdir)  # DB_PATH ist relativ
+    from pro_analyzer import core
+
+    return core
+
+
+def bench_startup(repeat, workdir):
+    """Wanduhrzeit je Kommando in einem neuen Prozess (inkl. Interpreter-Start)."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (REPO_ROOT, env.get("PYTHONPATH")) if p
+    )
+    results = []
+    for name, code in STARTUP_COMMANDS.items():
+        samples = measure(
+            lambda: subprocess.run(
+                [sys.executable, "-c", code], cwd=workdir, env=env, check=True
+            ),
+            repeat,
+        )
+        results.append(summarize("startup", {"phase": name}, samples))
+    return results
+
+
+# --- Micro-Benchmarks ---
+
+
+def bench_encode(app, repeat):
+    from pro_analyzer import image_prep
+    from pro_analyzer.image_ingest import ingest_image
+
+    results = []
+    policy = image_prep.policy_for_model(app.MODEL_NAME, app.MODEL_IMAGE_POLICIES)
+    for label, size in IMAGE_SIZES.items():
+        image = make_image(size)
+        data = jpeg_bytes(image)
+        params = {"image": label, "width": size[0], "height": size[1]}
+        results.append(
+            summarize(
+                "image_to_base64",
+                params,
+                measure(lambda: app.image_to_base64(image), repeat),
+            )
+        )
+        results.append(
+            summarize(
+                "ingest_image",
+                params,
+                measure(lambda: ingest_image(data).base64, repeat),
+            )
+        )
+        ingested = ingest_image(data)
+        for action, profile in app.ACTION_ENCODE_PROFILES.items():
+            results.append(
+                summarize(
+                    "prepare_for_inference",
+                    {**params, "action": action},
+                    measure(
+                        lambda: image_prep.prepare_for_inference(
+                            ingested, policy, profile
+                        ).base64,
+                        repeat,
+                        # LRU leeren: gemessen wird die eigentliche Vorbereitung
+                        setup=image_prep._prepared_cache.clear,
+                    ),
+                )
+            )
+    return results
+
+
+def bench_db(app, repeat):
+    from pro_analyzer.session import ChatSession
+
+    results = []
+    inserts = 50
+    for label in ("vga", "fullhd"):
+        data = jpeg_bytes(make_image(IMAGE_SIZES[label]))
+        for mode in ("same_image", "unique_image"):
+            session = ChatSession()
+            counter = iter(range(10**9))
+
+            def write_batch():
+                for _ in range(inserts):
+                    payload = data
+                    if mode == "unique_image":
+                        payload = data + next(counter).to_bytes(8, "big")
+                    app.save_interaction(
+                        "Frage",
+                        "Antwort " * 50,
+                        payload,
+                        app.MODEL_NAME,
+                        meta={"bench": True},
+                        turn=session.next_turn(),
+                    )
+
+            submit = measure(write_batch, repeat)
+            committed = measure(lambda: (write_batch(), app.get_db().flush()), repeat)
+            params = {"image": label, "mode": mode, "inserts": inserts}
+            results.append(
+                summarize(
+                    "save_interaction.submit",
+                    params,
+                    [s / inserts for s in submit],
+                )
+            )
+            results.append(
+                summarize(
+                    "save_interaction.committed",
+                    params,
+                    [s / inserts for s in committed],
+                )
+            )
+    return results
+
+
+def bench_pdf(app, repeat):
+    from pro_analyzer.session import ChatSession
+
+    results = []
+    data = jpeg_bytes(make_image(IMAGE_SIZES["fullhd"]))
+    for length in HISTORY_LENGTHS:
+        session = ChatSession()
+        history = []
+        for i in range(length):
+            question = f"Frage {i}"
+            answer = f"Antwort {i}\n\n```\ncode {i}\n```\n" + "Text " * 80
+            turn = session.next_turn()
+            app.save_interaction(
+                question,
+                answer,
+                data,
+                app.MODEL_NAME,
+                turn=turn,
+                timings={"duration_ms": 1234.0, "outcome": "ok"},
+            )
+            history.append((question, answer))
+            session.chat_uids.append(turn.uid)
+        app.get_db().flush()
+        params = {"turns": length, "image": "fullhd"}
+        results.append(
+            summarize(
+                "generate_pdf_report.cold",
+                params,
+                measure(
+                    lambda: app.generate_pdf_report(history, session=session),
+                    repeat,
+                    setup=app.get_report_renderer()._cache.clear,
+                ),
+            )
+        )
+        results.append(
+            summarize(
+                "generate_pdf_report.warm",
+                params,
+                measure(
+                    lambda: app.generate_pdf_report(history, session=session), repeat
+                ),
+            )
+        )
+    return results
+
+
+# --- End-to-End ---
+
+E2E_SCENARIOS = {
+    # Modell antwortet sofort: gemessen wird fast nur der Eigenaufwand
+    "overhead": dict(settings=MockSettings(chunks=20), stream=True, cache=False),
+    "overhead_blocking": dict(
+        settings=MockSettings(chunks=20), stream=False, cache=False
+    ),
+    "cache_hit": dict(settings=MockSettings(chunks=20), stream=True, cache=True),
+    # realistischer Ablauf: 200 ms bis zum ersten Token, 50 Tokens à 5 ms
+    "model_latency": dict(
+        settings=MockSettings(latency=0.2, chunks=50, chunk_interval=0.005),
+        stream=True,
+        cache=False,
+    ),
+    "failures": dict(
+        settings=MockSettings(chunks=20, failure_rate=0.5, seed=1),
+        stream=True,
+        cache=False,
+    ),
+}
+
+
+def bench_e2e(app, server, repeat):
+    from pro_analyzer import ui
+    from pro_analyzer.image_ingest import ingest_image
+    from pro_analyzer.session import ChatSession
+
+    results = []
+    image = ingest_image(jpeg_bytes(make_image(IMAGE_SIZES["fullhd"])))
+    for name, scenario in E2E_SCENARIOS.items():
+        settings = scenario["settings"]
+        server.settings = settings
+        app.STREAM_RESPONSES = scenario["stream"]
+        app.RESPONSE_CACHE_ENABLED = scenario["cache"]
+        first_partial = []
+
+        def one_interaction():
+            session = ChatSession()
+            start = time.perf_counter()
+            seen_first = False
+            for chat, *_ in ui.create_interaction(
+                image, "Beschreibe das Bild.", [], session
+            ):
+                answer = chat[-1][1] if chat else ""
+                if not seen_first and answer.endswith(" ▌"):
+                    first_partial.append(time.perf_counter() - start)
+                    seen_first = True
+
+        samples = measure(one_interaction, repeat)
+        model_time = settings.latency + settings.chunks * settings.chunk_interval
+        extra = {"model_time_ms": model_time * 1000}
+        if first_partial:
+            extra["first_partial_median_ms"] = statistics.median(first_partial) * 1000
+        results.append(
+            summarize(
+                "create_interaction",
+                {"scenario": name, "stream": scenario["stream"]},
+                samples,
+                overhead_median_ms=statistics.median(samples) * 1000
+                - model_time * 1000,
+                **extra,
+            )
+        )
+        # Vom Fehler-Szenario ausgeschlossene Hosts sofort wieder aufnehmen
+        app.backend_pool.probe_all()
+
+    # Alle Quick Actions gleichzeitig (Fan-out) gegen eine einzelne Analyse
+    server.settings = E2E_SCENARIOS["model_latency"]["settings"]
+    app.STREAM_RESPONSES, app.RESPONSE_CACHE_ENABLED = True, False
+
+    def fan_out():
+        for _ in ui.create_all_interactions(image, [], ChatSession()):
+            pass
+
+    results.append(
+        summarize(
+            "create_all_interactions",
+            {"scenario": "model_latency", "actions": len(app.QUICK_ACTION_BUTTONS)},
+            measure(fan_out, repeat),
+        )
+    )
+    return results
+
+
+def clustered_vectors(n, centers, rng, noise=0.02):
+    """Synthetische Embeddings: Rauschen um vorgegebene Themen-Zentren."""
+    labels = rng.integers(0, len(centers), n)
+    noise = noise * rng.standard_normal((n, centers.shape[1])).astype(np.float32)
+    return centers[labels] + noise
+
+
+def bench_semantic(app, server, repeat):
+    from pro_analyzer.embeddings import EmbeddingIndexer, VectorIndex
+
+    results = []
+    rng = np.random.default_rng(0)
+    # Anfragen und Einträge stammen aus denselben Themen (sonst gibt es keine echten Nachbarn)
+    centers = rng.standard_normal((2000, VECTOR_DIM)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    for size in VECTOR_INDEX_SIZES:
+        index = VectorIndex()
+        for start in range(0, size, 50_000):
+            count = min(50_000, size - start)
+            index.add(
+                np.arange(start, start + count),
+                clustered_vectors(count, centers, rng),
+            )
+        queries = iter(clustered_vectors(1000, centers, rng))
+        exact = measure(lambda: index.search(next(queries), 10), repeat)
+        params = {"entries": size, "dim": VECTOR_DIM, "k": 10}
+        results.append(
+            summarize("vector_index.search", {**params, "mode": "exact"}, exact)
+        )
+        if size > index.exact_limit:
+            # Referenz für den Recall: exakte Suche, solange der IVF-Index fehlt
+            probe = clustered_vectors(20, centers, rng)
+            truth = [index.search(q, 10) for q in probe]
+            train = measure(index.train, 1, warmup=0)
+            found = [index.search(q, 10) for q in probe]
+            recall = statistics.fmean(
+                len({i for i, _ in a} & {i for i, _ in b}) / 10
+                for a, b in zip(found, truth)
+            )
+            results.append(
+                summarize(
+                    "vector_index.search",
+                    {**params, "mode": "ivf", "nprobe": index.nprobe},
+                    measure(lambda: index.search(next(queries), 10), repeat),
+                    recall_at_10=recall,
+                    train_ms=train[0] * 1000,
+                )
+            )
+
+    # Einbetten im Hintergrund: 32 Antworten je /api/embed-Aufruf (Mock)
+    server.settings = MockSettings(embed_dim=VECTOR_DIM)
+    words = "Rost Korrosion Riss Schild Text Auto Katze Rechnung Fenster Dach".split()
+    batch = 32
+    for _ in range(batch * (repeat + 1)):
+        app.save_interaction(
+            "Frage",
+            " ".join(rng.choice(words, 40)),
+            None,
+            app.MODEL_NAME,
+            timings={"outcome": "ok"},
+        )
+    app.get_db().flush()
+    indexer = EmbeddingIndexer(
+        app.get_db(), VectorIndex(), app.embed_texts, "bench", batch_size=batch
+    )
+    samples = measure(indexer.run_once, repeat)
+    results.append(
+        summarize(
+            "embedding_indexer.run_once",
+            {"batch": batch, "dim": VECTOR_DIM},
+            [s / batch for s in samples],
+        )
+    )
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(RESULTS_DIR),
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit or None,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path):
+    """Gibt den Median je Benchmark gegenüber einer früheren Messung aus."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {
+            (r["name"], json.dumps(r["params"], sort_keys=True)): r
+            for r in json.load(f)["results"]
+        }
+    print(f"\n{'Benchmark':<60} {'alt ms':>10} {'neu ms':>10} {'Faktor':>8}")
+    for result in results:
+        key = (result["name"], json.dumps(result["params"], sort_keys=True))
+        old = baseline.get(key)
+        if old is None:
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else 0
+        label = f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+        print(
+            f"{label[:60]:<60} {old['median_ms']:>10.2f} {result['median_ms']:>10.2f} {ratio:>7.2f}x"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline-Benchmarks für PRO ANALYZER (Mock-Ollama, keine GPU)."
+    )
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--quick", action="store_true", help="3 Wiederholungen")
+    parser.add_argument("--output", help="Pfad der JSON-Ergebnisdatei")
+    parser.add_argument("--compare", help="frühere JSON-Ergebnisdatei")
+    args = parser.parse_args(argv)
+    repeat = 3 if args.quick else args.repeat
+    output = os.path.abspath(
+        args.output
+        or os.path.join(
+            RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+    )
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    results = []
+    with MockOllamaServer() as server, tempfile.TemporaryDirectory() as workdir:
+        if "startup" in args.only:
+            results += bench_startup(repeat, workdir)
+        app = load_app(server.url, workdir)
+        app.backend_pool.probe_all()
+        if "encode" in args.only:
+            results += bench_encode(app, repeat)
+        if "db" in args.only:
+            results += bench_db(app, repeat)
+        if "pdf" in args.only:
+            results += bench_pdf(app, repeat)
+        if "e2e" in args.only:
+            results += bench_e2e(app, server, repeat)
+        if "semantic" in args.only:
+            results += bench_semantic(app, server, repeat)
+        app.get_db().close()
+        os.chdir(os.path.dirname(RESULTS_DIR))
+
+    for result in results:
+        print(
+            f"{result['name']:<32} {json.dumps(result['params'], sort_keys=True):<60} "
+            f"median {result['median_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms"
+        )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {"environment": environment(), "repeat": repeat, "results": results},
+            f,
+            indent=2,
+        )
+    print(f"\nErgebnisse: {output}")
+    if compare_path:
+        compare(results, compare_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+"""
+Gemeinsame Bausteine des PRO ANALYZER (Ollama-Anbindung, Speicherung, ...).
+core bündelt die Analyse ohne Oberfläche, ui die Gradio-App; gestartet wird
+über pro_analyzer_app.py.
+"""
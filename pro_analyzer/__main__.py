@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+"""
+Kommandozeile ohne Oberfläche (gleiche Pipeline wie UI und HTTP-API):
+
+    python -m pro_analyzer analyze bild.jpg -a ocr
+    python -m pro_analyzer analyze - -p "Was ist zu sehen?" --stream < bild.jpg
+    python -m pro_analyzer analyze *.jpg -a detail -a ocr --json > ergebnisse.ndjson
+    python -m pro_analyzer batch D:\\Inspektion\\2024-05 -a ocr --workers 4
+    python -m pro_analyzer search "Korrosion am Geländer" --semantic --from 2024-01-01
+    python -m pro_analyzer maintenance --max-age-days 365 --blob-dir blobs
+    python -m pro_analyzer serve --port 8000
+
+Ergebnisse landen wie in der UI in der Datenbank; wiederholte Fragen kommen
+aus dem Antwort-Cache. Der Exit-Code ist 1, wenn eine Analyse fehlschlägt.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import replace
+
+import requests
+
+from pro_analyzer import core
+from pro_analyzer.image_ingest import ingest_image
+from pro_analyzer.session import ChatSession
+
+
+def _questions(args) -> list:
+    questions = [core.ACTION_PROMPTS[a] for a in args.action or ()]
+    return questions + list(args.prompt or ())
+
+
+def _read_image(path: str):
+    if path == "-":
+        return "stdin", ingest_image(sys.stdin.buffer.read())
+    return os.path.basename(path), ingest_image(path)
+
+
+def _print_result(name: str, event: dict, as_json: bool, header: bool):
+    if as_json:
+        print(json.dumps({"image": name, **event}, ensure_ascii=False), flush=True)
+        return
+    if header:
+        print(f"=== {name} · {event['action']} ===")
+    print(event["response"], flush=True)
+    if header:
+        print()
+
+
+def cmd_analyze(args) -> int:
+    questions = _questions(args)
+    if not questions:
+        print("Bitte --prompt oder --action angeben.", file=sys.stderr)
+        return 2
+    options = json.loads(args.options) if args.options else None
+    kwargs = dict(
+        queue_key="cli", bounded=False, options=options, use_cache=not args.no_cache
+    )
+    items = []
+    for path in args.images:
+        try:
+            name, image = _read_image(path)
+        except OSError as e:  # auch PIL.UnidentifiedImageError
+            print(f"Bild '{path}' nicht lesbar: {e}", file=sys.stderr)
+            return 2
+        session = ChatSession()
+        items.extend((name, image, q, session.next_turn()) for q in questions)
+
+    if args.stream:
+        if len(items) != 1:
+            print("--stream geht nur mit einem Bild und einer Frage.", file=sys.stderr)
+            return 2
+        name, image, question, turn = items[0]
+        for event in core.analysis_events(image, question, turn, **kwargs):
+            if event["event"] == "result":
+                result = event
+            elif args.json:
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+            elif event["event"] == "queued":
+                print(
+                    f"⏳ Position {event['position']}, ca. {event['eta_s']:.0f} s",
+                    file=sys.stderr,
+                )
+            elif event["event"] == "delta":
+                print(event["text"], end="", flush=True)
+        if args.json:
+            _print_result(name, result, True, False)
+        else:
+            print()
+        return 0 if result["ok"] else 1
+
+    def run(item):
+        name, image, question, turn = item
+        return name, core.analyze(image, question, turn, **kwargs).to_dict()
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for future in as_completed([pool.submit(run, item) for item in items]):
+            name, event = future.result()
+            failed += not event["ok"]
+            _print_result(name, event, args.json, len(items) > 1)
+    return 1 if failed else 0
+
+
+def cmd_batch(args) -> int:
+    prompts = {a: core.ACTION_PROMPTS[a] for a in args.action or ()}
+    prompts.update({f"prompt{i + 1}": p for i, p in enumerate(args.prompt or ())})
+
+    def progress(done, total, name):
+        print(f"\r{done}/{total} {name or ''}"[:100], end="", file=sys.stderr)
+
+    summary = core.run_batch(args.source, prompts or None, args.workers, progress)
+    print(file=sys.stderr)
+    if args.json:
+        for image, action, response in summary.results:
+            print(
+                json.dumps(
+                    {"image": image, "action": action, "response": response},
+                    ensure_ascii=False,
+                )
+            )
+    print(
+        f"Job {summary.job_id}: {summary.done} erledigt, {summary.failed} "
+        f"fehlgeschlagen, {summary.skipped} übernommen (gesamt {summary.total})",
+        file=sys.stderr,
+    )
+    return 1 if summary.failed else 0
+
+
+def cmd_search(args) -> int:
+    filters = dict(
+        model=args.model,
+        action=args.action,
+        date_from=args.date_from,
+        date_to=args.date_to,
+    )
+    search = core.semantic_search if args.semantic else core.search_history
+    try:
+        rows = search(args.query, limit=args.limit, **filters)
+    except ValueError:
+        print("Datum bitte als JJJJ-MM-TT angeben.", file=sys.stderr)
+        return 2
+    except requests.exceptions.RequestException as e:
+        print(
+            f"Embedding-Modell {core.EMBED_MODEL} nicht erreichbar: {e}",
+            file=sys.stderr,
+        )
+        return 1
+    for row in rows:
+        _, uid, timestamp, model, action, prompt, excerpt, _ = row[:8]
+        if args.json:
+            hit = dict(uid=uid, timestamp=timestamp, model=model, action=action)
+            hit.update(prompt=prompt, excerpt=excerpt)
+            if args.semantic:
+                hit["score"] = round(row[8], 4)
+            print(json.dumps(hit, ensure_ascii=False))
+        else:
+            score = f"{row[8]:.2f}  " if args.semantic else ""
+            print(f"{score}{timestamp[:16]}  {action or 'custom':<8} {excerpt}")
+    return 0
+
+
+def cmd_maintenance(args) -> int:
+    from pro_analyzer.database import vacuum
+    from pro_analyzer.storage import StorageMaintenance
+
+    if args.blob_dir:
+        core.STORAGE_BLOB_DIR = args.blob_dir  # vor dem Öffnen der Datenbank
+    db = core.get_db()
+    if args.vacuum:
+        print("VACUUM (auto_vacuum=INCREMENTAL) …", file=sys.stderr)
+        db.flush()
+        vacuum(db.connection())
+    limits = dict(max_age_days=args.max_age_days, max_rows=args.max_rows)
+    if args.max_mb is not None:
+        limits["max_bytes"] = int(args.max_mb * 1024 * 1024)
+    policy = replace(
+        core.STORAGE_RETENTION, **{k: v for k, v in limits.items() if v is not None}
+    )
+    report = StorageMaintenance(
+        db,
+        policy,
+        blob_store=db.blob_store,
+        archive_dir=None if args.no_archive else core.STORAGE_ARCHIVE_DIR,
+        response_cache=core.get_response_cache(),
+        vacuum_pages=core.STORAGE_VACUUM_PAGES,
+        max_batches=10**9,  # einmaliger Lauf: bis alle Grenzen eingehalten sind
+    ).run_once()
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False))
+    else:
+        print(
+            f"{report.archived} archiviert, {report.deleted} gelöscht, "
+            f"{report.externalized} Bilder ausgelagert, {report.blobs_removed} "
+            f"Bilddateien entfernt, {report.pages_freed} Seiten freigegeben: "
+            f"{report.bytes_before / 1e6:.1f} -> {report.bytes_after / 1e6:.1f} MB"
+        )
+        if report.archive:
+            print(f"Archiv: {report.archive}")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    import uvicorn
+
+    from pro_analyzer.api import create_app
+
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m pro_analyzer", description="PRO ANALYZER ohne Oberfläche"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_questions(p):
+        p.add_argument(
+            "-a",
+            "--action",
+            action="append",
+            choices=list(core.ACTION_PROMPTS),
+            help="Quick Action (mehrfach möglich)",
+        )
+        p.add_argument("-p", "--prompt", action="append", help="eigene Frage")
+        p.add_argument("--workers", type=int, default=core.BATCH_WORKERS)
+        p.add_argument(
+            "--json", action="store_true", help="eine JSON-Zeile je Ergebnis"
+        )
+
+    analyze = commands.add_parser("analyze", help="Bilder (Datei oder - für stdin)")
+    analyze.add_argument("images", nargs="+")
+    add_questions(analyze)
+    analyze.add_argument("--stream", action="store_true", help="Antwort mitschreiben")
+    analyze.add_argument("--no-cache", action="store_true", help="Cache umgehen")
+    analyze.add_argument("--options", help='Ollama-Optionen, z.B. {"temperature": 0}')
+    analyze.set_defaults(func=cmd_analyze)
+
+    batch = commands.add_parser("batch", help="Ordner oder ZIP (fortsetzbar)")
+    batch.add_argument("source")
+    add_questions(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    search = commands.add_parser("search", help="Verlauf durchsuchen")
+    search.add_argument("query")
+    search.add_argument(
+        "--semantic", action="store_true", help="nach Bedeutung statt Stichwörtern"
+    )
+    search.add_argument("--model")
+    search.add_argument("--action", choices=[*core.ACTION_PROMPTS, "custom"])
+    search.add_argument("--from", dest="date_from", help="JJJJ-MM-TT")
+    search.add_argument("--to", dest="date_to", help="JJJJ-MM-TT (einschließlich)")
+    search.add_argument("--limit", type=int, default=core.HISTORY_PAGE_SIZE)
+    search.add_argument(
+        "--json", action="store_true", help="eine JSON-Zeile je Treffer"
+    )
+    search.set_defaults(func=cmd_search)
+
+    maintenance = commands.add_parser(
+        "maintenance", help="Aufbewahrung, Bilder auslagern, Datei verkleinern"
+    )
+    maintenance.add_argument("--max-age-days", type=float)
+    maintenance.add_argument("--max-rows", type=int)
+    maintenance.add_argument(
+        "--max-mb", type=float, help="Datenbank + ausgelagerte Bilder"
+    )
+    maintenance.add_argument(
+        "--blob-dir", help="Bilder in dieses Verzeichnis auslagern"
+    )
+    maintenance.add_argument(
+        "--no-archive", action="store_true", help="ohne Archiv löschen"
+    )
+    maintenance.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="vorher VACUUM (stellt alte Dateien auf auto_vacuum um; App vorher beenden)",
+    )
+    maintenance.add_argument("--json", action="store_true")
+    maintenance.set_defaults(func=cmd_maintenance)
+
+    serve = commands.add_parser("serve", help="HTTP-API starten")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.set_defaults(func=cmd_serve)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
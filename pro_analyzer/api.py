@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP-API ohne Oberfläche (FastAPI) für andere Dienste.
+
+    POST /v1/analyze        multipart: image, prompt oder action, stream,
+                            cache, options (JSON), client
+    POST /v1/analyze/batch  multipart: images (mehrfach), prompts/actions
+                            (mehrfach), stream, cache, options, client
+    GET  /v1/health         Ollama-Hosts und Scheduler
+
+Alle Anfragen laufen über dieselbe Pipeline wie die UI (core.analyze_stream):
+Antwort-Cache, Speicherung und fairer Scheduler, wobei client die
+Warteschlange im Scheduler ist. stream=true liefert NDJSON-Ereignisse
+(queued, delta, result); trennt der Client die Verbindung, wird die Analyse
+abgebrochen. Ist die Warteschlange voll, antwortet die API mit 429.
+
+Eigenständig: python -m pro_analyzer serve --port 8000
+Zusammen mit der UI (ein Scheduler für beide): python pro_analyzer_app.py --api
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from pro_analyzer.cancellation import CancelToken
+from pro_analyzer.core import (
+    ACTION_PROMPTS,
+    BATCH_WORKERS,
+    MODEL_NAME,
+    QUICK_ACTIONS,
+    analysis_events,
+    analyze,
+    backend_pool,
+    check_ollama_service,
+    scheduler,
+    start_services,
+)
+from pro_analyzer.image_ingest import ingest_image
+from pro_analyzer.session import ChatSession
+
+NDJSON = "application/x-ndjson"
+# Ein Pool für alle Batch-Anfragen: begrenzt die Analysen prozessweit und
+# hält die Worker (samt ihrer Datenbankverbindungen) über Anfragen hinweg
+_batch_pool = ThreadPoolExecutor(
+    max_workers=BATCH_WORKERS, thread_name_prefix="api-batch"
+)
+
+
+def _prompt(prompt: Optional[str], action: Optional[str]) -> str:
+    if prompt and prompt.strip():
+        return prompt
+    if action:
+        if action not in ACTION_PROMPTS:
+            raise HTTPException(
+                400,
+                f"Unbekannte Aktion '{action}' (erlaubt: {', '.join(ACTION_PROMPTS)}).",
+            )
+        return ACTION_PROMPTS[action]
+    raise HTTPException(400, "Bitte prompt oder action angeben.")
+
+
+def _options(raw: Optional[str]) -> Optional[dict]:
+    if not raw:
+        return None
+    try:
+        options = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise HTTPException(400, f"options ist kein gültiges JSON: {e}")
+    if not isinstance(options, dict):
+        raise HTTPException(400, "options muss ein JSON-Objekt sein.")
+    return options
+
+
+def _image(upload: UploadFile):
+    try:
+        return ingest_image(upload.file.read())
+    except OSError as e:  # auch PIL.UnidentifiedImageError
+        raise HTTPException(400, f"Bild '{upload.filename}' nicht lesbar: {e}")
+
+
+def _status(result: dict) -> int:
+    if result["rejected"]:
+        return 429
+    return 200 if result["ok"] else 502
+
+
+def _ndjson(events, token: CancelToken):
+    try:
+        for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    finally:
+        # Client hat getrennt (oder Stream fertig): laufende Analysen beenden
+        token.cancel()
+
+
+def create_app() -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app):
+        start_services()  # Health-Checks, Vorwärmen, Metriken (einmal pro Prozess)
+        yield
+
+    app = FastAPI(title="PRO ANALYZER API", version="2.0", lifespan=lifespan)
+
+    @app.get("/v1/health")
+    def health():
+        ok, error = check_ollama_service()
+        return JSONResponse(
+            {
+                "ok": ok,
+                "error": error,
+                "model": MODEL_NAME,
+                "backends": backend_pool.snapshot(),
+                "scheduler": scheduler.stats(),
+            },
+            status_code=200 if ok else 503,
+        )
+
+    @app.post("/v1/analyze")
+    def analyze_image(
+        image: UploadFile = File(...),
+        prompt: Optional[str] = Form(None),
+        action: Optional[str] = Form(None),
+        stream: bool = Form(False),
+        cache: bool = Form(True),
+        options: Optional[str] = Form(None),
+        client: str = Form("api"),
+    ):
+        question = _prompt(prompt, action)
+        kwargs = dict(queue_key=client, options=_options(options), use_cache=cache)
+        ingested = _image(image)
+        token = CancelToken()
+        events = analysis_events(ingested, question, cancel=token, **kwargs)
+        if stream:
+            return StreamingResponse(_ndjson(events, token), media_type=NDJSON)
+        for event in events:
+            pass
+        event.pop("event")
+        headers = None
+        if event["rejected"]:
+            # ungefähr eine Analysedauer, danach ist meist wieder Platz
+            headers = {"Retry-After": str(max(1, round(scheduler.avg_service_time)))}
+        return JSONResponse(event, status_code=_status(event), headers=headers)
+
+    @app.post("/v1/analyze/batch")
+    def analyze_batch(
+        images: List[UploadFile] = File(...),
+        prompts: List[str] = Form([]),
+        actions: List[str] = Form([]),
+        stream: bool = Form(False),
+        cache: bool = Form(True),
+        options: Optional[str] = Form(None),
+        client: str = Form("api-batch"),
+    ):
+        """Alle Bilder × alle Prompts (Standard: die vier Quick Actions)."""
+        questions = [_prompt(None, a) for a in actions] + [
+            p for p in prompts if p.strip()
+        ]
+        questions = questions or list(ACTION_PROMPTS.values())
+        generation_options = _options(options)
+        items = []  # (Bildname, IngestedImage oder Fehler, Prompt, Turn)
+        for upload in images:
+            try:
+                ingested, error = _image(upload), None
+            except HTTPException as e:
+                ingested, error = None, e.detail
+            session = ChatSession()
+            for question in questions:
+                turn = session.next_turn() if ingested else None
+                items.append((upload.filename, ingested or error, question, turn))
+        token = CancelToken()
+
+        def run(item):
+            name, image, question, turn = item
+            base = {"image": name, "action": QUICK_ACTIONS.get(question, "custom")}
+            if turn is None:
+                return {"event": "error", **base, "ok": False, "error": image}
+            try:
+                # Unbegrenzt einreihen: die Worker-Zahl begrenzt den Batch bereits
+                result = analyze(
+                    image,
+                    question,
+                    turn,
+                    queue_key=client,
+                    bounded=False,
+                    cancel=token,
+                    options=generation_options,
+                    use_cache=cache,
+                )
+            except Exception as e:
+                # Ein fehlerhafter Eintrag kippt nicht den ganzen Batch
+                return {"event": "error", **base, "ok": False, "error": str(e)}
+            return {"event": "result", **base, **result.to_dict()}
+
+        def events():
+            done = 0
+            futures = [_batch_pool.submit(run, item) for item in items]
+            try:
+                for future in as_completed(futures):
+                    event = future.result()
+                    done += event.get("ok", False)
+                    yield event
+            finally:
+                for future in futures:
+                    future.cancel()
+            yield {"event": "done", "total": len(items), "ok": done}
+
+        if stream:
+            return StreamingResponse(_ndjson(events(), token), media_type=NDJSON)
+        results = list(_batch_pool.map(run, items))  # Reihenfolge wie angefragt
+        return {
+            "total": len(items),
+            "ok": sum(bool(r.get("ok")) for r in results),
+            "results": results,
+        }
+
+    return app
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pool mehrerer Ollama-Hosts mit Health-Checks und lastabhängigem Routing.
+
+Jede Anfrage geht an den Host mit der geringsten erwarteten Wartezeit
+(offene Anfragen × gemessene Latenz / Gewicht). In Frage kommen nur Hosts,
+auf denen das Modell installiert ist (/api/tags); solche, die es bereits
+geladen haben (/api/ps), werden bevorzugt (Modell-Affinität).
+Nach mehreren Fehlern in Folge wird ein Host ausgeschlossen; der
+Hintergrund-Probe (/api/tags) nimmt ihn wieder auf, sobald er antwortet.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+from pro_analyzer.ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+# Meldung von status(), solange noch kein Health-Check abgeschlossen ist
+STATUS_CHECKING = "Ollama-Service wird geprüft …"
+
+
+class NoBackendAvailable(requests.exceptions.ConnectionError):
+    """Kein gesunder Ollama-Host verfügbar (wie ein Verbindungsfehler behandelt)."""
+
+
+def parse_backends(spec: str):
+    """
+    Liest eine Host-Liste der Form "http://gpu1:11434=2, http://gpu2:11434"
+    (optional "=gewicht" pro Eintrag) in [{"url": ..., "weight": ...}].
+    """
+    backends = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, weight = entry.rpartition("=") if "=" in entry else (entry, "", "")
+        backends.append({"url": url or entry, "weight": float(weight or 1)})
+    return backends
+
+
+class Backend:
+    def __init__(self, url: str, client: OllamaClient, weight: float = 1.0):
+        self.url = url
+        self.client = client
+        self.weight = weight
+        self.healthy = True  # optimistisch, bis der erste Probe etwas anderes sagt
+        self.outstanding = 0
+        self.latency: Optional[float] = (
+            None  # gleitender Mittelwert der Anfragedauer (s)
+        )
+        self.failures = 0  # Fehler in Folge
+        self.models = set()  # installierte Modelle (/api/tags)
+        self.loaded_models = set()
+        self.last_probe: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "latency": self.latency,
+            "weight": self.weight,
+            "models": sorted(self.models),
+            "loaded_models": sorted(self.loaded_models),
+            "last_error": self.last_error,
+        }
+
+
+class BackendPool:
+    def __init__(
+        self,
+        backends,
+        client_factory=OllamaClient,
+        probe_interval: float = 10.0,
+        retry_interval: float = 2.0,
+        probe_timeout: float = 3.0,
+        eject_after: int = 3,
+        default_latency: float = 1.0,
+    ):
+        """
+        backends: [{"url": ..., "weight": ...}, ...]
+        client_factory(url) erzeugt den (gepoolten) HTTP-Client pro Host.
+        Solange kein Host erreichbar ist, wird alle retry_interval Sekunden
+        statt alle probe_interval Sekunden geprüft.
+        """
+        self.backends = [
+            Backend(b["url"], client_factory(b["url"]), b.get("weight", 1.0))
+            for b in backends
+        ]
+        self.probe_interval = probe_interval
+        self.retry_interval = retry_interval
+        self.probe_timeout = probe_timeout
+        self.eject_after = eject_after
+        self.default_latency = default_latency
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_probe_all: Optional[float] = None
+
+    # --- Routing ---
+
+    def choose(self, model: Optional[str] = None) -> Backend:
+        with self._lock:
+            candidates = [b for b in self.backends if b.healthy]
+            if not candidates:
+                raise NoBackendAvailable("Kein Ollama-Server erreichbar.")
+            if model:
+                # Hosts ohne das Modell (/api/tags) nur, solange keiner es meldet
+                # (z.B. vor dem ersten Health-Check); sonst gäbe es 404s
+                installed = [b for b in candidates if model in b.models]
+                candidates = installed or candidates
+                warm = [b for b in candidates if model in b.loaded_models]
+                candidates = warm or candidates
+            # Hosts ohne Messwert gelten als durchschnittlich schnell, damit sie Anfragen bekommen
+            known = [b.latency for b in candidates if b.latency is not None]
+            fallback = sum(known) / len(known) if known else self.default_latency
+            return min(candidates, key=lambda b: self._expected_wait(b, fallback))
+
+    @staticmethod
+    def _expected_wait(backend: Backend, fallback: float) -> float:
+        latency = backend.latency if backend.latency is not None else fallback
+        return (backend.outstanding + 1) * latency / backend.weight
+
+    @contextmanager
+    def lease(self, model: Optional[str] = None):
+        """
+        Wählt einen Host und zählt die Anfrage als offen, bis der Block endet.
+        Verbindungsfehler, Timeouts und 5xx-Antworten zählen als Fehler des Hosts.
+        """
+        with self.track(self.choose(model)) as backend:
+            yield backend
+
+    @contextmanager
+    def track(self, backend: Backend, measure_latency: bool = True):
+        """
+        Wie lease(), aber für einen vorgegebenen Host (z.B. Vorwärmen).
+        measure_latency=False: Dauer nicht in die Latenz für das Routing
+        einrechnen (Laden eines Modells ist keine typische Anfrage).
+        """
+        with self._lock:
+            backend.outstanding += 1
+        start = time.perf_counter()
+        try:
+            yield backend
+        except requests.exceptions.RequestException as e:
+            status = getattr(e.response, "status_code", None)
+            if status is None or status >= 500:
+                self.report_failure(backend, e)
+            raise
+        else:
+            if measure_latency:
+                self.report_success(backend, time.perf_counter() - start)
+            else:
+                with self._lock:
+                    backend.failures = 0
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def report_success(self, backend: Backend, latency: float):
+        with self._lock:
+            backend.failures = 0
+            backend.latency = (
+                latency
+                if backend.latency is None
+                else 0.8 * backend.latency + 0.2 * latency
+            )
+
+    def report_failure(self, backend: Backend, error):
+        with self._lock:
+            backend.failures += 1
+            backend.last_error = str(error)
+            if backend.healthy and backend.failures >= self.eject_after:
+                backend.healthy = False
+                logger.warning("Ollama-Host %s ausgeschlossen: %s", backend.url, error)
+
+    def mark_loaded(self, backend: Backend, model: str):
+        """Vermerkt ein geladenes Modell sofort (z.B. nach dem Vorwärmen), ohne auf /api/ps zu warten."""
+        with self._lock:
+            backend.loaded_models.add(model)
+
+    # --- Health-Checks ---
+
+    def probe(self, backend: Backend) -> bool:
+        """Prüft einen Host über /api/tags und aktualisiert die geladenen Modelle (/api/ps)."""
+        try:
+            installed = backend.client.tags(read_timeout=self.probe_timeout)
+            loaded = backend.client.ps(read_timeout=self.probe_timeout)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            with self._lock:
+                backend.last_probe = time.time()
+                backend.last_error = str(e)
+                if backend.healthy:
+                    logger.warning(
+                        "Ollama-Host %s nicht erreichbar: %s", backend.url, e
+                    )
+                backend.healthy = False
+            return False
+        with self._lock:
+            backend.last_probe = time.time()
+            backend.models = {
+                m.get("name") or m.get("model") for m in installed.get("models", [])
+            }
+            backend.loaded_models = {
+                m.get("name") or m.get("model") for m in loaded.get("models", [])
+            }
+            if not backend.healthy:
+                logger.info("Ollama-Host %s wieder aufgenommen", backend.url)
+            backend.healthy = True
+            backend.failures = 0
+            backend.last_error = None
+        return True
+
+    def probe_all(self) -> bool:
+        """Prüft alle Hosts; True, wenn mindestens einer gesund ist."""
+        results = [self.probe(backend) for backend in self.backends]
+        self._last_probe_all = time.time()
+        return any(results)
+
+    def status(self, model: Optional[str] = None, max_age: Optional[float] = None):
+        """
+        (ok, meldung) aus dem letzten Health-Check, ohne Ollama zu belasten
+        und ohne zu blockieren. Fehlt ein Ergebnis oder ist es älter als
+        max_age (Standard: zwei Prüfintervalle, z.B. ohne laufenden
+        Hintergrund-Thread), wird die Prüfung im Hintergrund gestartet; bis zum
+        ersten Ergebnis lautet der Status "wird geprüft".
+        """
+        max_age = 2 * self.probe_interval if max_age is None else max_age
+        if self._last_probe_all is None or time.time() - self._last_probe_all > max_age:
+            self.start()
+            if self._last_probe_all is None:
+                return False, STATUS_CHECKING
+        with self._lock:
+            healthy = [b for b in self.backends if b.healthy]
+            if not healthy:
+                errors = "; ".join(f"{b.url}: {b.last_error}" for b in self.backends)
+                return False, f"Ollama-Service nicht erreichbar: {errors}"
+            if model and not any(model in b.models for b in healthy):
+                return False, f"Modell {model} ist auf keinem Ollama-Host installiert."
+            return True, None
+
+    def start(self):
+        """Startet die periodischen Health-Checks im Hintergrund (einmal)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._probe_loop, name="ollama-health", daemon=True
+            )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _probe_loop(self):
+        while not self._stop.is_set():
+            healthy = self.probe_all()
+            self._stop.wait(self.probe_interval if healthy else self.retry_interval)
+
+    @property
+    def healthy(self) -> bool:
+        return any(b.healthy for b in self.backends)
+
+    def snapshot(self):
+        with self._lock:
+            return [b.snapshot() for b in self.backends]
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""
+Batch-Analyse: Ordner oder ZIP-Archiv mit Bildern × Menge von Prompts.
+
+Die Matrix Bild × Prompt läuft über einen begrenzten Worker-Pool. Der
+Fortschritt jedes Eintrags steht in der Tabelle batch_items; ein erneuter
+Lauf mit derselben Quelle und denselben Prompts (gleiche job_id) überspringt
+bereits erledigte Einträge und setzt damit einen abgebrochenen Lauf fort.
+Die eigentliche Analyse (Cache, Ollama, Speichern) wird als Funktion
+übergeben, damit Batch und UI dieselbe Pipeline verwenden.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def list_images(source: str):
+    """Bildnamen einer Quelle (Ordner rekursiv oder ZIP), sortiert."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            names = [
+                info.filename
+                for info in zf.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+        return sorted(names)
+    names = []
+    for root, _dirs, files in os.walk(source):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith("."):
+                names.append(os.path.relpath(os.path.join(root, name), source))
+    return sorted(names)
+
+
+class ImageSource:
+    """
+    Liest Bild-Bytes aus einem Ordner oder ZIP (ein ZipFile pro Thread).
+    close() bzw. das Verlassen des with-Blocks schließt alle geöffneten ZIPs.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.is_zip = zipfile.is_zipfile(source)
+        self._local = threading.local()
+        self._opened = []
+        self._opened_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._opened_lock:
+            opened, self._opened = self._opened, []
+        for zf in opened:
+            zf.close()
+
+    def read(self, name: str) -> bytes:
+        if not self.is_zip:
+            with open(os.path.join(self.source, name), "rb") as f:
+                return f.read()
+        zf = getattr(self._local, "zf", None)
+        if zf is None:
+            zf = self._local.zf = zipfile.ZipFile(self.source)
+            with self._opened_lock:
+                self._opened.append(zf)
+        return zf.read(name)
+
+
+def job_id_for(source: str, prompts: dict) -> str:
+    """
+    Stabile Job-ID aus Quelle und Prompts. ZIPs werden über ihren Inhalt
+    identifiziert (Uploads landen jedes Mal unter einem neuen Pfad).
+    """
+    h = hashlib.sha256()
+    if zipfile.is_zipfile(source):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    else:
+        h.update(os.path.abspath(source).encode("utf-8"))
+    h.update(json.dumps(prompts, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+@dataclass
+class BatchSummary:
+    job_id: str
+    total: int
+    skipped: int = 0  # aus einem früheren Lauf bereits erledigt
+    done: int = 0
+    failed: int = 0
+    results: list = field(default_factory=list)  # (bild, prompt_key, antwort/fehler)
+
+
+class BatchRunner:
+    """
+    analyze(image_bytes, prompt, image_name) -> Objekt mit .response, .uid und
+    .ok (False bei Fehlerantwort); wird in den Worker-Threads aufgerufen.
+    """
+
+    def __init__(self, db, analyze, max_workers: int = 4):
+        self.db = db
+        self.analyze = analyze
+        self.max_workers = max_workers
+
+    def run(self, source: str, prompts: dict, progress=None) -> BatchSummary:
+        """
+        prompts: {schlüssel: prompttext}, z.B. {"ocr": ocr_prompt}.
+        progress(erledigt, gesamt, bildname) wird im aufrufenden Thread gerufen.
+        """
+        job_id = job_id_for(source, prompts)
+        names = list_images(source)
+        matrix = [(name, key) for name in names for key in prompts]
+        summary = BatchSummary(job_id, total=len(matrix))
+
+        conn = self.db.connection()
+        done = {
+            (name, key)
+            for name, key in conn.execute(
+                "SELECT image_name, prompt_key FROM batch_items WHERE job_id = ? AND status = 'done'",
+                (job_id,),
+            )
+        }
+        self.db.submit(
+            lambda c: c.execute(
+                "INSERT OR IGNORE INTO batch_jobs (id, source, prompts, created) VALUES (?, ?, ?, ?)",
+                (job_id, source, json.dumps(prompts), datetime.now().isoformat()),
+            )
+        )
+        pending = [item for item in matrix if item not in done]
+        summary.skipped = len(matrix) - len(pending)
+        finished = summary.skipped
+        if progress:
+            progress(finished, summary.total, None)
+
+        # Begrenzte Anzahl Aufträge gleichzeitig im Umlauf (nicht tausende Futures)
+        in_flight = {}
+        items = iter(pending)
+        # ZIPs erst schließen, wenn alle Worker fertig sind (Pool endet zuerst)
+        with ImageSource(source) as images, ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="batch"
+        ) as pool:
+            while True:
+                while len(in_flight) < self.max_workers * 2:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    name, key = item
+                    future = pool.submit(self._run_item, images, name, prompts[key])
+                    in_flight[future] = item
+                if not in_flight:
+                    break
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    name, key = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                        status, uid, text = "done", result.uid, result.response
+                        summary.done += 1
+                    except Exception as e:
+                        logger.exception(
+                            "Batch-Eintrag %s/%s fehlgeschlagen", name, key
+                        )
+                        status, uid, text = "failed", None, f"Fehler: {e}"
+                        summary.failed += 1
+                    summary.results.append((name, key, text))
+                    self._record(job_id, name, key, status, uid, text)
+                    finished += 1
+                    if progress:
+                        progress(finished, summary.total, name)
+
+        self.db.submit(
+            lambda c: c.execute(
+                "UPDATE batch_jobs SET finished = ? WHERE id = ?",
+                (datetime.now().isoformat(), job_id),
+            )
+        )
+        self.db.flush()
+        return summary
+
+    def _run_item(self, images, name, prompt):
+        result = self.analyze(images.read(name), prompt, name)
+        if not result.ok:
+            # Fehlerantworten nicht als erledigt markieren, damit ein Resume sie wiederholt
+            raise RuntimeError(result.response)
+        return result
+
+    def _record(self, job_id, name, key, status, uid, text):
+        error = text if status == "failed" else None
+        self.db.submit(
+            lambda c: c.execute(
+                "INSERT OR REPLACE INTO batch_items (job_id, image_name, prompt_key, status, interaction_uid, error, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, name, key, status, uid, error, datetime.now().isoformat()),
+            )
+        )
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Abbruch laufender Analysen.
+
+Jede Analyse bekommt ein CancelToken. Wird es abgebrochen (Button
+"Abbrechen" oder Schließen des Browser-Tabs), laufen die registrierten
+Rückrufe sofort im abbrechenden Thread: der Warteschlangenplatz wird
+freigegeben und die HTTP-Verbindung zu Ollama geschlossen, sodass Ollama
+die Generierung beendet. CancelRegistry ordnet die aktiven Tokens einer
+Gradio-Sitzung (session_hash) zu.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):
+    """Die Analyse wurde abgebrochen."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Fehler in Abbruch-Rückruf")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Registriert einen Rückruf für den Abbruch (sofort ausgeführt, falls
+        bereits abgebrochen). Liefert eine Funktion zum Abmelden.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+@contextmanager
+def abort_on_cancel(token: Optional[CancelToken], abort: Callable[[], None]):
+    """
+    Ruft abort() auf, wenn token während des Blocks abgebrochen wird. Fehler,
+    die dadurch im Block entstehen (z.B. getrennte Verbindung), werden zu
+    Cancelled und zählen damit nicht als Fehler des Ollama-Hosts.
+    """
+    if token is None:
+        yield
+        return
+    unregister = token.on_cancel(abort)
+    try:
+        yield
+    except Exception as e:
+        if token.cancelled:
+            raise Cancelled() from e
+        raise
+    finally:
+        unregister()
+
+
+class CancelRegistry:
+    """Aktive CancelTokens je Sitzung, damit Button und Tab-Schließen alle treffen."""
+
+    def __init__(self):
+        self._tokens = {}  # Sitzung -> set(CancelToken)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def token(self, key: Optional[str]):
+        """Neues Token für die Dauer des Blocks; key=None: nur lokal abbrechbar."""
+        token = CancelToken()
+        with self._lock:
+            self._tokens.setdefault(key, set()).add(token)
+        try:
+            yield token
+        finally:
+            with self._lock:
+                tokens = self._tokens.get(key)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._tokens[key]
+
+    def cancel(self, key: Optional[str]) -> int:
+        """Bricht alle laufenden Analysen der Sitzung ab; liefert deren Anzahl."""
+        with self._lock:
+            tokens = list(self._tokens.get(key, ()))
+        for token in tokens:
+            token.cancel()
+        return len(tokens)
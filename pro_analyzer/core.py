@@ -0,0 +1,1031 @@
+# -*- coding: utf-8 -*-
+
+"""
+Kern des PRO ANALYZER ohne Oberfläche: Konfiguration, Analyse (Ollama,
+Cache, Scheduler), Speicherung, Metriken und PDF-Report.
+
+Der Import ist schnell und frei von Nebenwirkungen: Gradio wird hier nie
+geladen, reportlab erst beim ersten Report. Datenbank, Antwort-Cache und
+Report-Ausgabe entstehen beim ersten Zugriff (get_db() usw.); Health-Checks,
+Vorwärmen und Metrik-Server startet erst start_services(). So lässt sich der
+Kern auch in kurzlebigen Worker-Prozessen und Skripten nutzen.
+"""
+
+import atexit
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import requests
+from PIL import Image as PILImage
+
+from pro_analyzer.backends import BackendPool, parse_backends
+from pro_analyzer.batch import BatchRunner
+from pro_analyzer.cancellation import CancelRegistry, Cancelled, abort_on_cancel
+from pro_analyzer.database import (
+    TIMING_COLUMNS,
+    Database,
+    acquire_image,
+    ensure_session,
+    fetch_interactions,
+    history_rows,
+    load_image,
+    search_interactions,
+    sniff_format,
+)
+from pro_analyzer.image_ingest import ingest_image
+from pro_analyzer.image_prep import (
+    AGGRESSIVE,
+    HIGH_QUALITY,
+    LOSSLESS,
+    STANDARD,
+    ModelImagePolicy,
+    make_thumbnail,
+    policy_for_model,
+    prepare_for_inference,
+)
+from pro_analyzer.metrics import MetricsRegistry, MetricsServer
+from pro_analyzer.model_lifecycle import KeepAlivePolicy, ModelLifecycle
+from pro_analyzer.ollama_client import AbortHandle, OllamaClient
+from pro_analyzer.response_cache import ResponseCache, cache_key
+from pro_analyzer.scheduler import FairScheduler, QueueFullError
+from pro_analyzer.session import ChatSession
+from pro_analyzer.storage import BlobStore, RetentionPolicy, StorageMaintenance
+
+logger = logging.getLogger(__name__)
+
+# --- Konfiguration ---
+OLLAMA_HOST = "http://localhost:11434"
+# Mehrere Ollama-Hosts mit Gewicht, z.B. OLLAMA_BACKENDS="http://gpu1:11434=2,http://gpu2:11434"
+OLLAMA_BACKENDS = parse_backends(os.environ.get("OLLAMA_BACKENDS", OLLAMA_HOST))
+OLLAMA_PROBE_INTERVAL = 10  # Sekunden zwischen zwei Health-Checks je Host
+OLLAMA_RETRY_INTERVAL = (
+    2  # Sekunden zwischen Health-Checks, solange kein Host erreichbar ist
+)
+SERVICE_STATUS_INTERVAL = 3  # Sekunden zwischen zwei Status-Aktualisierungen in der UI
+OLLAMA_EJECT_AFTER = 3  # Fehler in Folge, nach denen ein Host ausgeschlossen wird
+# Verbindungspool für alle Ollama-Aufrufe (Keep-Alive statt neuer TCP-Verbindung pro Frage)
+OLLAMA_POOL_SIZE = 10
+OLLAMA_CONNECT_TIMEOUT = 3.05  # Sekunden für den Verbindungsaufbau
+OLLAMA_READ_TIMEOUT = 120  # Sekunden pro Antwort bzw. pro Stream-Chunk
+MODEL_NAME = "qwen2.5vl:7b"
+# Wie lange Ollama das Modell nach der letzten Anfrage im Speicher hält; während
+# der Geschäftszeiten länger und entladene Modelle werden aktiv nachgeladen
+MODEL_KEEP_ALIVE = KeepAlivePolicy(
+    business_keep_alive="2h",
+    off_hours_keep_alive="10m",
+    business_hours=(7, 19),
+    business_days=(0, 1, 2, 3, 4),
+)
+MODEL_WARMUP_TIMEOUT = 180  # Sekunden für das Laden des Modells
+DB_PATH = "pro_analyzer_data.db"
+# Antworten Token für Token streamen (False = blockierender Aufruf wie in v1)
+STREAM_RESPONSES = True
+# Felder aus dem letzten Ollama-Chunk, die mit der Interaktion gespeichert werden
+OLLAMA_STATS_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+# Generierungsoptionen für Ollama (z.B. {"temperature": 0}); Teil des Cache-Schlüssels
+GENERATION_OPTIONS = {}
+# Antwort-Cache für wiederholte Analysen desselben Bildes mit demselben Prompt
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 256
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # Sekunden
+# Hintergrund-Writer: max. Aufträge pro Transaktion und Sammelzeit in Sekunden
+DB_WRITE_BATCH_SIZE = 64
+DB_WRITE_BATCH_WAIT = 0.05
+# PDF-Report: Worker für Vorschaubilder und Anzahl aufbewahrter Report-Dateien
+REPORT_WORKERS = 4
+REPORT_KEEP_FILES = 20
+# Statistik-Tab: wählbare Zeiträume (Tage; None = gesamter Verlauf)
+STATISTICS_PERIODS = {
+    "Letzte 7 Tage": 7,
+    "Letzte 30 Tage": 30,
+    "Letzte 90 Tage": 90,
+    "Gesamt": None,
+}
+# Verlauf-Tab: Zeilen pro Seite, Kantenlänge und Anzahl gecachter Vorschaubilder
+HISTORY_PAGE_SIZE = 50
+HISTORY_THUMBNAIL_SIZE = 160
+HISTORY_THUMBNAIL_CACHE_SIZE = 512
+# Semantische Suche: Embedding-Modell in Ollama (vorher: ollama pull nomic-embed-text).
+# Der Indexer bettet neue Antworten im Hintergrund ein, sobald keine Analyse wartet.
+EMBED_ENABLED = True
+EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = 32  # Antworten pro /api/embed-Aufruf
+EMBED_POLL_INTERVAL = 10  # Sekunden zwischen zwei Prüfungen auf neue Antworten
+EMBED_MAX_CHARS = 2000  # nur der Anfang langer Antworten wird eingebettet
+SEMANTIC_EXACT_LIMIT = 20_000  # bis dahin exakte Suche, darüber IVF-Index
+SEMANTIC_NPROBE = 16  # durchsuchte IVF-Listen (mehr = genauer, langsamer)
+SEMANTIC_CANDIDATES = 200  # Kandidaten vor dem Filtern nach Modell, Aktion, Zeitraum
+# Speicherverwaltung (pro_analyzer.storage). Aufbewahrung: None = unbegrenzt;
+# was die Grenzen überschreitet, wird vorher nach STORAGE_ARCHIVE_DIR archiviert.
+STORAGE_RETENTION = RetentionPolicy(max_age_days=None, max_rows=None, max_bytes=None)
+STORAGE_ARCHIVE_DIR = "pro_analyzer_archive"  # None = ohne Archiv löschen
+# Bilder als Dateien statt in der Datenbank (z.B. "pro_analyzer_blobs");
+# einmal gesetzt, muss das Verzeichnis erhalten bleiben
+STORAGE_BLOB_DIR = os.environ.get("PRO_ANALYZER_BLOB_DIR") or None
+STORAGE_MAINTENANCE_ENABLED = True
+STORAGE_MAINTENANCE_INTERVAL = 3600  # Sekunden zwischen zwei Wartungsläufen
+STORAGE_VACUUM_PAGES = 2048  # freie Seiten pro incremental_vacuum-Schritt
+# Batch-Analyse: gleichzeitige Analysen (an die Kapazität des Ollama-Hosts anpassen)
+BATCH_WORKERS = 4
+# "Alle Analysen": parallele Anfragen, passend zu OLLAMA_NUM_PARALLEL des Servers
+FANOUT_PARALLELISM = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+FANOUT_UI_INTERVAL = 0.1  # Sekunden zwischen zwei Chat-Updates beim Streamen
+# Fairer Scheduler vor Ollama: gleichzeitige Anfragen an allen Hosts und Warteschlangen-Limits
+SCHEDULER_MAX_IN_FLIGHT = FANOUT_PARALLELISM * len(OLLAMA_BACKENDS)
+SCHEDULER_MAX_QUEUE_PER_SESSION = 8
+SCHEDULER_MAX_QUEUE_TOTAL = 64
+SCHEDULER_DEGRADE_AT = 16  # ab so vielen Wartenden werden Bilder stärker verkleinert
+DEGRADE_PIXEL_FACTOR = 4
+SCHEDULER_WEIGHTS = {}  # Warteschlange -> Gewicht, z.B. {"batch": 1}
+SCHEDULER_STATUS_INTERVAL = 1.0  # Sekunden zwischen Warteschlangen-Updates im Chat
+# Prometheus-Metriken unter http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("PRO_ANALYZER_METRICS_PORT", 9464))
+# Gradio-Handler, die gleichzeitig laufen dürfen (Wartende blockieren keine GPU)
+UI_CONCURRENCY_LIMIT = SCHEDULER_MAX_QUEUE_TOTAL
+
+# Vordefinierte Prompts für hohe Ergebnisqualität (Quick Actions)
+detailed_prompt = "Erstelle eine extrem detaillierte, tabellarische Beschreibung dieses Bildes. Gehe auf Hauptobjekte, Hintergrund, Lichtverhältnisse, Farben und Komposition ein."
+list_objects_prompt = "Liste alle erkennbaren Objekte, Personen und Tiere auf diesem Bild in einer nummerierten Liste auf."
+ocr_prompt = "Extrahiere allen sichtbaren Text aus diesem Bild. Gib nur den extrahierten Text zurück. Wenn kein Text vorhanden ist, schreibe 'Kein Text gefunden'."
+quality_prompt = "Bewerte die technische Qualität dieses Bildes auf einer Skala von 1-10. Begründe deine Bewertung anhand von Schärfe, Belichtung, Bildrauschen und Komposition."
+QUICK_ACTIONS = {
+    detailed_prompt: "detail",
+    list_objects_prompt: "list",
+    ocr_prompt: "ocr",
+    quality_prompt: "quality",
+}  # Prompt -> Aktionsname; eigene Fragen laufen als "custom"
+QUICK_ACTION_BUTTONS = {
+    "Detaillierte Beschreibung": detailed_prompt,
+    "Objekte auflisten": list_objects_prompt,
+    "Text extrahieren (OCR)": ocr_prompt,
+    "Qualität bewerten": quality_prompt,
+}  # Button-Beschriftung -> Prompt
+ACTION_PROMPTS = {action: prompt for prompt, action in QUICK_ACTIONS.items()}
+
+# Bildvorverarbeitung je Modell: max. Pixelzahl und Ausrichtung am Patch-Raster
+MODEL_IMAGE_POLICIES = {
+    "qwen2.5vl": ModelImagePolicy(max_pixels=1280 * 28 * 28, align=28),
+}
+# Kodierung je Aktion: verlustfrei für OCR, kräftig komprimiert für Beschreibungen
+ACTION_ENCODE_PROFILES = {
+    "detail": AGGRESSIVE,
+    "list": STANDARD,
+    "ocr": LOSSLESS,
+    "quality": AGGRESSIVE,
+    "custom": HIGH_QUALITY,
+}
+
+backend_pool = BackendPool(
+    OLLAMA_BACKENDS,
+    client_factory=lambda url: OllamaClient(
+        url,
+        pool_size=OLLAMA_POOL_SIZE,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=OLLAMA_READ_TIMEOUT,
+    ),
+    probe_interval=OLLAMA_PROBE_INTERVAL,
+    retry_interval=OLLAMA_RETRY_INTERVAL,
+    eject_after=OLLAMA_EJECT_AFTER,
+)
+model_lifecycle = ModelLifecycle(
+    backend_pool,
+    MODEL_NAME,
+    policy=MODEL_KEEP_ALIVE,
+    warm_timeout=MODEL_WARMUP_TIMEOUT,
+)
+
+
+# --- Analyse ---
+
+
+def image_to_base64(image_pil: PILImage) -> str:
+    buffered = io.BytesIO()
+    image_pil.save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def call_ollama_api(
+    base64_image: str,
+    user_question: str,
+    cancel=None,
+    action: str = "custom",
+    options=None,
+):
+    """
+    Blockierender Aufruf; liefert (antwort, stats). stats enthält Token-Zähler
+    und Zeiten der Antwort und ist bei Fehlern None. action dient nur als
+    Label für die Fehler-Metrik; options ersetzt GENERATION_OPTIONS.
+    """
+    payload = {
+        "model": MODEL_NAME,
+        "prompt": user_question,
+        "images": [base64_image],
+        "stream": False,
+        "keep_alive": model_lifecycle.keep_alive(),
+    }
+    options = GENERATION_OPTIONS if options is None else options
+    if options:
+        payload["options"] = options
+    try:
+        # cancel (CancelToken) trennt die Verbindung sofort; dann wird Cancelled geworfen
+        with backend_pool.lease(MODEL_NAME) as backend, AbortHandle() as handle:
+            with abort_on_cancel(cancel, handle.abort):
+                response = backend.client.generate(payload, abort=handle)
+                response.raise_for_status()
+                response.content  # Body vollständig lesen, solange abbrechbar
+        data = response.json()
+    except requests.exceptions.RequestException as e:
+        record_error(type(e).__name__, action)
+        return (
+            f"Kommunikationsfehler mit Ollama. Ist der Server aktiv? Details: {e}",
+            None,
+        )
+    except json.JSONDecodeError:
+        record_error("JSONDecodeError", action)
+        return "Fehler: Ungültige JSON-Antwort von der API erhalten.", None
+    if "response" not in data:
+        record_error("MissingResponse", action)
+        return "Fehler: 'response'-Feld in API-Antwort nicht gefunden.", None
+    return data["response"], {field: data.get(field) for field in OLLAMA_STATS_FIELDS}
+
+
+def stream_ollama_api(
+    base64_image: str,
+    user_question: str,
+    cancel=None,
+    action: str = "custom",
+    options=None,
+):
+    """
+    Streamt die Antwort von Ollama (NDJSON, ein JSON-Objekt pro Zeile).
+    Liefert fortlaufend (bisherige_antwort, stats); stats ist nur im letzten
+    Tupel gesetzt und enthält Token-Zähler und Zeiten aus dem "done"-Chunk.
+    Wird cancel abgebrochen, endet der Stream mit Cancelled.
+    """
+    payload = {
+        "model": MODEL_NAME,
+        "prompt": user_question,
+        "images": [base64_image],
+        "stream": True,
+        "keep_alive": model_lifecycle.keep_alive(),
+    }
+    options = GENERATION_OPTIONS if options is None else options
+    if options:
+        payload["options"] = options
+    text = ""
+    try:
+        # Read-Timeout gilt hier pro gelesenem Chunk, nicht für die ganze Antwort
+        with backend_pool.lease(MODEL_NAME) as backend, AbortHandle() as handle:
+            with abort_on_cancel(cancel, handle.abort), backend.client.generate(
+                payload, abort=handle
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        record_error("OllamaError", action)
+                        yield f"Fehler von Ollama: {chunk['error']}", None
+                        return
+                    text += chunk.get("response", "")
+                    if chunk.get("done"):
+                        stats = {
+                            field: chunk.get(field) for field in OLLAMA_STATS_FIELDS
+                        }
+                        yield text, stats
+                        return
+                    yield text, None
+        # Stream ohne "done"-Chunk beendet: bisherigen Text trotzdem liefern
+        record_error("IncompleteStream", action)
+        yield text, None
+    except requests.exceptions.RequestException as e:
+        record_error(type(e).__name__, action)
+        yield f"Kommunikationsfehler mit Ollama. Ist der Server aktiv? Details: {e}", None
+    except json.JSONDecodeError:
+        record_error("JSONDecodeError", action)
+        yield "Fehler: Ungültige JSON-Antwort von der API erhalten.", None
+
+
+@dataclass
+class AnalysisResult:
+    response: str
+    stats: Optional[dict]  # Ollama-Statistik; None bei Fehlern
+    cached: bool
+    action: str
+    uid: str  # uid der gespeicherten Interaktion
+    saved: Future  # erfüllt, sobald der Writer die Zeile geschrieben hat
+    cancelled: bool = False
+    rejected: bool = False  # Warteschlange voll, nichts gespeichert
+
+    @property
+    def ok(self) -> bool:
+        return self.cached or self.stats is not None
+
+    def to_dict(self) -> dict:
+        """JSON-taugliche Form für HTTP-API und CLI."""
+        return {
+            "uid": self.uid,
+            "model": MODEL_NAME,
+            "action": self.action,
+            "response": self.response,
+            "ok": self.ok,
+            "cached": self.cached,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "stats": self.stats,
+        }
+
+
+def format_queue_status(ticket):
+    position = scheduler.position(ticket) + 1
+    return (
+        f"⏳ In der Warteschlange: Position {position}, "
+        f"geschätzte Wartezeit ca. {scheduler.eta(ticket):.0f} s"
+    )
+
+
+def analyze_stream(
+    image,
+    question,
+    turn=None,
+    queue_key=None,
+    bounded=True,
+    cancel=None,
+    options=None,
+    use_cache=True,
+    queue_status=format_queue_status,
+):
+    """
+    Kern einer Analyse ohne UI: Payload vorbereiten, Cache prüfen, Ollama
+    fragen, Ergebnis cachen und speichern. Liefert (bisherige_antwort, None)
+    während des Wartens/Streamings und zum Schluss (antwort, AnalysisResult).
+    Ollama-Aufrufe laufen über den fairen Scheduler (Warteschlange je
+    queue_key, Standard: Sitzung des Turns). Ein Abbruch über cancel
+    (CancelToken) räumt den Warteschlangenplatz und beendet die Generierung.
+    options ersetzt GENERATION_OPTIONS (Teil des Cache-Schlüssels);
+    use_cache=False erzwingt eine neue Inferenz. Während des Wartens wird
+    queue_status(ticket) statt der Antwort geliefert.
+    """
+    started = time.perf_counter()
+    image = ingest_image(image)
+    if turn is None:
+        turn = ChatSession().next_turn()
+    action = QUICK_ACTIONS.get(question, "custom")
+    labels = {"action": action, "model": MODEL_NAME}
+    policy = policy_for_model(MODEL_NAME, MODEL_IMAGE_POLICIES)
+    degraded = scheduler.should_degrade()
+    if degraded:
+        # Unter Last: kleinere Bilder -> kürzeres Prefill für alle
+        policy = replace(policy, max_pixels=policy.max_pixels // DEGRADE_PIXEL_FACTOR)
+    payload_image = prepare_for_inference(image, policy, ACTION_ENCODE_PROFILES[action])
+    base64_image = payload_image.base64
+    stage_seconds.observe(time.perf_counter() - started, stage="encode", **labels)
+    stats = None
+    cancelled = False
+    queue_seconds = None
+    options = GENERATION_OPTIONS if options is None else options
+    key = cache_key(payload_image.sha256, question, MODEL_NAME, options)
+    cached = (
+        get_response_cache().get(key) if RESPONSE_CACHE_ENABLED and use_cache else None
+    )
+    if cached is not None:
+        # Gleiches Bild, gleicher Prompt, gleiches Modell: keine neue Inferenz
+        api_response, stats = cached.response, cached.stats
+    else:
+        try:
+            ticket = scheduler.submit(queue_key or turn.session_id, bounded=bounded)
+        except QueueFullError as e:
+            # Abgelehnt: nichts speichern, Nutzer bekommt sofort Rückmeldung
+            record_error("QueueFullError", action)
+            analyses_total.inc(outcome="rejected", **labels)
+            api_response = f"⚠️ {e} Bitte in Kürze erneut versuchen."
+            saved = Future()
+            saved.set_result(None)
+            yield api_response, AnalysisResult(
+                api_response, None, False, action, turn.uid, saved, rejected=True
+            )
+            return
+        api_response = ""
+        unregister = (
+            cancel.on_cancel(lambda: scheduler.cancel(ticket)) if cancel else None
+        )
+        try:
+            # Position und Wartezeit in der Chat-Blase anzeigen, bis wir dran sind
+            while not ticket.wait(SCHEDULER_STATUS_INTERVAL):
+                yield queue_status(ticket), None
+            if ticket.cancelled:
+                raise Cancelled()
+            queue_seconds = ticket.started - ticket.enqueued
+            stage_seconds.observe(queue_seconds, stage="queue", **labels)
+            if STREAM_RESPONSES:
+                for api_response, stats in stream_ollama_api(
+                    base64_image, question, cancel, action, options
+                ):
+                    if stats is None:
+                        yield api_response, None
+            else:
+                api_response, stats = call_ollama_api(
+                    base64_image, question, cancel, action, options
+                )
+        except Cancelled:
+            cancelled = True
+        finally:
+            if unregister is not None:
+                unregister()
+            scheduler.release(ticket)
+        if cancelled or (cancel is not None and cancel.cancelled):
+            # Teilantwort behalten, aber weder als Erfolg zählen noch cachen
+            cancelled, stats = True, None
+            api_response = (api_response + "\n\n" if api_response else "") + (
+                "⏹️ Analyse abgebrochen."
+            )
+    # Nur vollständige Antworten (mit "done"-Statistik) cachen, keine Fehlermeldungen
+    if RESPONSE_CACHE_ENABLED and cached is None and stats is not None:
+        get_response_cache().put(key, api_response, stats, model=MODEL_NAME)
+    if cached is None and stats is not None:
+        record_ollama_stats(stats, labels)
+    if cancelled:
+        outcome = "cancelled"
+    elif cached is not None:
+        outcome = "cached"
+    else:
+        outcome = "ok" if stats is not None else "error"
+    duration = time.perf_counter() - started
+
+    # --- Speicherung in SQLite (nur dieser Turn; Verlauf über session_id/turn_index) ---
+    saved = save_interaction(
+        prompt=question,
+        response=api_response,
+        image_bytes=image.data,
+        image_sha256=image.sha256,
+        model=MODEL_NAME,
+        turn=turn,
+        meta={
+            "payload_bytes": len(payload_image.data),
+            "visual_tokens": payload_image.visual_tokens,
+            "degraded": degraded,
+        },
+        timings={
+            "action": action,
+            "outcome": outcome,
+            "duration_ms": duration * 1000,
+            "queue_ms": queue_seconds * 1000 if queue_seconds is not None else None,
+            # Ollama-Zeiten nur für echte Inferenz, nicht für Cache-Treffer
+            **(stats if cached is None and stats else {}),
+        },
+    )
+    saved_at = time.perf_counter()
+    saved.add_done_callback(
+        lambda _: stage_seconds.observe(
+            time.perf_counter() - saved_at, stage="db_write", **labels
+        )
+    )
+    analyses_total.inc(outcome=outcome, **labels)
+    stage_seconds.observe(duration, stage="total", **labels)
+    yield api_response, AnalysisResult(
+        api_response, stats, cached is not None, action, turn.uid, saved, cancelled
+    )
+
+
+def analyze(image, question, turn=None, **kwargs) -> AnalysisResult:
+    """Blockierende Variante von analyze_stream (Batch, Skripte)."""
+    for _, result in analyze_stream(image, question, turn, **kwargs):
+        pass
+    return result
+
+
+def queue_event(ticket) -> dict:
+    """Warteschlangen-Status als Ereignis (queue_status für analysis_events)."""
+    return {
+        "event": "queued",
+        "position": scheduler.position(ticket) + 1,
+        "eta_s": round(scheduler.eta(ticket), 1),
+    }
+
+
+def analysis_events(image, question, turn=None, **kwargs):
+    """
+    analyze_stream als Ereignisse für HTTP-API und CLI: {"event": "queued"}
+    während des Wartens, {"event": "delta", "text": ...} mit dem jeweils neuen
+    Text, {"event": "replace", "text": ...} wenn sich der bisherige Text
+    ändert (z.B. Fehlermeldung), zum Schluss {"event": "result", ...}.
+    """
+    sent = ""
+    for text, result in analyze_stream(
+        image, question, turn, queue_status=queue_event, **kwargs
+    ):
+        if result is not None:
+            yield {"event": "result", **result.to_dict()}
+        elif isinstance(text, dict):
+            yield text
+        elif text.startswith(sent):
+            if len(text) > len(sent):
+                yield {"event": "delta", "text": text[len(sent) :]}
+            sent = text
+        else:
+            yield {"event": "replace", "text": text}
+            sent = text
+
+
+def run_batch(source, prompts=None, max_workers=None, progress=None):
+    """
+    Analysiert alle Bilder eines Ordners oder ZIP-Archivs mit allen Prompts.
+    prompts: {schlüssel: prompt}, Standard sind die vier Quick Actions.
+    Pro Bild entsteht eine eigene Sitzung; ein erneuter Aufruf setzt fort.
+    """
+    prompts = prompts or dict(ACTION_PROMPTS)
+    sessions = {}
+    sessions_lock = threading.Lock()
+
+    def analyze_item(image_bytes, prompt, image_name):
+        with sessions_lock:
+            turn = sessions.setdefault(image_name, ChatSession()).next_turn()
+        # Ein gemeinsamer Warteschlangen-Platz für den ganzen Batch: teilt fair mit den UI-Nutzern
+        return analyze(image_bytes, prompt, turn, queue_key="batch", bounded=False)
+
+    runner = BatchRunner(
+        get_db(), analyze_item, max_workers=max_workers or BATCH_WORKERS
+    )
+    return runner.run(source, prompts, progress=progress)
+
+
+# --- Service-Check ---
+def check_ollama_service():
+    """
+    Liefert (ok, fehlermeldung) aus dem zwischengespeicherten Health-Check
+    (/api/tags, /api/ps im Hintergrund). Blockiert nicht und lädt kein Modell.
+    """
+    return backend_pool.status(MODEL_NAME)
+
+
+# --- Lazy erzeugte Ressourcen (Dateien, Threads) ---
+class _Lazy:
+    """Erzeugt ein Objekt beim ersten get() – threadsicher und genau einmal."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self.created = False
+
+    def get(self):
+        if not self.created:
+            with self._lock:
+                if not self.created:
+                    self._value = self._factory()
+                    self.created = True
+        return self._value
+
+
+def init_db():
+    """Öffnet die Datenbank (WAL, Hintergrund-Writer) und legt Tabellen an bzw. migriert sie."""
+    return Database(
+        DB_PATH,
+        batch_size=DB_WRITE_BATCH_SIZE,
+        batch_wait=DB_WRITE_BATCH_WAIT,
+        blob_store=BlobStore(STORAGE_BLOB_DIR) if STORAGE_BLOB_DIR else None,
+    )
+
+
+def _init_report_output():
+    from pro_analyzer.report import ReportOutputDir
+
+    output = ReportOutputDir(keep=REPORT_KEEP_FILES)
+    atexit.register(output.cleanup)
+    return output
+
+
+def _init_report_renderer():
+    # reportlab (mehrere hundert ms Importzeit) erst beim ersten Report laden
+    from pro_analyzer.report import ReportRenderer
+
+    return ReportRenderer(max_workers=REPORT_WORKERS)
+
+
+def _init_embedding_indexer():
+    from pro_analyzer.embeddings import EmbeddingIndexer, VectorIndex
+
+    return EmbeddingIndexer(
+        get_db(),
+        VectorIndex(exact_limit=SEMANTIC_EXACT_LIMIT, nprobe=SEMANTIC_NPROBE),
+        embed_texts,
+        EMBED_MODEL,
+        batch_size=EMBED_BATCH_SIZE,
+        poll_interval=EMBED_POLL_INTERVAL,
+        max_chars=EMBED_MAX_CHARS,
+        # Analysen haben Vorrang: nur einbetten, wenn im Scheduler nichts wartet
+        idle=lambda: scheduler.stats()["queued"] == 0,
+    )
+
+
+def _init_storage_maintenance():
+    db = get_db()
+    return StorageMaintenance(
+        db,
+        STORAGE_RETENTION,
+        blob_store=db.blob_store,
+        archive_dir=STORAGE_ARCHIVE_DIR,
+        response_cache=get_response_cache() if RESPONSE_CACHE_ENABLED else None,
+        interval=STORAGE_MAINTENANCE_INTERVAL,
+        vacuum_pages=STORAGE_VACUUM_PAGES,
+        on_delete=_drop_embeddings,
+    )
+
+
+def _drop_embeddings(ids):
+    # Ein noch nicht erzeugter Index lädt später ohnehin nur vorhandene Vektoren
+    if _embedding_indexer.created:
+        get_embedding_indexer().remove(ids)
+
+
+_db = _Lazy(init_db)
+_response_cache = _Lazy(
+    lambda: ResponseCache(
+        get_db(),
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes=RESPONSE_CACHE_MAX_BYTES,
+        ttl=RESPONSE_CACHE_TTL,
+    )
+)
+_report_renderer = _Lazy(_init_report_renderer)
+_report_output = _Lazy(_init_report_output)
+_embedding_indexer = _Lazy(_init_embedding_indexer)
+_storage_maintenance = _Lazy(_init_storage_maintenance)
+
+
+def get_db() -> Database:
+    return _db.get()
+
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache.get()
+
+
+def get_report_renderer():
+    return _report_renderer.get()
+
+
+def get_report_output():
+    return _report_output.get()
+
+
+def get_embedding_indexer():
+    return _embedding_indexer.get()
+
+
+def get_storage_maintenance() -> StorageMaintenance:
+    return _storage_maintenance.get()
+
+
+def save_interaction(
+    prompt,
+    response,
+    image_bytes,
+    model,
+    meta=None,
+    image_sha256=None,
+    turn=None,
+    timings=None,
+):
+    """
+    Speichert eine Interaktion (Prompt, Antwort, Bild, Modell, Metadaten) in der Datenbank.
+    Mit turn wird sie ihrer Sitzung zugeordnet (session_id, turn_index, parent_uid).
+    timings füllt die typisierten Spalten (TIMING_COLUMNS: Aktion, Ergebnis, Dauer, Ollama-Zeiten).
+    Das Schreiben übernimmt der Hintergrund-Writer; zurück kommt ein Future mit der Zeilen-ID.
+    """
+    if image_bytes is not None and image_sha256 is None:
+        image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+    if turn is None:
+        turn = ChatSession().next_turn()
+    row = (
+        datetime.now().isoformat(),
+        prompt,
+        response,
+        model,
+        json.dumps(meta) if meta else None,
+        image_sha256,
+        turn.uid,
+        turn.session_id,
+        turn.index,
+        turn.parent_uid,
+        *((timings or {}).get(column) for column in TIMING_COLUMNS),
+    )
+    columns = ", ".join(
+        [
+            "timestamp",
+            "prompt",
+            "response",
+            "model",
+            "meta",
+            "image_sha256",
+            "uid",
+            "session_id",
+            "turn_index",
+            "parent_uid",
+            *TIMING_COLUMNS,
+        ]
+    )
+    placeholders = ", ".join("?" * len(row))
+
+    def write(conn):
+        if turn.index == 0:
+            ensure_session(conn, turn.session_id, model)
+        # Bild nur einmal pro Inhalt speichern (images-Tabelle), hier nur referenzieren
+        if image_bytes is not None:
+            acquire_image(conn, image_sha256, image_bytes, sniff_format(image_bytes))
+        return conn.execute(
+            f"INSERT INTO interactions ({columns}) VALUES ({placeholders})", row
+        ).lastrowid
+
+    return get_db().submit(write)
+
+
+scheduler = FairScheduler(
+    max_in_flight=SCHEDULER_MAX_IN_FLIGHT,
+    max_queue_per_session=SCHEDULER_MAX_QUEUE_PER_SESSION,
+    max_queue_total=SCHEDULER_MAX_QUEUE_TOTAL,
+    degrade_at=SCHEDULER_DEGRADE_AT,
+    weights=SCHEDULER_WEIGHTS,
+)
+cancel_registry = CancelRegistry()
+
+# --- Metriken (Prometheus-Textformat, siehe MetricsServer) ---
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    "pro_analyzer_stage_seconds",
+    "Dauer der Analyse-Phasen (queue, encode, load, prefill, decode, db_write, total)",
+    ("stage", "action", "model"),
+)
+tokens_per_second = metrics.histogram(
+    "pro_analyzer_tokens_per_second",
+    "Generierte Tokens pro Sekunde (eval_count / eval_duration)",
+    ("action", "model"),
+    buckets=(1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200),
+)
+tokens_total = metrics.counter(
+    "pro_analyzer_tokens_total",
+    "Verarbeitete Tokens (kind=prompt|eval)",
+    ("kind", "action", "model"),
+)
+analyses_total = metrics.counter(
+    "pro_analyzer_analyses_total",
+    "Analysen nach Ergebnis (ok, cached, error, cancelled, rejected)",
+    ("outcome", "action", "model"),
+)
+errors_total = metrics.counter(
+    "pro_analyzer_errors_total", "Fehler nach Typ", ("type", "action", "model")
+)
+metrics.callback(
+    "pro_analyzer_in_flight",
+    "Laufende Ollama-Anfragen",
+    lambda: [({}, scheduler.stats()["in_flight"])],
+)
+metrics.callback(
+    "pro_analyzer_queued",
+    "Wartende Anfragen im Scheduler",
+    lambda: [({}, scheduler.stats()["queued"])],
+)
+metrics.callback(
+    "pro_analyzer_response_cache_lookups_total",
+    "Cache-Abfragen nach Ergebnis",
+    lambda: [
+        ({"result": result}, get_response_cache().stats()[field])
+        for result, field in (
+            ("memory_hit", "memory_hits"),
+            ("db_hit", "db_hits"),
+            ("miss", "misses"),
+        )
+        if _response_cache.created  # Abruf soll die Datenbank nicht öffnen
+    ],
+    type="counter",
+)
+metrics.callback(
+    "pro_analyzer_response_cache_hit_ratio",
+    "Anteil der Cache-Treffer an allen Abfragen",
+    lambda: (
+        [({}, get_response_cache().stats()["hit_rate"])]
+        if _response_cache.created
+        else []
+    ),
+)
+metrics.callback(
+    "pro_analyzer_embedding_index_size",
+    "Eingebettete Antworten im Vektorindex der semantischen Suche",
+    lambda: (
+        [({}, len(get_embedding_indexer().index))] if _embedding_indexer.created else []
+    ),
+)
+metrics.callback(
+    "pro_analyzer_storage_bytes",
+    "Belegter Speicher nach der letzten Wartung (Datenbank + ausgelagerte Bilder)",
+    lambda: (
+        [({}, get_storage_maintenance().last_report.bytes_after)]
+        if _storage_maintenance.created and get_storage_maintenance().last_report
+        else []
+    ),
+)
+metrics.callback(
+    "pro_analyzer_backend_up",
+    "1, wenn der Ollama-Host gesund ist",
+    lambda: [
+        ({"backend": b["url"]}, int(b["healthy"])) for b in backend_pool.snapshot()
+    ],
+)
+metrics.callback(
+    "pro_analyzer_backend_outstanding",
+    "Offene Anfragen je Ollama-Host",
+    lambda: [
+        ({"backend": b["url"]}, b["outstanding"]) for b in backend_pool.snapshot()
+    ],
+)
+
+
+def record_error(error_type: str, action: str):
+    errors_total.inc(type=error_type, action=action, model=MODEL_NAME)
+
+
+def record_ollama_stats(stats: dict, labels: dict):
+    """Verbucht Ollamas eigene Zeiten (Nanosekunden) und Token-Zähler."""
+    for stage, field in (
+        ("load", "load_duration"),
+        ("prefill", "prompt_eval_duration"),
+        ("decode", "eval_duration"),
+    ):
+        if stats.get(field) is not None:
+            stage_seconds.observe(stats[field] / 1e9, stage=stage, **labels)
+    for kind, field in (("prompt", "prompt_eval_count"), ("eval", "eval_count")):
+        if stats.get(field):
+            tokens_total.inc(stats[field], kind=kind, **labels)
+    if stats.get("eval_count") and stats.get("eval_duration"):
+        tokens_per_second.observe(
+            stats["eval_count"] / (stats["eval_duration"] / 1e9), **labels
+        )
+
+
+def _date_range(date_from, date_to):
+    """ISO-Daten (einschließlich) -> (since, until) mit until exklusiv."""
+    since = date.fromisoformat(date_from).isoformat() if date_from else None
+    until = (
+        (date.fromisoformat(date_to) + timedelta(days=1)).isoformat()
+        if date_to
+        else None
+    )
+    return since, until
+
+
+def search_history(
+    query=None,
+    model=None,
+    action=None,
+    date_from=None,
+    date_to=None,
+    before_id=None,
+    limit=HISTORY_PAGE_SIZE,
+):
+    """
+    Eine Seite des Verlaufs (siehe database.search_interactions).
+    date_from/date_to: ISO-Daten, beide einschließlich; ungültige Angaben
+    lösen ValueError aus.
+    """
+    since, until = _date_range(date_from, date_to)
+    return search_interactions(
+        get_db().connection(), query, model, action, since, until, before_id, limit
+    )
+
+
+def embed_texts(texts):
+    """Vektoren über Ollama /api/embed (EMBED_MODEL); Fehler kommen als requests-Ausnahme."""
+    with backend_pool.lease(EMBED_MODEL) as backend:
+        return backend.client.embed(EMBED_MODEL, texts)
+
+
+def semantic_search(
+    query,
+    model=None,
+    action=None,
+    date_from=None,
+    date_to=None,
+    limit=HISTORY_PAGE_SIZE,
+):
+    """
+    Antworten, die inhaltlich zu query passen, ähnlichste zuerst: Zeilen wie
+    bei search_history plus Ähnlichkeit (Kosinus) am Ende. Durchsucht wird,
+    was der Indexer bereits eingebettet hat; die Filter wirken auf die
+    SEMANTIC_CANDIDATES ähnlichsten Antworten.
+    """
+    since, until = _date_range(date_from, date_to)
+    indexer = get_embedding_indexer()
+    indexer.load()
+    hits = indexer.index.search(embed_texts([query])[0], SEMANTIC_CANDIDATES)
+    rows = history_rows(
+        get_db().connection(), [i for i, _ in hits], model, action, since, until
+    )
+    return [(*rows[i], score) for i, score in hits if i in rows][:limit]
+
+
+_thumbnail_cache = OrderedDict()
+_thumbnail_lock = threading.Lock()
+
+
+def history_thumbnail(sha256: str):
+    """Vorschaubild zu einem gespeicherten Bild, erst bei Bedarf erzeugt (LRU)."""
+    with _thumbnail_lock:
+        thumbnail = _thumbnail_cache.get(sha256)
+        if thumbnail is not None:
+            _thumbnail_cache.move_to_end(sha256)
+            return thumbnail
+    data = load_image(get_db().connection(), sha256)
+    if data is None:
+        return None
+    thumbnail = make_thumbnail(data, HISTORY_THUMBNAIL_SIZE)
+    with _thumbnail_lock:
+        _thumbnail_cache[sha256] = thumbnail
+        while len(_thumbnail_cache) > HISTORY_THUMBNAIL_CACHE_SIZE:
+            _thumbnail_cache.popitem(last=False)
+    return thumbnail
+
+
+def generate_pdf_report(
+    chat_history, file_name="pro_analyzer_report.pdf", session=None
+):
+    """
+    Erstellt einen PDF-Report aus dem Chatverlauf (inkl. Bilder, Prompts, Antworten, Zeitstempel, Rechnername, IP, Dauer) und gibt den Dateipfad zurück.
+    Die zugehörigen Datenbankzeilen werden über die uids der Sitzung in einer Abfrage geholt;
+    das Rendern übernimmt der ReportRenderer (Vorschaubilder parallel, im Speicher).
+    """
+    # Alle benötigten Zeilen auf einmal holen (statt einer Abfrage pro Chat-Eintrag)
+    uids = session.uids_for(chat_history) if session else [None] * len(chat_history)
+    db = get_db()
+    db.flush()  # noch nicht geschriebene Turns abwarten
+    rows = fetch_interactions(db.connection(), uids)
+    pdf_bytes = get_report_renderer().render(
+        chat_history, [rows.get(uid) for uid in uids], MODEL_NAME
+    )
+    # Nur den Dateipfad zurückgeben; alte Reports räumt ReportOutputDir selbst weg
+    return get_report_output().write(pdf_bytes, file_name)
+
+
+# --- Hintergrunddienste ---
+startup_seconds = metrics.gauge(
+    "pro_analyzer_startup_seconds",
+    "Dauer der Startphasen des Prozesses (import, services, ui, total)",
+    ("phase",),
+)
+_services_lock = threading.Lock()
+_services_started = False
+
+
+def start_services(metrics_server: bool = None):
+    """
+    Startet Health-Checks, Vorwärmen, den Embedding-Indexer, die
+    Speicherwartung und den Metrik-Server im Hintergrund (einmal pro
+    Prozess). Der Start wartet nicht auf Ollama; Worker, die nur
+    analysieren, brauchen diese Dienste nicht.
+    """
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+    backend_pool.start()
+    model_lifecycle.start()
+    if EMBED_ENABLED:
+        get_embedding_indexer().start()
+    if STORAGE_MAINTENANCE_ENABLED:
+        get_storage_maintenance().start()
+    if METRICS_ENABLED if metrics_server is None else metrics_server:
+        try:
+            MetricsServer(metrics, METRICS_HOST, METRICS_PORT).start()
+        except OSError as e:
+            logger.warning("Metrik-Server nicht gestartet: %s", e)
+
+
+def record_startup(phases: dict):
+    """Meldet die gemessenen Startphasen (Sekunden) als Metrik und im Log."""
+    for phase, seconds in phases.items():
+        startup_seconds.set(seconds, phase=phase)
+    logger.info(
+        "Start in %s", ", ".join(f"{phase} {s:.2f} s" for phase, s in phases.items())
+    )
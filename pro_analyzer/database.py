@@ -0,0 +1,1100 @@
+# -*- coding: utf-8 -*-
+
+"""
+Datenzugriffsschicht, Schema und Migrationen der SQLite-Datenbank
+(pro_analyzer_data.db).
+
+Database hält eine langlebige Verbindung pro Thread (WAL-Journal,
+abgestimmte Pragmas) und einen Hintergrund-Writer, der Schreibaufträge
+sammelt und gruppiert in einer Transaktion festschreibt. Der Request-Pfad
+wartet damit nicht mehr auf den Commit; beim Beenden wird die Warteschlange
+vollständig geleert (atexit).
+
+Bilder liegen inhaltsadressiert in der Tabelle images (Schlüssel: SHA-256
+der Bild-Bytes) mit Referenzzähler; interactions verweist über
+image_sha256 darauf. Zehn Folgefragen zum selben Foto speichern das Foto
+damit nur einmal. Trigger halten den Referenzzähler beim Löschen aktuell
+und entfernen nicht mehr referenzierte Bilder.
+
+Für den Verlauf indiziert die FTS5-Tabelle interactions_fts Prompt und
+Antwort (external content, also ohne zweite Kopie der Texte); Trigger halten
+sie bei INSERT, UPDATE und DELETE synchron. search_interactions() blättert
+per Keyset (id < Cursor) statt OFFSET, jede Seite kostet damit gleich viel.
+
+Neue Datenbanken nutzen auto_vacuum=INCREMENTAL: gelöschte Seiten gibt
+incremental_vacuum() in kleinen Schritten an das Dateisystem zurück, ohne
+die Datenbank wie VACUUM komplett umzuschreiben (ältere Dateien stellt
+vacuum() einmalig um). Mit einem blob_store lagert pro_analyzer.storage
+Bilder in Dateien aus; in images bleibt nur die Zeile mit external = 1 und
+leerem data, gelesen wird über die SQL-Funktion external_image(sha256).
+"""
+
+import atexit
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import Future
+import re
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 5
+
+# Ollamas Zeit- (Nanosekunden) und Token-Felder aus der Antwort
+OLLAMA_TIMING_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+# Typisierte Messwerte je Interaktion (Statistik, Report); Name -> Typ
+TIMING_COLUMNS = {
+    "action": "TEXT",  # Quick Action bzw. "custom"
+    "outcome": "TEXT",  # ok, cached, error, cancelled
+    "duration_ms": "REAL",  # Wanduhrzeit der ganzen Analyse
+    "queue_ms": "REAL",  # Wartezeit im Scheduler
+    **{field: "INTEGER" for field in OLLAMA_TIMING_FIELDS},
+}
+
+# Tagesstatistik je Modell und Aktion. Perzentile nach dem Nearest-Rank-Verfahren
+# über Fensterfunktionen (Rang innerhalb der Gruppe, sortiert nach Dauer).
+# {where} schränkt vor dem Ranking ein, damit der Zeitstempel-Index greift.
+STATS_SQL = """
+    WITH ranked AS (
+        SELECT
+            substr(timestamp, 1, 10) AS day,
+            model,
+            action,
+            duration_ms,
+            prompt_eval_duration,
+            eval_count,
+            eval_duration,
+            ROW_NUMBER() OVER (
+                PARTITION BY substr(timestamp, 1, 10), model, action
+                ORDER BY duration_ms
+            ) AS rank,
+            COUNT(*) OVER (PARTITION BY substr(timestamp, 1, 10), model, action) AS n
+        FROM interactions
+        WHERE outcome = 'ok' AND duration_ms IS NOT NULL {where}
+    )
+    SELECT
+        day,
+        model,
+        action,
+        n AS analyses,
+        MIN(CASE WHEN rank >= 0.50 * n THEN duration_ms END) AS p50_ms,
+        MIN(CASE WHEN rank >= 0.95 * n THEN duration_ms END) AS p95_ms,
+        AVG(prompt_eval_duration) / 1e6 AS avg_prefill_ms,
+        SUM(eval_count) * 1e9 / NULLIF(SUM(eval_duration), 0) AS tokens_per_second
+    FROM ranked
+    GROUP BY day, model, action
+"""
+
+# Spalten, die nach v2.0 zu interactions hinzugekommen sind (Name -> Typ)
+ADDED_INTERACTION_COLUMNS = {
+    "image_sha256": "TEXT",
+    "uid": "TEXT",  # eindeutige ID, schon vor dem (asynchronen) Insert bekannt
+    "session_id": "TEXT",
+    "turn_index": "INTEGER",
+    "parent_uid": "TEXT",  # uid des vorherigen Turns derselben Sitzung
+    **TIMING_COLUMNS,
+}
+
+# Spalten, die images seit Version 5 hat (ausgelagerte Bilder)
+ADDED_IMAGE_COLUMNS = {
+    "external": "INTEGER NOT NULL DEFAULT 0",  # 1 = Bytes liegen im blob_store
+    "size": "INTEGER",  # Größe ausgelagerter Bilder in Bytes
+}
+
+# Für jede Verbindung: WAL erlaubt parallele Leser neben einem Schreiber,
+# synchronous=NORMAL ist im WAL-Modus absturzsicher und spart fsyncs.
+# auto_vacuum muss vor journal_mode stehen, sonst gilt es für neue Dateien nicht.
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MiB Seiten-Cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",  # Lesen ohne Kopie in den Seiten-Cache (256 MiB)
+    "PRAGMA journal_size_limit=67108864",  # WAL nach Checkpoints auf 64 MiB kürzen
+)
+
+# Bild-Bytes einer Interaktion (Alias img für images, i für interactions)
+IMAGE_DATA_SQL = (
+    "COALESCE(CASE WHEN img.external THEN external_image(img.sha256) "
+    "ELSE img.data END, i.image)"
+)
+
+# Zeilen des Verlaufs: (id, uid, timestamp, model, action, prompt, Antwort-Ausschnitt, image_sha256)
+HISTORY_COLUMNS = (
+    "i.id, i.uid, i.timestamp, i.model, i.action, substr(i.prompt, 1, 200), "
+    "{excerpt}, i.image_sha256"
+)
+
+# Spielraum beim Übersetzen eines Zeitraums in id-Grenzen: wie weit ein
+# Zeitstempel hinter dem einer älteren Zeile (kleinere id) liegen kann. Die
+# Zeitstempel sind lokale Zeit; nach der Umstellung auf Winterzeit kommt die
+# Stunde doppelt vor, dazu leicht vertauschte Zeilen eines Schreib-Batches.
+HISTORY_ID_MARGIN = timedelta(hours=2)
+
+_STOP = object()
+
+
+class Database:
+    """
+    Langlebige SQLite-Verbindungen (eine pro Thread) plus Hintergrund-Writer.
+
+    Lesen:     db.connection().execute(...)
+    Schreiben: db.submit(fn, *args) -> Future; fn(conn, *args) läuft im
+               Writer-Thread innerhalb einer gruppierten Transaktion.
+
+    blob_store (get(sha256) -> bytes) liefert ausgelagerte Bilder; ohne ihn
+    sind ausgelagerte Bilder nicht lesbar (None).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 64,
+        batch_wait: float = 0.05,
+        blob_store=None,
+    ):
+        self.path = path
+        self.blob_store = blob_store
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait  # Sekunden, die auf weitere Aufträge gewartet wird
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+        conn = self.connection()
+        init_schema(conn)
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="db-writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.close)
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Verbindung des aufrufenden Threads (wird beim ersten Zugriff geöffnet
+        und geschlossen, sobald der Thread endet, z.B. in Thread-Pools).
+        """
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            # check_same_thread=False, damit close() bzw. das Aufräumen nach
+            # dem Thread-Ende sie aus einem anderen Thread schließen kann
+            conn = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False
+            )
+            self._prepare(conn)
+            holder = _ConnectionHolder(conn)
+            with self._connections_lock:
+                self._connections.append(conn)
+            # Endet der Thread, verwirft Python seine thread-lokalen Daten
+            weakref.finalize(
+                holder,
+                _release_connection,
+                self._connections_lock,
+                self._connections,
+                conn,
+            )
+            self._local.holder = holder
+        return holder.conn
+
+    def _prepare(self, conn):
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.create_function(
+            "external_image", 1, self._external_image, deterministic=True
+        )
+
+    def _external_image(self, sha256):
+        if sha256 is None:
+            return None
+        if self.blob_store is None:
+            logger.warning(
+                "Bild %s ist ausgelagert, aber kein blob_store gesetzt", sha256
+            )
+            return None
+        return self.blob_store.get(sha256)
+
+    def submit(self, fn, *args) -> Future:
+        """Reiht einen Schreibauftrag ein, ohne auf den Commit zu warten."""
+        if self._closed:
+            raise RuntimeError("Datenbank ist bereits geschlossen.")
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Wartet, bis alle bisher eingereihten Schreibaufträge festgeschrieben sind."""
+        self.submit(lambda conn: None).result(timeout)
+
+    def close(self):
+        """Leert die Warteschlange, stoppt den Writer und schließt alle Verbindungen."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def _writer_loop(self):
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        self._prepare(conn)
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            # Weitere Aufträge kurz einsammeln, damit sie gemeinsam committen
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.batch_wait))
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stop = True
+                batch = [job for job in batch if job is not _STOP]
+                # Nach dem Stop-Signal eingereihte Aufträge nicht verlieren
+                while not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+            if batch:
+                self._write_batch(conn, batch)
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future in batch:
+                # Savepoint pro Auftrag: ein fehlerhafter Auftrag kippt nicht den ganzen Batch
+                conn.execute("SAVEPOINT job")
+                try:
+                    results.append((future, fn(conn, *args), None))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.exception("Schreib-Batch fehlgeschlagen")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, None, e) for _, _, future in batch]
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+class _ConnectionHolder:
+    """Thread-lokaler Träger einer Verbindung (Ziel für weakref.finalize)."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+def _release_connection(lock, connections, conn):
+    with lock:
+        if conn not in connections:
+            return  # bereits von Database.close() geschlossen
+        connections.remove(conn)
+    conn.close()
+
+
+def sniff_format(data: bytes):
+    """Erkennt JPEG/PNG an den Magic Bytes (ohne zu dekodieren)."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "JPEG"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "PNG"
+    return None
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def init_schema(conn):
+    """Legt Tabellen, Indizes und Trigger an und migriert alte Datenbanken."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            prompt TEXT,
+            response TEXT,
+            image BLOB,
+            model TEXT,
+            meta TEXT,
+            image_sha256 TEXT REFERENCES images(sha256)
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS images (
+            sha256 TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            format TEXT,
+            width INTEGER,
+            height INTEGER,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created TEXT
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS response_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT,
+            stats TEXT,
+            model TEXT,
+            created REAL,
+            hits INTEGER DEFAULT 0
+        )
+    """
+    )
+    # Batch-Läufe (pro_analyzer.batch): ein Eintrag pro Bild × Prompt für das Resume
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS batch_jobs (
+            id TEXT PRIMARY KEY,
+            source TEXT,
+            prompts TEXT,
+            created TEXT,
+            finished TEXT
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS batch_items (
+            job_id TEXT NOT NULL,
+            image_name TEXT NOT NULL,
+            prompt_key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            interaction_uid TEXT,
+            error TEXT,
+            updated TEXT,
+            PRIMARY KEY (job_id, image_name, prompt_key)
+        )
+    """
+    )
+    # Ausgelagerte Bilder, deren Datei noch gelöscht werden muss (pro_analyzer.storage)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS blob_trash (
+            sha256 TEXT PRIMARY KEY
+        )
+    """
+    )
+    # Semantische Suche (pro_analyzer.embeddings): normierter float16-Vektor je Antwort und Modell
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            interaction_id INTEGER NOT NULL,
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (interaction_id, model)
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            created TEXT,
+            model TEXT
+        )
+    """
+    )
+    # Ältere Datenbanken um die neuen Spalten ergänzen
+    existing = _columns(conn, "interactions")
+    for name, sql_type in ADDED_INTERACTION_COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE interactions ADD COLUMN {name} {sql_type}")
+    existing = _columns(conn, "images")
+    for name, sql_type in ADDED_IMAGE_COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE images ADD COLUMN {name} {sql_type}")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_image ON interactions(image_sha256)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_interactions_uid ON interactions(uid)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_session ON interactions(session_id, turn_index)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_timestamp ON interactions(timestamp)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_timing ON interactions(model, action, outcome, timestamp)"
+    )
+    # Verlauf nach Modell bzw. Quick Action: Zeilen je Wert bereits nach id sortiert
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_model ON interactions(model)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_action ON interactions(action)"
+    )
+    # Noch einzulagernde Bilder und Gesamtgröße der ausgelagerten, ohne die BLOBs zu lesen
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_images_external ON images(external, size)"
+    )
+    conn.execute(
+        f"CREATE VIEW IF NOT EXISTS interaction_stats AS {STATS_SQL.format(where='')}"
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_interactions_release_image
+        AFTER DELETE ON interactions
+        WHEN OLD.image_sha256 IS NOT NULL
+        BEGIN
+            UPDATE images SET refcount = refcount - 1 WHERE sha256 = OLD.image_sha256;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_interactions_drop_embeddings
+        AFTER DELETE ON interactions
+        BEGIN
+            DELETE FROM embeddings WHERE interaction_id = OLD.id;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_images_drop_unreferenced
+        AFTER UPDATE OF refcount ON images
+        WHEN NEW.refcount <= 0
+        BEGIN
+            DELETE FROM images WHERE sha256 = NEW.sha256;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_images_trash_external
+        AFTER DELETE ON images
+        WHEN OLD.external
+        BEGIN
+            INSERT OR IGNORE INTO blob_trash (sha256) VALUES (OLD.sha256);
+        END
+    """
+    )
+    has_fts = create_fts_index(conn)
+    if conn.in_transaction:
+        conn.commit()
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    moved = migrate_inline_images(conn) if version < 1 else 0
+    if version < 3:
+        backfill_timings(conn)
+    if version < 4 and has_fts:
+        # Bestehende Zeilen einmalig in den Volltextindex übernehmen
+        conn.execute("INSERT INTO interactions_fts(interactions_fts) VALUES('rebuild')")
+        if conn.in_transaction:
+            conn.commit()
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if conn.in_transaction:
+            conn.commit()
+        if moved:
+            # Einmalig: Platz der alten Inline-BLOBs an das Dateisystem zurückgeben
+            logger.info("%d Bilder migriert, komprimiere Datenbank (VACUUM)", moved)
+            conn.execute("VACUUM")
+
+
+def create_fts_index(conn) -> bool:
+    """
+    Legt den Volltextindex über prompt und response samt Sync-Triggern an.
+    Ohne FTS5 im SQLite-Build bleibt er weg (False); die Suche fällt dann
+    auf LIKE zurück.
+    """
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+                prompt,
+                response,
+                content = 'interactions',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """
+        )
+    except sqlite3.OperationalError as e:
+        logger.warning("Kein FTS5 verfügbar, Verlaufssuche ohne Index: %s", e)
+        return False
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_interactions_fts_insert
+        AFTER INSERT ON interactions
+        BEGIN
+            INSERT INTO interactions_fts(rowid, prompt, response)
+            VALUES (NEW.id, NEW.prompt, NEW.response);
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_interactions_fts_delete
+        AFTER DELETE ON interactions
+        BEGIN
+            INSERT INTO interactions_fts(interactions_fts, rowid, prompt, response)
+            VALUES ('delete', OLD.id, OLD.prompt, OLD.response);
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_interactions_fts_update
+        AFTER UPDATE OF prompt, response ON interactions
+        BEGIN
+            INSERT INTO interactions_fts(interactions_fts, rowid, prompt, response)
+            VALUES ('delete', OLD.id, OLD.prompt, OLD.response);
+            INSERT INTO interactions_fts(rowid, prompt, response)
+            VALUES (NEW.id, NEW.prompt, NEW.response);
+        END
+    """
+    )
+    return True
+
+
+def migrate_inline_images(conn, batch_size: int = 200) -> int:
+    """
+    Verschiebt BLOBs aus interactions.image in die images-Tabelle
+    (dedupliziert) und setzt image_sha256. Läuft in Batches, damit nicht
+    alle Bilder gleichzeitig im Speicher liegen.
+    """
+    moved = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, image FROM interactions WHERE image IS NOT NULL LIMIT ?",
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            break
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        for row_id, data in rows:
+            sha256 = hashlib.sha256(data).hexdigest()
+            acquire_image(conn, sha256, data, sniff_format(data))
+            conn.execute(
+                "UPDATE interactions SET image = NULL, image_sha256 = ? WHERE id = ?",
+                (sha256, row_id),
+            )
+        if conn.in_transaction:
+            conn.commit()
+        moved += len(rows)
+    return moved
+
+
+def backfill_timings(conn):
+    """
+    Übernimmt Aktion und Ollama-Zeiten älterer Zeilen aus dem meta-JSON in die
+    typisierten Spalten. Bei Cache-Treffern stammen die Zeiten aus dem
+    ursprünglichen Lauf und werden nicht übernommen.
+    """
+    assignments = ", ".join(
+        [
+            "action = json_extract(meta, '$.action')",
+            "outcome = CASE WHEN json_extract(meta, '$.cache_hit') THEN 'cached' "
+            "WHEN json_extract(meta, '$.ollama') IS NOT NULL THEN 'ok' END",
+        ]
+        + [
+            f"{field} = CASE WHEN json_extract(meta, '$.cache_hit') THEN NULL "
+            f"ELSE json_extract(meta, '$.ollama.{field}') END"
+            for field in OLLAMA_TIMING_FIELDS
+        ]
+    )
+    conn.execute(
+        f"UPDATE interactions SET {assignments} WHERE outcome IS NULL AND json_valid(meta)"
+    )
+    if conn.in_transaction:
+        conn.commit()
+
+
+def timing_statistics(conn, since: str = None):
+    """
+    Tageswerte wie in der View interaction_stats (neueste zuerst): Tag,
+    Modell, Aktion, Anzahl, p50/p95 der Dauer in ms, mittleres Prefill in ms,
+    Tokens/s. since: ISO-Datum, ab dem ausgewertet wird.
+    """
+    sql = STATS_SQL.format(where="AND timestamp >= ?")
+    return conn.execute(
+        f"{sql} ORDER BY day DESC, model, action", (since or "",)
+    ).fetchall()
+
+
+def ensure_session(conn, session_id: str, model: str = None):
+    """Legt den Sitzungs-Datensatz beim ersten Turn an."""
+    conn.execute(
+        "INSERT OR IGNORE INTO sessions (id, created, model) VALUES (?, ?, ?)",
+        (session_id, datetime.now().isoformat(), model),
+    )
+
+
+def load_conversation(conn, session_id: str):
+    """Alle Turns einer Sitzung in Reihenfolge (eine indizierte Abfrage)."""
+    return conn.execute(
+        "SELECT id, uid, turn_index, parent_uid, timestamp, prompt, response, model, image_sha256, meta FROM interactions WHERE session_id = ? ORDER BY turn_index",
+        (session_id,),
+    ).fetchall()
+
+
+def fetch_interactions(conn, uids, chunk_size: int = 500) -> dict:
+    """
+    Holt Zeitstempel, Bild-Bytes und Metadaten für viele Interaktionen per
+    uid in wenigen Abfragen (IN-Liste, in Blöcken wegen des Parameterlimits).
+    Ergebnis: {uid: (timestamp, image_bytes, meta, duration_ms)}
+    """
+    uids = [uid for uid in dict.fromkeys(uids) if uid]
+    rows = {}
+    for start in range(0, len(uids), chunk_size):
+        chunk = uids[start : start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
+        for uid, timestamp, img_bytes, meta, duration_ms in conn.execute(
+            f"SELECT i.uid, i.timestamp, {IMAGE_DATA_SQL}, i.meta, i.duration_ms FROM interactions i LEFT JOIN images img ON img.sha256 = i.image_sha256 WHERE i.uid IN ({placeholders})",
+            chunk,
+        ):
+            rows[uid] = (timestamp, img_bytes, meta, duration_ms)
+    return rows
+
+
+def acquire_image(conn, sha256: str, data: bytes, fmt=None, width=None, height=None):
+    """
+    Referenziert ein Bild: erhöht den Zähler, falls es schon gespeichert ist,
+    sonst wird es eingefügt. Die Bytes werden nur beim ersten Mal geschrieben.
+    """
+    cur = conn.execute(
+        "UPDATE images SET refcount = refcount + 1 WHERE sha256 = ?", (sha256,)
+    )
+    if cur.rowcount == 0:
+        conn.execute(
+            "INSERT INTO images (sha256, data, format, width, height, refcount, created) VALUES (?, ?, ?, ?, ?, 1, ?)",
+            (sha256, data, fmt, width, height, datetime.now().isoformat()),
+        )
+
+
+def fts_query(text: str) -> str:
+    """
+    Macht aus einer Sucheingabe eine FTS5-Abfrage: jedes Wort als Phrase
+    (Zeichen wie " - * : führen so nicht zu Syntaxfehlern), alle Wörter
+    müssen vorkommen, das letzte auch nur als Wortanfang.
+    """
+    terms = [f'"{word}"' for word in re.findall(r"\w+", text or "")]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _has_fts(conn) -> bool:
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'interactions_fts'"
+        ).fetchone()
+        is not None
+    )
+
+
+def _first_id_at(conn, timestamp: str):
+    """id der ersten Zeile ab timestamp (über den Zeitstempel-Index)."""
+    row = conn.execute(
+        "SELECT id FROM interactions WHERE timestamp >= ? ORDER BY timestamp LIMIT 1",
+        (timestamp,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _last_id_before(conn, timestamp: str):
+    """id der letzten Zeile vor timestamp (über den Zeitstempel-Index)."""
+    row = conn.execute(
+        "SELECT id FROM interactions WHERE timestamp < ? ORDER BY timestamp DESC LIMIT 1",
+        (timestamp,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _shifted(timestamp: str, delta: timedelta) -> str:
+    return (datetime.fromisoformat(timestamp) + delta).isoformat()
+
+
+def search_interactions(
+    conn,
+    query: str = None,
+    model: str = None,
+    action: str = None,
+    since: str = None,
+    until: str = None,
+    before_id: int = None,
+    limit: int = 50,
+):
+    """
+    Eine Seite des Verlaufs, neueste zuerst:
+    (id, uid, timestamp, model, action, prompt, Antwort-Ausschnitt, image_sha256).
+
+    query durchsucht Prompt und Antwort (Volltext, Treffer im Ausschnitt
+    markiert), since/until begrenzen den Zeitraum (ISO, until exklusiv).
+    Die nächste Seite liefert before_id = id der letzten Zeile. Sortiert
+    wird nach id (entspricht der Einfügereihenfolge); der Zeitraum wird
+    zusätzlich in id-Grenzen übersetzt, damit weder Volltext- noch
+    Aktions-Abfrage an allen jüngeren Zeilen vorbeilaufen müssen. Liegen
+    Zeitstempel höchstens HISTORY_ID_MARGIN hinter denen älterer Zeilen,
+    hat jeder Treffer eine id nach der letzten Zeile vor since - Spielraum
+    und vor der ersten Zeile ab until + Spielraum.
+    """
+    text = fts_query(query)  # leer, wenn die Eingabe keine Wörter enthält
+    use_fts = bool(text) and _has_fts(conn)
+    key = "interactions_fts.rowid" if use_fts else "i.id"
+    where, params = [], []
+    if text and use_fts:
+        where.append("interactions_fts MATCH ?")
+        params.append(text)
+    elif text:
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", query.strip()) + "%"
+        where.append("(i.prompt LIKE ? ESCAPE '\\' OR i.response LIKE ? ESCAPE '\\')")
+        params += [pattern, pattern]
+    if before_id is not None:
+        where.append(f"{key} < ?")
+        params.append(before_id)
+    if model:
+        where.append("i.model = ?")
+        params.append(model)
+    if action:
+        where.append("i.action = ?")
+        params.append(action)
+    if since:
+        low = _last_id_before(conn, _shifted(since, -HISTORY_ID_MARGIN))
+        if low is not None:
+            where.append(f"{key} > ?")
+            params.append(low)
+        # "+" hält den Planer vom Zeitstempel-Index fern (der bräuchte eine Sortierung)
+        where.append("+i.timestamp >= ?")
+        params.append(since)
+    if until:
+        high = _first_id_at(conn, _shifted(until, HISTORY_ID_MARGIN))
+        if high is not None:
+            where.append(f"{key} < ?")
+            params.append(high)
+        where.append("+i.timestamp < ?")
+        params.append(until)
+    if use_fts:
+        source = "interactions_fts CROSS JOIN interactions i ON i.id = interactions_fts.rowid"
+        excerpt = "snippet(interactions_fts, 1, '**', '**', ' … ', 24)"
+    else:
+        source = "interactions i"
+        excerpt = "substr(i.response, 1, 200)"
+    sql = (
+        f"SELECT {HISTORY_COLUMNS.format(excerpt=excerpt)} FROM {source} "
+        f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {key} DESC LIMIT ?"
+    )
+    return conn.execute(sql, (*params, limit)).fetchall()
+
+
+def history_rows(
+    conn, ids, model=None, action=None, since=None, until=None, chunk_size=500
+) -> dict:
+    """
+    Verlaufszeilen (wie search_interactions) zu gegebenen ids, gefiltert
+    nach Modell, Aktion und Zeitraum: {id: Zeile}. Fehlende ids (inzwischen
+    gelöscht oder herausgefiltert) fehlen im Ergebnis.
+    """
+    where, params = [], []
+    for condition, value in (
+        ("i.model = ?", model),
+        ("i.action = ?", action),
+        ("i.timestamp >= ?", since),
+        ("i.timestamp < ?", until),
+    ):
+        if value:
+            where.append(condition)
+            params.append(value)
+    columns = HISTORY_COLUMNS.format(excerpt="substr(i.response, 1, 200)")
+    rows = {}
+    ids = list(ids)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start : start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(
+            f"SELECT {columns} FROM interactions i WHERE {' AND '.join([f'i.id IN ({placeholders})', *where])}",
+            (*chunk, *params),
+        ):
+            rows[row[0]] = row
+    return rows
+
+
+def pending_embeddings(conn, after_id: int, limit: int):
+    """Nächste Antworten ohne Fehler nach after_id, die noch eingebettet werden müssen: [(id, response)]."""
+    return conn.execute(
+        "SELECT id, response FROM interactions WHERE id > ? AND (outcome IS NULL OR outcome IN ('ok', 'cached')) AND response <> '' ORDER BY id LIMIT ?",
+        (after_id, limit),
+    ).fetchall()
+
+
+def store_embeddings(conn, model: str, rows) -> list:
+    """
+    Speichert [(interaction_id, vector_blob)] (im Writer-Thread); Zeilen zu
+    inzwischen gelöschten Interaktionen fallen weg. Liefert die gespeicherten ids.
+    """
+    placeholders = ", ".join("?" * len(rows))
+    existing = {
+        row[0]
+        for row in conn.execute(
+            f"SELECT id FROM interactions WHERE id IN ({placeholders})",
+            [interaction_id for interaction_id, _ in rows],
+        )
+    }
+    rows = [
+        (interaction_id, blob)
+        for interaction_id, blob in rows
+        if interaction_id in existing
+    ]
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings (interaction_id, model, vector) VALUES (?, ?, ?)",
+        [(interaction_id, model, blob) for interaction_id, blob in rows],
+    )
+    return [interaction_id for interaction_id, _ in rows]
+
+
+def iter_embeddings(conn, model: str, chunk_size: int = 4096):
+    """Alle gespeicherten Vektoren eines Modells in id-Reihenfolge, blockweise."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT interaction_id, vector FROM embeddings WHERE interaction_id > ? AND model = ? ORDER BY interaction_id LIMIT ?",
+            (last_id, model, chunk_size),
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def distinct_models(conn) -> list:
+    """Alle Modellnamen im Verlauf; springt über den Index statt alle Zeilen zu lesen."""
+    models = []
+    while True:
+        row = conn.execute(
+            "SELECT model FROM interactions WHERE model > ? ORDER BY model LIMIT 1",
+            (models[-1] if models else "",),
+        ).fetchone()
+        if row is None:
+            return models
+        models.append(row[0])
+
+
+def load_interaction(conn, row_id: int):
+    """Eine Interaktion vollständig: (timestamp, model, action, prompt, response, image_bytes)."""
+    return conn.execute(
+        f"SELECT i.timestamp, i.model, i.action, i.prompt, i.response, {IMAGE_DATA_SQL} FROM interactions i LEFT JOIN images img ON img.sha256 = i.image_sha256 WHERE i.id = ?",
+        (row_id,),
+    ).fetchone()
+
+
+def load_image(conn, sha256: str):
+    """Bild-Bytes zu einem SHA-256 (None, wenn nicht mehr gespeichert)."""
+    row = conn.execute(
+        "SELECT CASE WHEN external THEN external_image(sha256) ELSE data END FROM images WHERE sha256 = ?",
+        (sha256,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+# --- Aufbewahrung und Speicherverwaltung (pro_analyzer.storage) ---
+def interactions_before(conn, timestamp: str, limit: int) -> list:
+    """ids der ältesten Interaktionen vor timestamp (über den Zeitstempel-Index)."""
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT id FROM interactions WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+            (timestamp, limit),
+        )
+    ]
+
+
+def interactions_beyond(conn, keep: int, limit: int) -> list:
+    """ids der ältesten Interaktionen, die über die neuesten keep hinausgehen."""
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT id FROM interactions WHERE id <= (SELECT id FROM interactions ORDER BY id DESC LIMIT 1 OFFSET ?) ORDER BY id LIMIT ?",
+            (keep, limit),
+        )
+    ]
+
+
+def oldest_interactions(conn, limit: int) -> list:
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT id FROM interactions ORDER BY id LIMIT ?", (limit,)
+        )
+    ]
+
+
+def export_interactions(conn, ids) -> list:
+    """Interaktionen als Dicts (alle Spalten außer dem alten Inline-Bild) in id-Reihenfolge."""
+    placeholders = ", ".join("?" * len(ids))
+    cur = conn.execute(
+        f"SELECT * FROM interactions WHERE id IN ({placeholders}) ORDER BY id", ids
+    )
+    names = [column[0] for column in cur.description]
+    rows = [dict(zip(names, row)) for row in cur]
+    for row in rows:
+        row.pop("image", None)
+    return rows
+
+
+def export_images(conn, hashes) -> list:
+    """[(sha256, format, width, height, bytes)] der Bilder, auch ausgelagerter."""
+    placeholders = ", ".join("?" * len(hashes))
+    return conn.execute(
+        f"SELECT sha256, format, width, height, CASE WHEN external THEN external_image(sha256) ELSE data END FROM images WHERE sha256 IN ({placeholders})",
+        list(hashes),
+    ).fetchall()
+
+
+def delete_interactions(conn, ids) -> int:
+    """
+    Löscht Interaktionen (im Writer-Thread). Trigger geben Bilder frei und
+    räumen Volltextindex und Vektoren auf; leere Sitzungen fallen mit weg.
+    """
+    placeholders = ", ".join("?" * len(ids))
+    sessions = [
+        row[0]
+        for row in conn.execute(
+            f"SELECT DISTINCT session_id FROM interactions WHERE id IN ({placeholders}) AND session_id IS NOT NULL",
+            ids,
+        )
+    ]
+    deleted = conn.execute(
+        f"DELETE FROM interactions WHERE id IN ({placeholders})", ids
+    ).rowcount
+    if sessions:
+        placeholders = ", ".join("?" * len(sessions))
+        conn.execute(
+            f"DELETE FROM sessions WHERE id IN ({placeholders}) AND NOT EXISTS (SELECT 1 FROM interactions WHERE session_id = sessions.id)",
+            sessions,
+        )
+    return deleted
+
+
+def inline_images(conn, limit: int) -> list:
+    """[(sha256, bytes)] der nächsten noch in der Datenbank liegenden Bilder."""
+    return conn.execute(
+        "SELECT sha256, data FROM images WHERE external = 0 LIMIT ?", (limit,)
+    ).fetchall()
+
+
+def mark_external(conn, images) -> list:
+    """
+    Setzt [(sha256, size)] auf ausgelagert und leert data (im Writer-Thread).
+    Liefert die Hashes, deren Zeile inzwischen gelöscht war.
+    """
+    missing = []
+    for sha256, size in images:
+        cur = conn.execute(
+            "UPDATE images SET data = X'', external = 1, size = ? WHERE sha256 = ? AND external = 0",
+            (size, sha256),
+        )
+        if cur.rowcount == 0:
+            missing.append(sha256)
+    return missing
+
+
+def take_blob_trash(conn, limit: int) -> list:
+    """
+    Entnimmt bis zu limit Hashes aus blob_trash (im Writer-Thread). Geliefert
+    werden nur die, deren Datei gelöscht werden darf: Wurde dasselbe Bild
+    inzwischen erneut gespeichert und ausgelagert, bleibt die Datei.
+    """
+    hashes = [
+        row[0]
+        for row in conn.execute("SELECT sha256 FROM blob_trash LIMIT ?", (limit,))
+    ]
+    if not hashes:
+        return []
+    placeholders = ", ".join("?" * len(hashes))
+    conn.execute(f"DELETE FROM blob_trash WHERE sha256 IN ({placeholders})", hashes)
+    still_used = {
+        row[0]
+        for row in conn.execute(
+            f"SELECT sha256 FROM images WHERE external = 1 AND sha256 IN ({placeholders})",
+            hashes,
+        )
+    }
+    return [sha256 for sha256 in hashes if sha256 not in still_used]
+
+
+def storage_usage(conn) -> dict:
+    """Belegte Bytes: Datenbankseiten (ohne freie Seiten) und ausgelagerte Bilder."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    external = conn.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM images WHERE external = 1"
+    ).fetchone()[0]
+    return {
+        "database": (pages - free) * page_size,
+        "free": free * page_size,
+        "external": external,
+        "total": (pages - free) * page_size + external,
+    }
+
+
+def incremental_vacuum(conn, pages: int) -> int:
+    """
+    Gibt bis zu pages freie Seiten an das Dateisystem zurück (nur mit
+    auto_vacuum=INCREMENTAL) und liefert deren Anzahl. Ein Aufruf, eine
+    kurze eigene Schreibtransaktion; busy_timeout wartet dabei auf den
+    Writer. Über executescript, weil execute() das Pragma nach dem ersten
+    Schritt (= einer Seite) beendet. Nicht im Writer-Thread aufrufen:
+    executescript schreibt eine offene Transaktion vorher fest.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free:
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+    return free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def merge_fts(conn, pages: int = 500):
+    """Fasst Segmente des Volltextindex schrittweise zusammen (nach vielen Löschungen)."""
+    if _has_fts(conn):
+        conn.execute(
+            "INSERT INTO interactions_fts(interactions_fts, rank) VALUES('merge', ?)",
+            (pages,),
+        )
+
+
+def vacuum(conn):
+    """
+    Schreibt die Datenbank komplett neu (VACUUM) und stellt dabei auf
+    auto_vacuum=INCREMENTAL um. Blockiert alle Schreiber; nur bei Bedarf
+    und am besten bei beendeter App aufrufen.
+    """
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+"""
+Semantische Suche über frühere Antworten.
+
+EmbeddingIndexer bettet neue Antworten im Hintergrund ein (Ollama
+/api/embed, in Batches, nur wenn der Scheduler nichts wartend hat) und
+speichert die Vektoren normiert als float16-BLOB in der Tabelle embeddings
+(768 Dimensionen = 1,5 KB pro Antwort). VectorIndex hält dieselben
+Vektoren als float16-Matrix im Speicher und sucht per Skalarprodukt
+(= Kosinus-Ähnlichkeit). Bis exact_limit Einträge wird exakt gesucht,
+darüber über einen IVF-Index: k-Means-Zentren (ca. √n), jeder Vektor gehört
+zur Liste seines nächsten Zentrums, verglichen wird nur mit den Vektoren
+der nprobe ähnlichsten Listen.
+"""
+
+import logging
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from pro_analyzer.database import iter_embeddings, pending_embeddings, store_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors) -> np.ndarray:
+    """Zeilen auf Länge 1 bringen (float32); Nullvektoren bleiben null."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def to_blob(vector) -> bytes:
+    return normalize(vector).astype(np.float16).tobytes()
+
+
+def from_blobs(blobs) -> np.ndarray:
+    """Mehrere gleich lange BLOBs als (n, dim)-Matrix (float16), ohne Schleife."""
+    data = np.frombuffer(b"".join(blobs), dtype=np.float16)
+    return data.reshape(len(blobs), -1)
+
+
+def _kmeans(sample: np.ndarray, clusters: int, iterations: int, rng) -> np.ndarray:
+    """Sphärisches k-Means (Skalarprodukt statt Abstand) auf normierten Vektoren."""
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)]
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(labels, kind="stable")
+        present, starts = np.unique(labels[order], return_index=True)
+        # Leere Cluster behalten ihr altes Zentrum
+        centroids = centroids.copy()
+        centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Kosinus-Suche über normierte Vektoren (thread-sicher).
+
+    add() hängt an (Kapazität verdoppelt sich bei Bedarf), remove() entfernt
+    gelöschte Interaktionen wieder, search() liefert [(id, score), ...]
+    absteigend. train() baut den IVF-Index und darf lange laufen: gesucht und
+    ergänzt wird währenddessen weiter, neue Vektoren landen danach direkt in
+    der Liste ihres nächsten Zentrums.
+    """
+
+    def __init__(
+        self,
+        exact_limit: int = 20_000,
+        nprobe: int = 16,
+        chunk_size: int = 16_384,
+        train_points_per_list: int = 32,
+    ):
+        self.exact_limit = exact_limit
+        self.nprobe = nprobe
+        self.chunk_size = chunk_size  # Zeilen pro float16->float32-Umwandlung
+        self.train_points_per_list = train_points_per_list
+        self.dim = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, 0), dtype=np.float16)
+        self._lists = np.empty(0, dtype=np.int32)  # IVF-Liste je Zeile
+        self._centroids = None
+        self._trained_size = 0
+        self._size = 0
+        self._compactions = 0  # zählt remove(), das Zeilen verschoben hat
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def max_id(self) -> int:
+        with self._lock:
+            return int(self._ids[: self._size].max()) if self._size else 0
+
+    @property
+    def needs_training(self) -> bool:
+        """Ab exact_limit Einträgen, und erneut, wenn sich der Bestand vervierfacht hat."""
+        return self._size > self.exact_limit and self._size > 4 * self._trained_size
+
+    def add(self, ids, vectors):
+        vectors = normalize(np.atleast_2d(vectors))
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(vectors):
+            raise ValueError("ids und vectors müssen gleich lang sein.")
+        if not len(ids):
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._vectors = np.empty((0, self.dim), dtype=np.float16)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Vektor hat {vectors.shape[1]} statt {self.dim} Dimensionen."
+                )
+            end = self._size + len(ids)
+            if end > len(self._ids):
+                self._grow(max(end, 2 * len(self._ids), 1024))
+            self._vectors[self._size : end] = vectors
+            self._ids[self._size : end] = ids
+            if self._centroids is not None:
+                self._lists[self._size : end] = self._assign(vectors, self._centroids)
+            self._size = end
+
+    def remove(self, ids) -> int:
+        """Entfernt die Vektoren zu ids; liefert die Anzahl entfernter Zeilen."""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            if not self._size or not len(ids):
+                return 0
+            keep = ~np.isin(self._ids[: self._size], ids)
+            removed = self._size - int(np.count_nonzero(keep))
+            if removed:
+                # Neue, passend große Arrays: gibt den Speicher frei und lässt
+                # den Schnappschuss eines laufenden train() unverändert
+                self._vectors = self._vectors[: self._size][keep]
+                self._ids = self._ids[: self._size][keep]
+                self._lists = self._lists[: self._size][keep]
+                self._size -= removed
+                self._compactions += 1
+            return removed
+
+    def _grow(self, capacity: int):
+        vectors = np.empty((capacity, self.dim), dtype=np.float16)
+        vectors[: self._size] = self._vectors[: self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        lists = np.empty(capacity, dtype=np.int32)
+        lists[: self._size] = self._lists[: self._size]
+        self._vectors, self._ids, self._lists = vectors, ids, lists
+
+    def _assign(self, vectors, centroids) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), self.chunk_size):
+            chunk = np.asarray(vectors[start : start + self.chunk_size], np.float32)
+            labels[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return labels
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """Baut den IVF-Index über den aktuellen Bestand (ohne die Sperre zu halten)."""
+        rng = np.random.default_rng(seed)
+        with self._lock:
+            size, vectors, compactions = self._size, self._vectors, self._compactions
+        if size <= self.exact_limit:
+            return
+        clusters = int(np.clip(np.sqrt(size), 16, 4096))
+        sample_size = min(size, clusters * self.train_points_per_list)
+        # Die ersten size Zeilen ändern sich nicht mehr (add hängt nur an,
+        # remove() legt neue Arrays an)
+        sample = vectors[np.sort(rng.choice(size, sample_size, replace=False))]
+        centroids = _kmeans(sample.astype(np.float32), clusters, iterations, rng)
+        labels = self._assign(vectors[:size], centroids)
+        with self._lock:
+            if compactions != self._compactions:
+                # remove() hat Zeilen verschoben: alles neu zuordnen
+                size, labels = 0, np.empty(0, dtype=np.int32)
+            # Was seit dem Schnappschuss hinzukam, ebenfalls zuordnen
+            rest = self._assign(self._vectors[size : self._size], centroids)
+            self._lists[:size] = labels
+            self._lists[size : self._size] = rest
+            self._centroids = centroids
+            self._trained_size = self._size
+        logger.info("Vektorindex: %d Einträge in %d Listen", size, clusters)
+
+    def search(self, query, k: int = 10):
+        query = normalize(query).ravel()
+        with self._lock:
+            size = self._size
+            if not size:
+                return []
+            if self._centroids is None or size <= self.exact_limit:
+                candidates = None
+            else:
+                similarity = self._centroids @ query
+                nprobe = min(self.nprobe, len(similarity))
+                probes = np.argpartition(-similarity, nprobe - 1)[:nprobe]
+                probed = np.zeros(len(similarity), dtype=bool)
+                probed[probes] = True
+                candidates = np.flatnonzero(probed[self._lists[:size]])
+            count = size if candidates is None else len(candidates)
+            if not count:
+                return []  # alle durchsuchten IVF-Listen leer
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, self.chunk_size):
+                stop = min(start + self.chunk_size, count)
+                rows = (
+                    self._vectors[start:stop]
+                    if candidates is None
+                    else self._vectors[candidates[start:stop]]
+                )
+                scores[start:stop] = rows.astype(np.float32) @ query
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            rows = top if candidates is None else candidates[top]
+            return [(int(i), float(s)) for i, s in zip(self._ids[rows], scores[top])]
+
+
+class EmbeddingIndexer:
+    """
+    Hintergrund-Thread: holt neue Antworten aus der Datenbank, bettet sie in
+    Batches ein, speichert die Vektoren über den Writer und ergänzt den
+    VectorIndex. embed(texts) -> Vektoren; idle() -> True, wenn Ollama gerade
+    frei ist (sonst wird gewartet, Analysen gehen vor).
+    """
+
+    def __init__(
+        self,
+        db,
+        index: VectorIndex,
+        embed: Callable,
+        model: str,
+        batch_size: int = 32,
+        poll_interval: float = 10.0,
+        retry_interval: float = 60.0,
+        max_chars: int = 2000,
+        idle: Optional[Callable[[], bool]] = None,
+    ):
+        self.db = db
+        self.index = index
+        self.embed = embed
+        self.model = model
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.max_chars = max_chars  # lange Antworten nur anteilig einbetten
+        self.idle = idle or (lambda: True)
+        self.last_id = 0  # höchste bereits geprüfte Interaktions-ID
+        self.last_error = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Lädt einmalig die gespeicherten Vektoren dieses Modells in den Index."""
+        with self._load_lock:
+            if self._loaded:
+                return
+            for rows in iter_embeddings(self.db.connection(), self.model):
+                self.index.add(
+                    [row[0] for row in rows], from_blobs([r[1] for r in rows])
+                )
+            self.last_id = self.index.max_id
+            self._loaded = True
+        logger.info("Vektorindex: %d gespeicherte Vektoren geladen", len(self.index))
+
+    def run_once(self) -> int:
+        """Bettet den nächsten Batch ein; liefert die Anzahl neuer Vektoren."""
+        rows = pending_embeddings(self.db.connection(), self.last_id, self.batch_size)
+        if not rows:
+            return 0
+        texts = list(dict.fromkeys(response[: self.max_chars] for _, response in rows))
+        vectors = dict(zip(texts, normalize(self.embed(texts))))
+        ids = [row_id for row_id, _ in rows]
+        matrix = np.stack([vectors[response[: self.max_chars]] for _, response in rows])
+        blobs = [to_blob(vector) for vector in matrix]
+        self.db.submit(self._store, ids, blobs, matrix).result()
+        self.last_id = ids[-1]
+        return len(ids)
+
+    def _store(self, conn, ids, blobs, matrix):
+        """
+        Speichert und ergänzt den Index im Writer-Thread: Interaktionen, die
+        inzwischen gelöscht wurden, kommen so weder in die Tabelle noch zurück
+        in den Index, nachdem remove() sie schon entfernt hat.
+        """
+        stored = set(store_embeddings(conn, self.model, list(zip(ids, blobs))))
+        keep = [i for i, row_id in enumerate(ids) if row_id in stored]
+        if keep:
+            self.index.add([ids[i] for i in keep], matrix[keep])
+
+    def remove(self, ids) -> int:
+        """Nach dem Löschen von Interaktionen (StorageMaintenance, on_delete)."""
+        with self._load_lock:  # nicht zwischen zwei Blöcke von load()
+            return self.index.remove(ids)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="embedding-indexer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Gespeicherte Vektoren konnten nicht geladen werden")
+        while not self._stop.is_set():
+            delay = self.poll_interval
+            if self.idle():
+                try:
+                    if self.run_once() == self.batch_size:
+                        delay = 0  # Rückstand: direkt weiter
+                    self.last_error = None
+                except Exception as e:
+                    if str(e) != str(self.last_error):
+                        logger.warning("Einbetten fehlgeschlagen: %s", e)
+                    self.last_error = e
+                    delay = self.retry_interval
+                if self.index.needs_training:
+                    self.index.train()
+            else:
+                delay = min(delay, 1.0)
+            self._stop.wait(delay)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bild-Ingest: ein Upload wird genau einmal dekodiert/normalisiert und
+komprimiert. Das Ergebnis (IngestedImage) bleibt in der Sitzung und liefert
+dieselben Bytes für den Ollama-Aufruf, die Datenbank und den PDF-Report.
+
+Liegt das Original bereits als JPEG oder PNG vor und muss nicht gedreht
+werden (EXIF-Orientierung), werden die Original-Bytes unverändert übernommen.
+"""
+
+import base64
+import hashlib
+import io
+from dataclasses import dataclass
+from functools import cached_property
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+PASSTHROUGH_FORMATS = ("JPEG", "PNG")
+JPEG_QUALITY = 90
+EXIF_ORIENTATION = 274
+
+
+@dataclass
+class IngestedImage:
+    data: bytes  # komprimierte Bild-Bytes (JPEG oder PNG)
+    format: str  # "JPEG" oder "PNG"
+    sha256: str  # Hex-Digest von data
+    width: int
+    height: int
+
+    @cached_property
+    def base64(self) -> str:
+        """Base64-Kodierung für die Ollama-API (wird nur einmal berechnet)."""
+        return base64.b64encode(self.data).decode("ascii")
+
+    def to_pil(self) -> PILImage.Image:
+        return PILImage.open(io.BytesIO(self.data))
+
+
+def _from_bytes(data: bytes, fmt: str, width: int, height: int) -> IngestedImage:
+    return IngestedImage(
+        data=data,
+        format=fmt,
+        sha256=hashlib.sha256(data).hexdigest(),
+        width=width,
+        height=height,
+    )
+
+
+def encode_image(image_pil: PILImage.Image) -> IngestedImage:
+    """Kodiert ein dekodiertes Bild einmalig (PNG bei Transparenz, sonst JPEG)."""
+    buf = io.BytesIO()
+    if image_pil.mode in ("RGBA", "LA") or (
+        image_pil.mode == "P" and "transparency" in image_pil.info
+    ):
+        fmt = "PNG"
+        image_pil.save(buf, format=fmt)
+    else:
+        fmt = "JPEG"
+        if image_pil.mode != "RGB":
+            image_pil = image_pil.convert("RGB")
+        image_pil.save(buf, format=fmt, quality=JPEG_QUALITY)
+    return _from_bytes(buf.getvalue(), fmt, *image_pil.size)
+
+
+def _ingest_pil(image_pil: PILImage.Image, original: bytes = None) -> IngestedImage:
+    needs_rotation = image_pil.getexif().get(EXIF_ORIENTATION, 1) != 1
+    if original is None and not needs_rotation:
+        # z.B. von gr.Image(type="pil"): Originaldatei noch lesbar
+        path = getattr(image_pil, "filename", None)
+        if path and image_pil.format in PASSTHROUGH_FORMATS:
+            with open(path, "rb") as f:
+                original = f.read()
+    if original is not None and not needs_rotation:
+        if image_pil.format in PASSTHROUGH_FORMATS:
+            return _from_bytes(original, image_pil.format, *image_pil.size)
+    return encode_image(ImageOps.exif_transpose(image_pil))
+
+
+def ingest_image(source) -> IngestedImage:
+    """
+    Nimmt ein Bild als Dateipfad, Bytes, PIL-Bild oder numpy-Array entgegen
+    und liefert ein IngestedImage. Nur wenn nötig wird neu kodiert.
+    """
+    if isinstance(source, IngestedImage):
+        return source
+    if isinstance(source, PILImage.Image):
+        return _ingest_pil(source)
+    if hasattr(source, "__array_interface__"):
+        # numpy-Array (Gradio type="numpy"); ohne numpy zu importieren
+        return encode_image(PILImage.fromarray(source))
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    return _ingest_pil(PILImage.open(io.BytesIO(data)), original=data)
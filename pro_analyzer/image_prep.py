@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""
+Modellabhängige Bildvorverarbeitung vor der Inferenz.
+
+Vision-Modelle wie qwen2.5-VL skalieren Bilder intern ohnehin auf ein Raster
+aus Patches; die Zahl der visuellen Tokens wächst mit der Pixelzahl. Wir
+verkleinern deshalb vorab auf eine maximale Pixelzahl (ausgerichtet am
+Patch-Raster des Modells) und wählen Format/Qualität je Quick Action:
+verlustfrei für OCR, kräftige JPEG-Kompression für Beschreibung/Bewertung.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+
+from PIL import Image as PILImage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelImagePolicy:
+    max_pixels: int = 1280 * 28 * 28
+    min_pixels: int = 4 * 28 * 28
+    align: int = 28  # Kantenlängen werden auf Vielfache davon gerundet
+    pixels_per_token: int = 28 * 28  # Fläche eines visuellen Tokens
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    format: str  # "JPEG" oder "PNG"
+    quality: int = 85  # nur für JPEG
+    lossless: bool = False
+
+
+DEFAULT_POLICY = ModelImagePolicy()
+LOSSLESS = EncodeProfile("PNG", lossless=True)
+HIGH_QUALITY = EncodeProfile("JPEG", quality=90)
+STANDARD = EncodeProfile("JPEG", quality=85)
+AGGRESSIVE = EncodeProfile("JPEG", quality=70)
+
+
+def policy_for_model(model: str, policies: dict) -> ModelImagePolicy:
+    """Sucht die Policy zum Modellnamen ("qwen2.5vl:7b" passt auf "qwen2.5vl")."""
+    if model in policies:
+        return policies[model]
+    return policies.get(model.split(":", 1)[0], DEFAULT_POLICY)
+
+
+def target_size(width: int, height: int, policy: ModelImagePolicy):
+    """
+    Zielgröße (Breite, Höhe): unverändert, solange die Pixelzahl unter
+    max_pixels liegt, sonst seitenverhältnistreu verkleinert und auf
+    policy.align abgerundet.
+    """
+    if width * height <= policy.max_pixels:
+        return width, height
+    scale = math.sqrt(policy.max_pixels / (width * height))
+    a = policy.align
+    w = max(a, math.floor(width * scale / a) * a)
+    h = max(a, math.floor(height * scale / a) * a)
+    return w, h
+
+
+def estimate_visual_tokens(width: int, height: int, policy: ModelImagePolicy) -> int:
+    """Schätzt die visuellen Tokens wie das Modell: Raster nach Runden auf align."""
+    a = policy.align
+    w = max(a, round(width / a) * a)
+    h = max(a, round(height / a) * a)
+    pixels = min(max(w * h, policy.min_pixels), policy.max_pixels)
+    return math.ceil(pixels / policy.pixels_per_token)
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    format: str
+    width: int
+    height: int
+    visual_tokens: int
+
+    @cached_property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+    @cached_property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("ascii")
+
+
+# Kleiner LRU, damit Folgefragen zum selben Bild nicht neu skaliert/kodiert werden
+_PREPARED_CACHE_SIZE = 32
+_prepared_cache = OrderedDict()
+_prepared_lock = threading.Lock()
+
+
+def prepare_for_inference(image, policy: ModelImagePolicy, profile: EncodeProfile):
+    """
+    Liefert die an Ollama zu sendenden Bytes für ein IngestedImage.
+    Ohne Verkleinerung werden die Original-Bytes durchgereicht, sofern eine
+    Neukodierung nichts bringt (verlustfreies Profil oder JPEG-Original).
+    """
+    key = (image.sha256, policy, profile)
+    with _prepared_lock:
+        prepared = _prepared_cache.get(key)
+        if prepared is not None:
+            _prepared_cache.move_to_end(key)
+    if prepared is None:
+        prepared = _prepare(image, policy, profile)
+        with _prepared_lock:
+            _prepared_cache[key] = prepared
+            while len(_prepared_cache) > _PREPARED_CACHE_SIZE:
+                _prepared_cache.popitem(last=False)
+    logger.info(
+        "Bild-Payload: %dx%d -> %dx%d %s, %.1f KB, ca. %d visuelle Tokens",
+        image.width,
+        image.height,
+        prepared.width,
+        prepared.height,
+        prepared.format,
+        len(prepared.data) / 1024,
+        prepared.visual_tokens,
+    )
+    return prepared
+
+
+def _prepare(image, policy: ModelImagePolicy, profile: EncodeProfile):
+    width, height = target_size(image.width, image.height, policy)
+    resize = (width, height) != (image.width, image.height)
+    if not resize and (profile.lossless or image.format == "JPEG"):
+        data, fmt = image.data, image.format
+    else:
+        image_pil = image.to_pil()
+        if resize:
+            image_pil = image_pil.resize((width, height), PILImage.LANCZOS)
+        buf = io.BytesIO()
+        if profile.format == "JPEG":
+            if image_pil.mode != "RGB":
+                image_pil = image_pil.convert("RGB")
+            image_pil.save(buf, format="JPEG", quality=profile.quality)
+        else:
+            image_pil.save(buf, format=profile.format)
+        data, fmt = buf.getvalue(), profile.format
+    return PreparedImage(
+        data, fmt, width, height, estimate_visual_tokens(width, height, policy)
+    )
+
+
+def make_thumbnail(data: bytes, size: int) -> PILImage.Image:
+    """
+    Vorschaubild (längste Seite size) für den Verlauf. Bei JPEGs dekodiert
+    draft() gleich in reduzierter Auflösung, statt das volle Foto zu laden.
+    """
+    image_pil = PILImage.open(io.BytesIO(data))
+    image_pil.draft("RGB", (size, size))
+    image_pil.thumbnail((size, size))
+    return image_pil.convert("RGB")
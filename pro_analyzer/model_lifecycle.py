@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lebenszyklus des Modells auf den Ollama-Hosts: Vorwärmen und keep_alive.
+
+Ollama entlädt Modelle nach keep_alive (Standard 5 Minuten); die erste Frage
+danach zahlt das komplette Laden. ModelLifecycle
+- wärmt das Modell beim Start im Hintergrund vor (leerer /api/generate-Aufruf),
+- liefert je nach Uhrzeit den passenden keep_alive-Wert (KeepAlivePolicy),
+- hält das Modell während der Geschäftszeiten geladen und
+- wärmt beim Bild-Upload vor, bevor die erste Frage gestellt wird.
+Ob ein Host das Modell geladen hat, kommt aus den /api/ps-Health-Checks des
+BackendPool.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Union
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class KeepAlivePolicy:
+    """keep_alive-Werte im Ollama-Format ("10m", "2h", -1 = dauerhaft)."""
+
+    business_keep_alive: Union[str, int] = "2h"
+    off_hours_keep_alive: Union[str, int] = "10m"
+    business_hours: tuple = (7, 19)  # [Beginn, Ende) in Stunden, lokale Zeit
+    business_days: tuple = (0, 1, 2, 3, 4)  # Montag = 0
+    keep_warm_in_business_hours: bool = True  # entladene Modelle aktiv nachladen
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        start, end = self.business_hours
+        return now.weekday() in self.business_days and start <= now.hour < end
+
+    def keep_alive(self, now: Optional[datetime] = None) -> Union[str, int]:
+        if self.in_business_hours(now):
+            return self.business_keep_alive
+        return self.off_hours_keep_alive
+
+
+class ModelLifecycle:
+    def __init__(
+        self,
+        pool,
+        model: str,
+        policy: Optional[KeepAlivePolicy] = None,
+        check_interval: float = 60.0,
+        warm_timeout: float = 180.0,
+    ):
+        """
+        pool: BackendPool, dessen Health-Checks loaded_models pflegen.
+        check_interval: Sekunden zwischen zwei Prüfungen im Hintergrund.
+        warm_timeout: Read-Timeout für das Laden des Modells.
+        """
+        self.pool = pool
+        self.model = model
+        self.policy = policy or KeepAlivePolicy()
+        self.check_interval = check_interval
+        self.warm_timeout = warm_timeout
+        self._lock = threading.Lock()
+        self._warming = set()  # URLs der Hosts, die gerade laden
+        self._started_warm = False  # Vorwärmen beim Start erledigt
+        self._stop = threading.Event()
+        self._thread = None
+
+    def keep_alive(self) -> Union[str, int]:
+        """keep_alive für die nächste Anfrage (Teil jedes generate-Payloads)."""
+        return self.policy.keep_alive()
+
+    def is_loaded(self) -> bool:
+        """True, wenn mindestens ein gesunder Host das Modell geladen hat (/api/ps)."""
+        return any(
+            b.healthy and self.model in b.loaded_models for b in self.pool.backends
+        )
+
+    def prewarm(self):
+        """
+        Lädt das Modell im Hintergrund auf allen gesunden Hosts, die es
+        installiert (/api/tags), aber nicht geladen haben.
+        """
+        for backend in self.pool.backends:
+            if not backend.healthy or self.model in backend.loaded_models:
+                continue
+            if self.model not in backend.models:
+                continue  # nicht installiert: Vorwärmen liefe nur in einen 404
+            with self._lock:
+                if backend.url in self._warming:
+                    continue
+                self._warming.add(backend.url)
+            threading.Thread(
+                target=self._warm, args=(backend,), name="model-warmup", daemon=True
+            ).start()
+
+    def _warm(self, backend):
+        start = time.perf_counter()
+        try:
+            # generate ohne Prompt lädt nur das Modell und setzt keep_alive;
+            # als offene Anfrage gezählt, damit das Routing den ladenden Host meidet
+            with self.pool.track(backend, measure_latency=False):
+                response = backend.client.generate(
+                    {
+                        "model": self.model,
+                        "keep_alive": self.keep_alive(),
+                        "stream": False,
+                    },
+                    read_timeout=self.warm_timeout,
+                )
+                response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.warning(
+                "Vorwärmen von %s auf %s fehlgeschlagen: %s", self.model, backend.url, e
+            )
+        else:
+            self.pool.mark_loaded(backend, self.model)
+            self._started_warm = True
+            logger.info(
+                "%s auf %s geladen (%.1f s)",
+                self.model,
+                backend.url,
+                time.perf_counter() - start,
+            )
+        finally:
+            with self._lock:
+                self._warming.discard(backend.url)
+
+    def start(self):
+        """Startet Vorwärmen und keep_alive-Pflege im Hintergrund."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="model-lifecycle", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            # Erst nach dem ersten Health-Check warm machen (loaded_models bekannt)
+            probed = any(b.last_probe is not None for b in self.pool.backends)
+            if probed and self.is_loaded():
+                self._started_warm = True
+            if probed and (
+                not self._started_warm
+                or (
+                    self.policy.keep_warm_in_business_hours
+                    and self.policy.in_business_hours()
+                )
+            ):
+                self.prewarm()
+            self._stop.wait(self.check_interval if probed else 1.0)
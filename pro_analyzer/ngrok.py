@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Öffentlicher Link über ngrok (python pro_analyzer_app.py --ngrok).
+
+Startet ngrok als Hintergrundprozess und liest die öffentliche URL über die
+lokale ngrok-API (Port 4040). Den Pfad zur ngrok.exe legt NGROK_PATH fest;
+ohne Angabe wird die Chocolatey-Installation bzw. ngrok aus dem PATH genutzt.
+"""
+
+import os
+import shutil
+import subprocess
+import time
+
+import requests
+
+# C:\ProgramData\chocolatey\bin (alternativ z.B. C:\ngrok\ngrok.exe)
+DEFAULT_NGROK_PATH = "C:\\ProgramData\\chocolatey\\bin\\ngrok.exe"
+
+
+def ngrok_executable() -> str:
+    configured = os.environ.get("NGROK_PATH")
+    if configured:
+        return configured
+    if os.path.exists(DEFAULT_NGROK_PATH):
+        return DEFAULT_NGROK_PATH
+    return shutil.which("ngrok") or DEFAULT_NGROK_PATH
+
+
+def start_ngrok(port=7860):
+    # Starte ngrok als Hintergrundprozess
+    ngrok = subprocess.Popen(
+        [ngrok_executable(), "http", str(port)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    # Warte kurz, bis ngrok gestartet ist
+    time.sleep(2)
+    # Hole die öffentliche URL von ngrok
+    try:
+        url = None
+        for _ in range(10):
+            try:
+                tunnel_info = requests.get("http://127.0.0.1:4040/api/tunnels").json()
+                url = tunnel_info["tunnels"][0]["public_url"]
+                break
+            except Exception:
+                time.sleep(1)
+        if url:
+            print(f"\n*** Deine App ist öffentlich erreichbar unter: {url} ***\n")
+            print("Diesen Link kannst du teilen, solange dieses Fenster geöffnet ist.")
+        else:
+            print("ngrok gestartet, aber kein öffentlicher Link gefunden.")
+    except Exception as e:
+        print("ngrok gestartet, aber konnte keinen Link abrufen.", e)
+    return ngrok
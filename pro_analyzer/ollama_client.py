@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP-Client-Schicht für alle Aufrufe an Ollama.
+
+Statt für jeden Aufruf ein nacktes requests.post (= neue TCP-Verbindung) zu
+verwenden, hält OllamaClient eine persistente requests.Session mit begrenztem
+Keep-Alive-Pool. AsyncOllamaClient ist die asynchrone Variante auf Basis von
+httpx (kommt mit gradio mit). Beide messen jeden Aufruf (CallRecord) und
+führen einfache Zähler (ClientStats). Laufende generate-Aufrufe lassen
+sich über ein AbortHandle abbrechen (asynchron: Task abbrechen).
+"""
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ProtocolError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 120.0
+
+
+@dataclass
+class CallRecord:
+    """Messwerte eines einzelnen HTTP-Aufrufs."""
+
+    method: str
+    path: str
+    status: Optional[int]
+    duration: float  # Sekunden bis Antwort-Header (bei Streams: Time-to-first-byte)
+    stream: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class ClientStats:
+    """Laufende Zähler über alle Aufrufe eines Clients (thread-sicher)."""
+
+    calls: int = 0
+    errors: int = 0
+    total_duration: float = 0.0
+    recent: deque = field(default_factory=lambda: deque(maxlen=256))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, call: CallRecord):
+        with self._lock:
+            self.calls += 1
+            self.total_duration += call.duration
+            if call.error is not None:
+                self.errors += 1
+            self.recent.append(call)
+
+
+_current_call = threading.local()  # AbortHandle des laufenden Aufrufs in diesem Thread
+
+
+class AbortHandle:
+    """
+    Bricht einen laufenden Aufruf aus einem anderen Thread ab, auch während
+    noch auf die Antwort-Header gewartet wird (Ollama sendet sie erst nach
+    Laden und Prefill). Die Verbindung wird per shutdown() getrennt; das
+    weckt ein blockiertes recv, und Ollama beendet die Generierung.
+    Nur innerhalb von "with AbortHandle() as handle:" wirksam, damit eine
+    später wiederverwendete Pool-Verbindung nicht getroffen wird.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connection = None
+        self._closed = False
+        self.aborted = False
+
+    def abort(self):
+        with self._lock:
+            if self._closed:
+                return
+            self.aborted = True
+            self._shutdown()
+
+    def _attach(self, connection):
+        with self._lock:
+            if not self._closed:
+                self._connection = connection
+                if self.aborted:
+                    self._shutdown()
+
+    def _shutdown(self):  # Aufrufer hält self._lock
+        sock = getattr(self._connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._closed = True
+            self._connection = None
+
+
+class _AbortableMixin:
+    """Meldet die Verbindung beim AbortHandle des aufrufenden Threads an."""
+
+    def connect(self):
+        super().connect()
+        handle = getattr(_current_call, "handle", None)
+        if handle is not None:
+            handle._attach(self)
+
+    def request(self, *args, **kwargs):
+        handle = getattr(_current_call, "handle", None)
+        if handle is not None:
+            if handle.aborted:
+                raise ProtocolError("Aufruf abgebrochen")
+            handle._attach(self)
+        return super().request(*args, **kwargs)
+
+
+class _AbortableHTTPConnection(_AbortableMixin, HTTPConnection):
+    pass
+
+
+class _AbortableHTTPSConnection(_AbortableMixin, HTTPSConnection):
+    pass
+
+
+class _AbortableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _AbortableHTTPConnection
+
+
+class _AbortableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _AbortableHTTPSConnection
+
+
+class _AbortableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _AbortableHTTPConnectionPool,
+            "https": _AbortableHTTPSConnectionPool,
+        }
+
+
+class _ClientBase:
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        on_call: Optional[Callable[[CallRecord], None]] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.on_call = on_call
+        self.stats = ClientStats()
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _record(self, call: CallRecord):
+        self.stats.record(call)
+        logger.debug(
+            "%s %s -> %s in %.3fs%s",
+            call.method,
+            call.path,
+            call.status,
+            call.duration,
+            f" ({call.error})" if call.error else "",
+        )
+        if self.on_call is not None:
+            try:
+                self.on_call(call)
+            except Exception:
+                logger.exception("on_call-Hook fehlgeschlagen")
+
+
+class OllamaClient(_ClientBase):
+    """
+    Synchroner Ollama-Client mit persistentem Verbindungspool.
+
+    pool_size begrenzt die gleichzeitig offenen Verbindungen zum Host;
+    weitere Aufrufe warten auf eine freie Verbindung (pool_block), statt
+    Sockets zu erschöpfen. Timeouts sind getrennt nach Verbindungsaufbau
+    und Lesen (bei Streams: Zeit zwischen zwei Chunks).
+    """
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.session = requests.Session()
+        adapter = _AbortableAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, pool_block=True
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        json=None,
+        stream: bool = False,
+        read_timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """Führt einen instrumentierten Aufruf aus; Fehler werden wie bei requests geworfen."""
+        timeout = (
+            self.connect_timeout,
+            self.read_timeout if read_timeout is None else read_timeout,
+        )
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self._url(path), json=json, stream=stream, timeout=timeout
+            )
+        except requests.exceptions.RequestException as e:
+            self._record(
+                CallRecord(
+                    method,
+                    path,
+                    None,
+                    time.perf_counter() - start,
+                    stream,
+                    type(e).__name__,
+                )
+            )
+            raise
+        error = None if response.ok else f"HTTP {response.status_code}"
+        self._record(
+            CallRecord(
+                method,
+                path,
+                response.status_code,
+                time.perf_counter() - start,
+                stream,
+                error,
+            )
+        )
+        return response
+
+    def generate(
+        self,
+        payload: dict,
+        read_timeout: Optional[float] = None,
+        abort: Optional[AbortHandle] = None,
+    ):
+        """
+        POST /api/generate; bei payload["stream"] wird die Antwort gestreamt.
+        Mit abort (AbortHandle) lässt sich der Aufruf aus einem anderen Thread
+        abbrechen; die Antwort wird dann immer erst beim Lesen geladen, damit
+        auch das Lesen des Bodys abbrechbar ist.
+        """
+        _current_call.handle = abort
+        try:
+            return self.request(
+                "POST",
+                "/api/generate",
+                json=payload,
+                stream=bool(payload.get("stream")) or abort is not None,
+                read_timeout=read_timeout,
+            )
+        finally:
+            _current_call.handle = None
+
+    def embed(self, model: str, inputs, read_timeout: Optional[float] = None) -> list:
+        """POST /api/embed: ein Vektor je Eingabetext (zu lange Texte kürzt Ollama)."""
+        response = self.request(
+            "POST",
+            "/api/embed",
+            json={"model": model, "input": list(inputs), "truncate": True},
+            read_timeout=read_timeout,
+        )
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def tags(self, read_timeout: Optional[float] = None) -> dict:
+        """GET /api/tags: installierte Modelle (günstiger Erreichbarkeits-Check)."""
+        response = self.request("GET", "/api/tags", read_timeout=read_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def ps(self, read_timeout: Optional[float] = None) -> dict:
+        """GET /api/ps: aktuell in den Speicher geladene Modelle."""
+        response = self.request("GET", "/api/ps", read_timeout=read_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOllamaClient(_ClientBase):
+    """
+    Asynchrone Variante mit httpx.AsyncClient und gleichem Pool-/Timeout-Modell:
+    höchstens pool_size Verbindungen, weitere Aufrufe warten auf eine freie.
+    Abgebrochen wird über das Abbrechen der Task (asyncio-Cancel schließt die
+    Verbindung), ein AbortHandle ist hier nicht nötig.
+    """
+
+    def __init__(self, base_url: str, **kwargs):
+        # httpx erst hier laden (nur für AsyncOllamaClient nötig, kostet Importzeit)
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError(
+                "AsyncOllamaClient benötigt das Paket 'httpx'."
+            ) from None
+        super().__init__(base_url, **kwargs)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        json=None,
+        stream: bool = False,
+        read_timeout: Optional[float] = None,
+    ):
+        """
+        Wie OllamaClient.request. Bei stream=True wird eine offene httpx-Response
+        zurückgegeben, die der Aufrufer mit ``await response.aclose()`` schließt.
+        """
+        import httpx
+
+        read_timeout = self.read_timeout if read_timeout is None else read_timeout
+        # pool=None: wie pool_block beim synchronen Client unbegrenzt warten
+        timeout = httpx.Timeout(
+            connect=self.connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=None,
+        )
+        start = time.perf_counter()
+        try:
+            request = self.client.build_request(
+                method, self._url(path), json=json, timeout=timeout
+            )
+            response = await self.client.send(request, stream=stream)
+        except httpx.HTTPError as e:
+            self._record(
+                CallRecord(
+                    method,
+                    path,
+                    None,
+                    time.perf_counter() - start,
+                    stream,
+                    type(e).__name__,
+                )
+            )
+            raise
+        error = None if response.is_success else f"HTTP {response.status_code}"
+        self._record(
+            CallRecord(
+                method,
+                path,
+                response.status_code,
+                time.perf_counter() - start,
+                stream,
+                error,
+            )
+        )
+        return response
+
+    async def generate(self, payload: dict, read_timeout: Optional[float] = None):
+        """POST /api/generate; bei payload["stream"] wird die Antwort gestreamt."""
+        return await self.request(
+            "POST",
+            "/api/generate",
+            json=payload,
+            stream=bool(payload.get("stream")),
+            read_timeout=read_timeout,
+        )
+
+    async def embed(
+        self, model: str, inputs, read_timeout: Optional[float] = None
+    ) -> list:
+        """POST /api/embed: ein Vektor je Eingabetext (zu lange Texte kürzt Ollama)."""
+        response = await self.request(
+            "POST",
+            "/api/embed",
+            json={"model": model, "input": list(inputs), "truncate": True},
+            read_timeout=read_timeout,
+        )
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    async def tags(self, read_timeout: Optional[float] = None) -> dict:
+        """GET /api/tags: installierte Modelle (günstiger Erreichbarkeits-Check)."""
+        response = await self.request("GET", "/api/tags", read_timeout=read_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def ps(self, read_timeout: Optional[float] = None) -> dict:
+        """GET /api/ps: aktuell in den Speicher geladene Modelle."""
+        response = await self.request("GET", "/api/ps", read_timeout=read_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+PDF-Report aus dem Chatverlauf.
+
+Bilder werden im Speicher dekodiert und auf die tatsächlich benötigte
+Druckauflösung verkleinert (parallel in einem Thread-Pool), das PDF entsteht
+in einem BytesIO-Puffer. Die Flowables unveränderter Turns werden zwischen
+wiederholten Downloads zwischengespeichert.
+"""
+
+import copy
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from PIL import Image as PILImage
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Image as RLImage
+from reportlab.platypus import Paragraph, Preformatted, SimpleDocTemplate, Spacer
+
+IMAGE_BOX = 200  # Kantenlänge des Bildplatzes im PDF in Punkt (1/72 Zoll)
+IMAGE_DPI = 150  # Druckauflösung der Vorschaubilder
+
+
+def make_thumbnail(img_bytes: bytes, box: int = IMAGE_BOX, dpi: int = IMAGE_DPI):
+    """
+    Verkleinert ein Bild im Speicher auf box Punkt bei dpi Auflösung.
+    Liefert (jpeg_bytes, breite_pt, höhe_pt) mit erhaltenem Seitenverhältnis.
+    """
+    max_px = round(box / 72 * dpi)
+    image = PILImage.open(io.BytesIO(img_bytes))
+    # Bei JPEG direkt verkleinert dekodieren (DCT-Skalierung) statt voll zu laden
+    image.draft("RGB", (max_px, max_px))
+    image.thumbnail((max_px, max_px), PILImage.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    scale = box / max(image.size)
+    return buf.getvalue(), image.width * scale, image.height * scale
+
+
+def _styles():
+    styles = getSampleStyleSheet()
+    # Eigener Style für Codeblöcke
+    code_style = ParagraphStyle(
+        "Code",
+        parent=styles["Code"],
+        fontName="Courier",
+        fontSize=8,
+        leftIndent=6,
+        rightIndent=6,
+        leading=10,
+        wordWrap="CJK",
+        spaceAfter=6,
+        borderPadding=2,
+        backColor="#222222",
+        textColor="#FFD700",
+    )
+    return styles, code_style
+
+
+def _response_flowables(response, styles, code_style):
+    # Antwort: Codeblöcke als Preformatted, Rest als Paragraph
+    flowables = []
+    if "```" in response:
+        # Versuche, nur den Code als Preformatted zu nehmen, Rest als Paragraph
+        code_blocks = re.findall(r"```[a-zA-Z]*\n(.*?)```", response, re.DOTALL)
+        if code_blocks:
+            # Text vor erstem Codeblock
+            first_code = response.find("```")
+            if first_code > 0:
+                flowables.append(
+                    Paragraph(
+                        f"<b>Antwort:</b> {response[:first_code]}",
+                        styles["BodyText"],
+                    )
+                )
+            for code in code_blocks:
+                flowables.append(Preformatted(code, code_style))
+            # Text nach letztem Codeblock
+            last_code = response.rfind("```")
+            if last_code < len(response):
+                flowables.append(
+                    Paragraph(response[last_code + 3 :], styles["BodyText"])
+                )
+        else:
+            # Kein Markdown-Codeblock, aber evtl. HTML: alles als Preformatted
+            flowables.append(Preformatted(response, code_style))
+    else:
+        flowables.append(Paragraph(f"<b>Antwort:</b> {response}", styles["BodyText"]))
+    return flowables
+
+
+class ReportRenderer:
+    """
+    Baut Reports mit einem Worker-Pool. Pro Turn werden Text-Flowables und
+    Vorschaubild gecacht (Schlüssel: Position, Prompt, Antwort, Bild-Hash,
+    Metadaten), sodass erneute Downloads nur neue Turns rendern.
+    """
+
+    def __init__(self, max_workers: int = 4, cache_size: int = 512):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="report"
+        )
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.styles, self.code_style = _styles()
+
+    def render(self, chat_history, rows, model: str) -> bytes:
+        """
+        chat_history: [(prompt, antwort), ...]
+        rows: pro Eintrag None oder (timestamp, image_bytes, meta, duration_ms) aus der DB
+        """
+        styles = self.styles
+        story = []
+        # Rechnername und IP-Adresse
+        hostname = socket.gethostname()
+        try:
+            ip_addr = socket.gethostbyname(hostname)
+        except Exception:
+            ip_addr = "unbekannt"
+        story.append(Paragraph("<b>PRO ANALYZER Report</b>", styles["Title"]))
+        story.append(Spacer(1, 12))
+        now = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+        story.append(Paragraph(f"Erstellt am: {now}", styles["Normal"]))
+        story.append(Paragraph(f"Modell: <b>{model}</b>", styles["Normal"]))
+        story.append(Paragraph(f"Rechnername: {hostname}", styles["Normal"]))
+        story.append(Paragraph(f"IP-Adresse: {ip_addr}", styles["Normal"]))
+        story.append(Spacer(1, 12))
+
+        turns = [
+            self.executor.submit(self._turn_parts, idx, prompt, response, row)
+            for idx, ((prompt, response), row) in enumerate(zip(chat_history, rows))
+        ]
+        for future in turns:
+            story.extend(self._materialize(future.result()))
+
+        buf = io.BytesIO()
+        SimpleDocTemplate(buf, pagesize=A4).build(story)
+        return buf.getvalue()
+
+    def _turn_parts(self, idx, prompt, response, row):
+        timestamp, img_bytes, meta, duration_ms = row if row else (None,) * 4
+        key = hashlib.sha256(
+            json.dumps(
+                [
+                    idx,
+                    prompt,
+                    response,
+                    duration_ms,
+                    hashlib.sha256(img_bytes).hexdigest() if img_bytes else None,
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            parts = self._cache.get(key)
+            if parts is not None:
+                self._cache.move_to_end(key)
+                return parts
+        parts = self._build_parts(idx, prompt, response, img_bytes, duration_ms)
+        with self._lock:
+            self._cache[key] = parts
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return parts
+
+    def _build_parts(self, idx, prompt, response, img_bytes, duration_ms):
+        styles = self.styles
+        head = []
+        if prompt:
+            head.append(
+                Paragraph(f"<b>Frage/Prompt {idx+1}:</b> {prompt}", styles["Heading4"])
+            )
+        else:
+            head.append(Paragraph(f"<b>System:</b>", styles["Heading4"]))
+        head.append(Spacer(1, 4))
+        # Gemessene Dauer der Analyse (Spalte duration_ms)
+        dauer = duration_ms / 1000 if duration_ms else None
+        if dauer:
+            head.append(
+                Paragraph(f"Antwortdauer: {dauer:.2f} Sekunden", styles["Normal"])
+            )
+        thumbnail = make_thumbnail(img_bytes) if img_bytes else None
+        tail = _response_flowables(response or "", styles, self.code_style)
+        tail.append(Spacer(1, 8))
+        return head, thumbnail, tail
+
+    def _materialize(self, parts):
+        # Flache Kopien: wrap()/split() setzen Attribute, der Cache bleibt unberührt
+        head, thumbnail, tail = parts
+        flowables = [copy.copy(f) for f in head]
+        if thumbnail:
+            data, width, height = thumbnail
+            flowables.append(RLImage(io.BytesIO(data), width=width, height=height))
+            flowables.append(Spacer(1, 4))
+        flowables.extend(copy.copy(f) for f in tail)
+        return flowables
+
+
+class ReportOutputDir:
+    """
+    Verwaltetes Ausgabeverzeichnis für Report-Dateien: es werden nur die
+    letzten keep Reports aufbewahrt, beim Beenden wird alles gelöscht.
+    """
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self.path = tempfile.mkdtemp(prefix="pro_analyzer_reports_")
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes, file_name: str) -> str:
+        # Eigenes Unterverzeichnis pro Report, damit der Download-Name erhalten bleibt
+        target_dir = os.path.join(self.path, uuid.uuid4().hex)
+        os.makedirs(target_dir)
+        target = os.path.join(target_dir, os.path.basename(file_name))
+        with open(target, "wb") as f:
+            f.write(data)
+        self._prune()
+        return target
+
+    def _prune(self):
+        with self._lock:
+            entries = sorted(
+                (os.path.join(self.path, name) for name in os.listdir(self.path)),
+                key=os.path.getmtime,
+            )
+            for old in entries[: -self.keep]:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
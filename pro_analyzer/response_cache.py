@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Inhaltsadressierter Antwort-Cache für (Bild, Prompt, Modell, Optionen).
+
+Zwei Stufen:
+- In-Memory-LRU (begrenzt nach Anzahl, Größe in Bytes und Alter/TTL)
+- persistente Stufe in der SQLite-Datenbank (Tabelle response_cache, über
+  pro_analyzer.database.Database; Schreiben läuft über den Hintergrund-Writer)
+
+Ein Treffer in der persistenten Stufe wird in den Speicher übernommen.
+Gezählt werden Treffer je Stufe und Fehlschläge (stats()).
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+def cache_key(image_sha256: str, prompt: str, model: str, options=None) -> str:
+    """SHA-256 über Bild-Hash (der kodierten Bytes), Prompt, Modell und Optionen."""
+    h = hashlib.sha256(image_sha256.encode("ascii"))
+    for part in (prompt, model, json.dumps(options or {}, sort_keys=True)):
+        h.update(b"\0")
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    response: str
+    stats: Optional[dict]
+    created: float
+
+    @property
+    def size(self) -> int:
+        return len(self.response.encode("utf-8"))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        db=None,
+        max_entries: int = 256,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 7 * 24 * 3600,
+    ):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> CachedResponse, älteste zuerst
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        return self.ttl is not None and now - entry.created > self.ttl
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry
+                self._evict(key)
+        entry = self._db_get(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._store(key, entry)
+        return entry
+
+    def put(self, key: str, response: str, stats=None, model: Optional[str] = None):
+        entry = CachedResponse(response, stats, time.time())
+        with self._lock:
+            self._store(key, entry)
+        if self.db is not None:
+            self.db.submit(
+                lambda conn: conn.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, response, stats, model, created, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                    (
+                        key,
+                        response,
+                        json.dumps(stats) if stats else None,
+                        model,
+                        entry.created,
+                    ),
+                )
+            )
+
+    def prune(self) -> int:
+        """Löscht abgelaufene Einträge der persistenten Stufe; liefert deren Anzahl."""
+        if self.db is None or self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        return self.db.submit(
+            lambda conn: conn.execute(
+                "DELETE FROM response_cache WHERE created < ?", (cutoff,)
+            ).rowcount
+        ).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+                ),
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+            }
+
+    # --- intern (Aufrufer hält self._lock) ---
+
+    def _store(self, key: str, entry: CachedResponse):
+        if key in self._memory:
+            self._evict(key)
+        if entry.size > self.max_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        while (
+            len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes
+        ):
+            self._evict(next(iter(self._memory)))
+
+    def _evict(self, key: str):
+        entry = self._memory.pop(key)
+        self._memory_bytes -= entry.size
+
+    def _db_get(self, key: str, now: float) -> Optional[CachedResponse]:
+        if self.db is None:
+            return None
+        row = (
+            self.db.connection()
+            .execute(
+                "SELECT response, stats, created FROM response_cache WHERE key=?",
+                (key,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        response, stats, created = row
+        if self.ttl is not None and now - created > self.ttl:
+            self.db.submit(
+                lambda conn: conn.execute(
+                    "DELETE FROM response_cache WHERE key=?", (key,)
+                )
+            )
+            return None
+        self.db.submit(
+            lambda conn: conn.execute(
+                "UPDATE response_cache SET hits = hits + 1 WHERE key=?", (key,)
+            )
+        )
+        return CachedResponse(response, json.loads(stats) if stats else None, created)
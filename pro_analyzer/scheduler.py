@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fairer Scheduler vor den Ollama-Aufrufen.
+
+Jede Sitzung hat eine eigene Warteschlange; freie Plätze (max_in_flight,
+passend zur Kapazität des Backends) werden per gewichtetem Round-Robin
+(smooth weighted round robin) auf die Sitzungen verteilt. Ein Nutzer, der
+zehn Quick Actions auf einmal klickt, bekommt damit nicht mehr Plätze als
+alle anderen zusammen. Zu lange Warteschlangen führen zur Ablehnung
+(QueueFullError) bzw. melden über should_degrade(), dass Anfragen günstiger
+(z.B. mit kleineren Bildern) ausgeführt werden sollten.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+
+class QueueFullError(Exception):
+    """Die Warteschlange der Sitzung bzw. des Servers ist voll."""
+
+
+class Ticket:
+    """Platz in der Warteschlange; granted ist gesetzt, sobald die Anfrage laufen darf."""
+
+    _ids = itertools.count()
+
+    def __init__(self, key: str):
+        self.id = next(Ticket._ids)
+        self.key = key
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        self.granted = threading.Event()
+        self.cancelled = False
+        self._settled = threading.Event()  # zugeteilt oder abgebrochen
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True, sobald die Anfrage laufen darf oder abgebrochen wurde (siehe cancelled)."""
+        return self._settled.wait(timeout)
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        max_in_flight: int = 1,
+        max_queue_per_session: int = 8,
+        max_queue_total: int = 64,
+        degrade_at: Optional[int] = None,
+        weights: Optional[dict] = None,
+        initial_service_time: float = 20.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue_per_session = max_queue_per_session
+        self.max_queue_total = max_queue_total
+        self.degrade_at = degrade_at
+        self.weights = weights or {}  # Sitzungsschlüssel -> Gewicht (Standard 1)
+        self.avg_service_time = initial_service_time  # gleitender Mittelwert (s)
+        self._queues = OrderedDict()  # Sitzungsschlüssel -> deque[Ticket]
+        self._current = {}  # SWRR-Zähler je Sitzung
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    # --- Öffentliche API ---
+
+    def submit(self, key: str, bounded: bool = True) -> Ticket:
+        """
+        Reiht eine Anfrage für die Sitzung key ein. bounded=False umgeht die
+        Längenlimits (für Aufrufer, die selbst begrenzen, z.B. Batch-Läufe).
+        """
+        ticket = Ticket(key)
+        with self._lock:
+            queue = self._queues.get(key)
+            if bounded:
+                if queue is not None and len(queue) >= self.max_queue_per_session:
+                    raise QueueFullError(
+                        f"Zu viele offene Anfragen in dieser Sitzung (max. {self.max_queue_per_session})."
+                    )
+                if self._queued() >= self.max_queue_total:
+                    raise QueueFullError("Der Analyse-Server ist gerade ausgelastet.")
+            if queue is None:
+                queue = self._queues[key] = deque()
+                self._current.setdefault(key, 0)
+            queue.append(ticket)
+            self._dispatch()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Gibt den Platz nach Ende der Anfrage frei (oder entfernt sie aus der Warteschlange)."""
+        with self._lock:
+            if ticket in self._in_flight:
+                self._in_flight.discard(ticket)
+                if not ticket.cancelled and ticket.started is not None:
+                    elapsed = time.monotonic() - ticket.started
+                    self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * elapsed
+            else:
+                self._remove(ticket)
+            self._dispatch()
+
+    def cancel(self, ticket: Ticket):
+        """Abbruch: wartende Tickets verlassen die Warteschlange, laufende geben ihren Platz frei."""
+        ticket.cancelled = True
+        self.release(ticket)
+        ticket._settled.set()  # Wartenden sofort wecken
+
+    def position(self, ticket: Ticket) -> int:
+        """Anzahl der Anfragen, die vor diesem Ticket an die Reihe kommen (0 = als Nächstes)."""
+        with self._lock:
+            if ticket.granted.is_set():
+                return 0
+            # Zuteilung auf Kopien nachspielen, genau wie _dispatch() sie ausführt
+            queues = OrderedDict((key, deque(q)) for key, q in self._queues.items())
+            current = dict(self._current)
+            ahead = 0
+            while queues:
+                if self._take(queues, current) is ticket:
+                    return ahead
+                ahead += 1
+            return ahead
+
+    def eta(self, ticket: Ticket) -> float:
+        """Geschätzte Wartezeit in Sekunden bis zum Start."""
+        if ticket.granted.is_set():
+            return 0.0
+        ahead = self.position(ticket)
+        return (ahead // max(1, self.max_in_flight) + 1) * self.avg_service_time
+
+    def should_degrade(self) -> bool:
+        with self._lock:
+            return self.degrade_at is not None and self._queued() >= self.degrade_at
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._in_flight),
+                "queued": self._queued(),
+                "sessions": sum(1 for q in self._queues.values() if q),
+                "avg_service_time": self.avg_service_time,
+            }
+
+    # --- intern (Aufrufer hält self._lock) ---
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _remove(self, ticket: Ticket):
+        queue = self._queues.get(ticket.key)
+        if queue is not None:
+            try:
+                queue.remove(ticket)
+            except ValueError:
+                pass
+            if not queue:
+                del self._queues[ticket.key]
+                self._current.pop(ticket.key, None)
+
+    def _pick(self, queues, current) -> str:
+        # Smooth Weighted Round Robin: jede aktive Sitzung bekommt ihr Gewicht gutgeschrieben,
+        # die mit dem höchsten Guthaben ist dran und zahlt die Summe aller Gewichte.
+        total = 0
+        best = None
+        for key in queues:
+            weight = self.weights.get(key, 1)
+            current[key] = current.get(key, 0) + weight
+            total += weight
+            if best is None or current[key] > current[best]:
+                best = key
+        current[best] -= total
+        return best
+
+    def _take(self, queues, current) -> Ticket:
+        # Nächstes Ticket nach SWRR; eine geleerte Sitzung verliert ihr Guthaben
+        key = self._pick(queues, current)
+        queue = queues[key]
+        ticket = queue.popleft()
+        if not queue:
+            del queues[key]
+            current.pop(key, None)
+        return ticket
+
+    def _dispatch(self):
+        while len(self._in_flight) < self.max_in_flight and self._queues:
+            ticket = self._take(self._queues, self._current)
+            ticket.started = time.monotonic()
+            self._in_flight.add(ticket)
+            ticket.granted.set()
+            ticket._settled.set()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+Analyse-Sitzungen und Turns.
+
+Jede Interaktion gehört zu einer Sitzung (ein Browser-Tab bzw. ein
+API-Aufruf) und hat dort einen fortlaufenden Turn-Index und einen Verweis
+auf den vorherigen Turn. Gespeichert wird pro Insert nur der eigene Turn;
+den Verlauf rekonstruiert database.load_conversation().
+"""
+
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+def new_uid() -> str:
+    return uuid.uuid4().hex
+
+
+@dataclass(frozen=True)
+class Turn:
+    uid: str
+    session_id: str
+    index: int
+    parent_uid: Optional[str]
+
+
+@dataclass
+class ChatSession:
+    id: str = field(default_factory=new_uid)
+    turn_count: int = 0
+    last_uid: Optional[str] = None
+    # parallel zu den Chat-Einträgen: uid der gespeicherten Interaktion oder None
+    chat_uids: list = field(default_factory=list)
+
+    def next_turn(self) -> Turn:
+        """Reserviert den nächsten Turn (uid steht sofort fest, vor dem Insert)."""
+        turn = Turn(new_uid(), self.id, self.turn_count, self.last_uid)
+        self.turn_count += 1
+        self.last_uid = turn.uid
+        return turn
+
+    def uids_for(self, chat_history) -> list:
+        """uids passend zum Chatverlauf; None, wenn die Zuordnung nicht (mehr) stimmt."""
+        if len(self.chat_uids) == len(chat_history):
+            return list(self.chat_uids)
+        return [None] * len(chat_history)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+"""
+Speicherverwaltung für pro_analyzer_data.db: Aufbewahrung, Archiv,
+ausgelagerte Bilder und schrittweises Verkleinern der Datei.
+
+StorageMaintenance läuft als Hintergrund-Thread (run_once() auch direkt,
+z.B. python -m pro_analyzer maintenance) und erledigt pro Durchlauf:
+
+1. Aufbewahrung (RetentionPolicy): zu alte Interaktionen, alles über
+   max_rows hinaus und, solange max_bytes überschritten ist, die ältesten.
+   Vorher schreibt ArchiveWriter sie als NDJSON (gzip) ins Archiv, Bilder
+   einmal pro Datei als Base64.
+2. Auslagern: Mit einem BlobStore wandern Bild-Bytes aus der Tabelle images
+   in Dateien (blob_root/ab/cd/<sha256>); die Tabellenseiten bleiben damit
+   klein und der Seiten-Cache voller Verlaufszeilen statt JPEGs.
+3. Aufräumen: Dateien gelöschter Bilder (Tabelle blob_trash), abgelaufene
+   Einträge des Antwort-Caches, Segmente des Volltextindex.
+4. incremental_vacuum: freie Seiten gehen in kleinen Schritten an das
+   Dateisystem zurück.
+
+Alles Schreibende läuft in kleinen Aufträgen über den Writer der Database
+(incremental_vacuum als eigene kurze Transaktion); Analysen schreiben also
+weiter, ihre Aufträge reihen sich dazwischen ein.
+"""
+
+import base64
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from pro_analyzer.database import (
+    delete_interactions,
+    export_images,
+    export_interactions,
+    incremental_vacuum,
+    inline_images,
+    interactions_before,
+    interactions_beyond,
+    mark_external,
+    merge_fts,
+    oldest_interactions,
+    storage_usage,
+    take_blob_trash,
+)
+
+logger = logging.getLogger(__name__)
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Grenzen für den Verlauf; None = unbegrenzt."""
+
+    max_age_days: Optional[float] = None
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None  # Datenbankseiten + ausgelagerte Bilder
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            limit is not None
+            for limit in (self.max_age_days, self.max_rows, self.max_bytes)
+        )
+
+
+class BlobStore:
+    """
+    Inhaltsadressierte Dateien unter root, zwei Ebenen tief nach den ersten
+    Zeichen des SHA-256 (root/ab/cd/abcd…), damit kein Ordner zu groß wird.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        if not _SHA256.fullmatch(sha256):
+            raise ValueError(f"Kein SHA-256: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def put(self, sha256: str, data: bytes):
+        """Schreibt atomar (temporäre Datei, fsync, rename)."""
+        path = self.path(sha256)
+        if os.path.exists(path) and os.path.getsize(path) == len(data):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def get(self, sha256: str) -> Optional[bytes]:
+        try:
+            with open(self.path(sha256), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            logger.warning("Ausgelagertes Bild %s fehlt im blob_store", sha256)
+            return None
+
+    def delete(self, sha256: str):
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+
+class ArchiveWriter:
+    """
+    Eine gzip-komprimierte NDJSON-Datei pro Wartungslauf:
+    {"type": "image", "sha256", "format", "width", "height", "data" (Base64)}
+    {"type": "interaction", ...Spalten der Tabelle interactions}
+    Jedes Bild steht vor der ersten Interaktion, die es benutzt.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(directory, f"interactions-{stamp}.ndjson.gz")
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._images = set()
+
+    def write(self, conn, ids) -> int:
+        """Archiviert die Interaktionen ids und schreibt sie fest (vor dem Löschen)."""
+        rows = export_interactions(conn, ids)
+        hashes = {row["image_sha256"] for row in rows} - self._images - {None}
+        if hashes:
+            for sha256, fmt, width, height, data in export_images(conn, hashes):
+                record = dict(type="image", sha256=sha256, format=fmt)
+                record.update(width=width, height=height)
+                record["data"] = base64.b64encode(data).decode() if data else None
+                self._file.write(json.dumps(record) + "\n")
+            self._images |= hashes
+        for row in rows:
+            self._file.write(
+                json.dumps({"type": "interaction", **row}, ensure_ascii=False) + "\n"
+            )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+@dataclass
+class MaintenanceReport:
+    archived: int = 0
+    deleted: int = 0
+    externalized: int = 0
+    blobs_removed: int = 0
+    cache_pruned: int = 0
+    pages_freed: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    archive: Optional[str] = None
+    seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class StorageMaintenance:
+    """
+    Wartung der Datenbank im Hintergrund (siehe Moduldokumentation).
+    Pro Schritt werden höchstens batch_size Zeilen bzw. vacuum_pages Seiten
+    in einem Writer-Auftrag bearbeitet; max_batches begrenzt einen Lauf.
+    on_delete(ids) erfährt nach der Aufbewahrung, welche Interaktionen
+    gelöscht wurden (z.B. für den Vektorindex im Speicher).
+    """
+
+    def __init__(
+        self,
+        db,
+        policy: RetentionPolicy = RetentionPolicy(),
+        blob_store: Optional[BlobStore] = None,
+        archive_dir: Optional[str] = None,
+        response_cache=None,
+        interval: float = 3600.0,
+        start_delay: float = 60.0,
+        batch_size: int = 500,
+        vacuum_pages: int = 2048,
+        max_batches: int = 200,
+        on_delete: Optional[Callable[[list], None]] = None,
+    ):
+        self.db = db
+        self.policy = policy
+        self.blob_store = blob_store
+        self.archive_dir = archive_dir
+        self.response_cache = response_cache
+        self.interval = interval
+        self.start_delay = start_delay  # den Start der App nicht ausbremsen
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.max_batches = max_batches
+        self.on_delete = on_delete
+        self.last_report = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def usage(self) -> dict:
+        return storage_usage(self.db.connection())
+
+    def run_once(self) -> MaintenanceReport:
+        started = time.perf_counter()
+        with self._run_lock:
+            report = MaintenanceReport(bytes_before=self.usage()["total"])
+            self._apply_retention(report)
+            if self.blob_store is not None:
+                report.externalized = self._externalize()
+                report.blobs_removed = self._collect_garbage()
+            if self.response_cache is not None:
+                report.cache_pruned = self.response_cache.prune()
+            if report.deleted:
+                self.db.submit(merge_fts).result()
+            report.pages_freed = self._vacuum()
+            self.db.connection().execute("PRAGMA optimize")
+            report.bytes_after = self.usage()["total"]
+            report.seconds = time.perf_counter() - started
+            self.last_report = report
+        if report.deleted or report.externalized or report.pages_freed:
+            logger.info(
+                "Speicherwartung: %d archiviert, %d gelöscht, %d Bilder ausgelagert, "
+                "%d Seiten freigegeben, %.1f -> %.1f MB",
+                report.archived,
+                report.deleted,
+                report.externalized,
+                report.pages_freed,
+                report.bytes_before / 1e6,
+                report.bytes_after / 1e6,
+            )
+        return report
+
+    def _expired(self, conn) -> list:
+        """Nächster Block zu löschender ids nach der RetentionPolicy."""
+        policy = self.policy
+        if policy.max_age_days is not None:
+            cutoff = datetime.now() - timedelta(days=policy.max_age_days)
+            ids = interactions_before(conn, cutoff.isoformat(), self.batch_size)
+            if ids:
+                return ids
+        if policy.max_rows is not None:
+            ids = interactions_beyond(conn, policy.max_rows, self.batch_size)
+            if ids:
+                return ids
+        if policy.max_bytes is not None:
+            if storage_usage(conn)["total"] > policy.max_bytes:
+                # Kleinere Blöcke, um nicht weit unter die Grenze zu löschen
+                return oldest_interactions(conn, max(1, self.batch_size // 10))
+        return []
+
+    def _apply_retention(self, report: MaintenanceReport):
+        if not self.policy.enabled:
+            return
+        conn = self.db.connection()
+        archive = None
+        deleted = []
+        try:
+            for _ in range(self.max_batches):
+                ids = self._expired(conn)
+                if not ids:
+                    break
+                if self.archive_dir:
+                    archive = archive or ArchiveWriter(self.archive_dir)
+                    report.archived += archive.write(conn, ids)
+                report.deleted += self.db.submit(delete_interactions, ids).result()
+                deleted += ids
+        finally:
+            if archive is not None:
+                archive.close()
+                report.archive = archive.path
+            if deleted and self.on_delete is not None:
+                self.on_delete(deleted)
+
+    def _externalize(self) -> int:
+        """Lagert Bilder blockweise aus: erst die Datei, dann die Zeile leeren."""
+        conn = self.db.connection()
+        moved = 0
+        for _ in range(self.max_batches):
+            images = inline_images(conn, self.batch_size)
+            if not images:
+                break
+            for sha256, data in images:
+                self.blob_store.put(sha256, data)
+            sizes = [(sha256, len(data)) for sha256, data in images]
+            # Inzwischen gelöschte Bilder: Datei gleich wieder entfernen
+            for sha256 in self.db.submit(mark_external, sizes).result():
+                self.blob_store.delete(sha256)
+            moved += len(images)
+        return moved
+
+    def _collect_garbage(self) -> int:
+        removed = 0
+        for _ in range(self.max_batches):
+            hashes = self.db.submit(take_blob_trash, self.batch_size).result()
+            if not hashes:
+                break
+            for sha256 in hashes:
+                self.blob_store.delete(sha256)
+            removed += len(hashes)
+        return removed
+
+    def _vacuum(self) -> int:
+        freed = 0
+        while True:
+            # Eigene kurze Transaktion statt Writer-Auftrag (siehe incremental_vacuum)
+            pages = incremental_vacuum(self.db.connection(), self.vacuum_pages)
+            freed += pages
+            if pages < self.vacuum_pages:
+                return freed
+            # Wartende Schreibaufträge zwischen zwei Schritten durchlassen
+            self.db.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="storage-maintenance", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        delay = self.start_delay
+        while not self._stop.wait(delay):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Speicherwartung fehlgeschlagen")
+            delay = self.interval
@@ -0,0 +1,881 @@
+# -*- coding: utf-8 -*-
+
+"""
+Gradio-Oberfläche des PRO ANALYZER v2.0 (Dark-Theme, 3-Spalten-Layout,
+Quick Actions, Batch-, Statistik- und Verlauf-Tab).
+
+build_ui() baut die Blocks erst auf Abruf; die Analyse selbst liegt in
+pro_analyzer.core. Gradio wird nur geladen, wer dieses Modul importiert.
+"""
+
+import io
+import logging
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import gradio as gr
+import requests
+from PIL import Image as PILImage
+
+from pro_analyzer.backends import STATUS_CHECKING
+from pro_analyzer.core import (
+    BATCH_WORKERS,
+    FANOUT_PARALLELISM,
+    EMBED_MODEL,
+    FANOUT_UI_INTERVAL,
+    HISTORY_PAGE_SIZE,
+    MODEL_NAME,
+    QUICK_ACTION_BUTTONS,
+    QUICK_ACTIONS,
+    SERVICE_STATUS_INTERVAL,
+    STATISTICS_PERIODS,
+    UI_CONCURRENCY_LIMIT,
+    analyze_stream,
+    cancel_registry,
+    check_ollama_service,
+    detailed_prompt,
+    generate_pdf_report,
+    get_db,
+    get_embedding_indexer,
+    history_thumbnail,
+    list_objects_prompt,
+    model_lifecycle,
+    ocr_prompt,
+    quality_prompt,
+    run_batch,
+    search_history,
+    semantic_search,
+)
+from pro_analyzer.database import distinct_models, load_interaction, timing_statistics
+from pro_analyzer.image_ingest import ingest_image
+from pro_analyzer.session import ChatSession
+
+# Verlauf-Tab: Filter-Beschriftung -> gespeicherter Aktionsname (None = alle)
+HISTORY_ACTIONS = {
+    "Alle": None,
+    **{label: QUICK_ACTIONS[prompt] for label, prompt in QUICK_ACTION_BUTTONS.items()},
+    "Eigene Frage": "custom",
+}
+
+# --- CSS für das "FETZIGE" Design ---
+# Hier definieren wir das komplette Aussehen der App.
+css = """
+/* Import der Google Font 'Poppins' */
+@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;600;700&display=swap');
+
+/* Allgemeines Styling & Dark Theme */
+body, .gradio-container {
+    font-family: 'Poppins', sans-serif;
+    background-color: #1A1A1A; /* Dunkler Hintergrund */
+    color: #E0E0E0; /* Heller Text */
+    font-size: 18px; /* Alles wird riesig! */
+}
+
+/* Die Gradienten-Headline */
+#app-title {
+    font-size: 48px !important;
+    font-weight: 700 !important;
+    background: linear-gradient(90deg, #FF8C00, #FFD700); /* Knalliger Gradient */
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    text-align: center;
+    padding: 10px 0;
+}
+
+/* Styling der Buttons */
+.gradio-button {
+    font-size: 16px !important;
+    padding: 12px 24px !important;
+    border-radius: 8px !important;
+    border: 2px solid #FF8C00 !important;
+    background: transparent !important;
+    color: #FF8C00 !important;
+    transition: all 0.2s ease-in-out;
+}
+.gradio-button:hover {
+    background: #FF8C00 !important;
+    color: #1A1A1A !important;
+    box-shadow: 0 0 15px #FF8C00;
+}
+.gradio-button.primary {
+    background: #FF8C00 !important;
+    color: #1A1A1A !important;
+}
+
+/* Block-Styling für einen modernen Look */
+.gradio-panel, .gradio-row, .gradio-group {
+    border: 1px solid #333 !important;
+    border-radius: 16px !important;
+    background-color: #242424 !important; /* Etwas hellerer Block-Hintergrund */
+    padding: 20px !important;
+}
+
+/* Styling für Textfelder und Chat */
+.gradio-textbox, .gradio-chatbot {
+    border-radius: 8px !important;
+    border: 1px solid #444 !important;
+    background-color: #2F2F2F !important;
+}
+.gradio-chatbot .message {
+    border-radius: 12px !important;
+    box-shadow: none !important;
+}
+.gradio-chatbot .user-message { background-color: #3a3a3a !important; }
+.gradio-chatbot .bot-message { background-color: #2c3e50 !important; }
+
+/* Styling für den Akkordion-Bereich (Profi-Tipps) */
+.gradio-accordion {
+    border-radius: 12px !important;
+    background-color: #2F2F2F !important;
+    border: none !important;
+}
+"""
+
+
+def create_all_interactions(
+    image, chat_history, session=None, request: gr.Request = None
+):
+    """
+    "Alle Analysen": startet alle Quick Actions gleichzeitig auf demselben
+    (einmal kodierten) Bild; jede Antwort streamt in ihren eigenen Chat-Eintrag.
+    """
+    if session is None:
+        session = ChatSession()
+    if image is None:
+        chat_history.append(
+            (None, "⚠️ Bitte zuerst ein Bild in die linke Spalte hochladen!")
+        )
+        session.chat_uids.append(None)
+        yield chat_history, gr.update(interactive=True), gr.update(interactive=True)
+        return
+
+    image = ingest_image(image)
+    prompts = list(QUICK_ACTION_BUTTONS.values())
+    turns = [session.next_turn() for _ in prompts]  # Reihenfolge im Chat = Turn-Index
+    answers = ["🧠 Analysiere... Bitte warten."] * len(prompts)
+    done = [False] * len(prompts)
+    updates = queue.Queue()
+
+    def run(idx):
+        try:
+            for text, result in analyze_stream(
+                image, prompts[idx], turns[idx], cancel=cancel
+            ):
+                updates.put((idx, text, result is not None))
+        except Exception as e:
+            updates.put((idx, f"Fehler bei der Analyse: {e}", True))
+
+    def render():
+        return chat_history + [
+            (prompt, answer if finished else answer + " ▌")
+            for prompt, answer, finished in zip(prompts, answers, done)
+        ]
+
+    yield render(), gr.update(interactive=False), gr.update(interactive=False)
+    # Ein Token für alle Teil-Analysen: "Abbrechen" stoppt sie gemeinsam
+    with cancel_registry.token(session_key(request)) as cancel, ThreadPoolExecutor(
+        max_workers=FANOUT_PARALLELISM, thread_name_prefix="fanout"
+    ) as pool:
+        for idx in range(len(prompts)):
+            pool.submit(run, idx)
+        last_yield = 0.0
+        while not all(done):
+            idx, text, finished = updates.get()
+            answers[idx] = text
+            done[idx] = done[idx] or finished
+            # UI-Updates drosseln, abgeschlossene Antworten sofort zeigen
+            now = time.monotonic()
+            if finished or now - last_yield >= FANOUT_UI_INTERVAL:
+                last_yield = now
+                yield render(), gr.update(interactive=False), gr.update(
+                    interactive=False
+                )
+
+    chat_uids = session.uids_for(chat_history)
+    chat_history.extend(zip(prompts, answers))
+    session.chat_uids = chat_uids + [turn.uid for turn in turns]
+    yield chat_history, gr.update(interactive=True), gr.update(interactive=True)
+
+
+def ingest_upload(image_pil):
+    """
+    Dekodiert/kodiert den Upload einmalig; das Ergebnis bleibt in der Sitzung.
+    Parallel wird das Modell vorgewärmt, falls Ollama es entladen hat.
+    """
+    if image_pil is None:
+        return None, None
+    model_lifecycle.prewarm()
+    return image_pil, ingest_image(image_pil)
+
+
+def session_key(request):
+    """Schlüssel der Browser-Sitzung für Abbrüche (None außerhalb von Gradio)."""
+    return request.session_hash if request is not None else None
+
+
+def cancel_analyses(request: gr.Request):
+    """Bricht alle laufenden Analysen der Browser-Sitzung ab (Button bzw. Tab geschlossen)."""
+    cancelled = cancel_registry.cancel(session_key(request))
+    if cancelled:
+        logging.info("%d laufende Analyse(n) abgebrochen", cancelled)
+
+
+def create_interaction(
+    image, question, chat_history, session=None, request: gr.Request = None
+):
+    if session is None:
+        session = ChatSession()
+    # Validierung: Bild muss vorhanden sein
+    if image is None:
+        chat_history.append(
+            (None, "⚠️ Bitte zuerst ein Bild in die linke Spalte hochladen!")
+        )
+        session.chat_uids.append(None)
+        return chat_history, gr.update(interactive=True)
+
+    # Validierung: Frage darf nicht leer sein
+    if not question.strip():
+        chat_history.append(
+            (None, "⚠️ Bitte eine Frage stellen oder eine Quick Action verwenden.")
+        )
+        session.chat_uids.append(None)
+        return chat_history, gr.update(interactive=True)
+
+    # UI für den Benutzer sperren und Feedback geben
+    yield chat_history + [(question, "🧠 Analysiere... Bitte warten.")], gr.update(
+        interactive=False
+    ), gr.update(interactive=False)
+
+    # Verarbeitung: Bild ist bereits beim Upload kodiert worden (image_state)
+    turn = session.next_turn()
+    with cancel_registry.token(session_key(request)) as cancel:
+        for api_response, result in analyze_stream(
+            image, question, turn, cancel=cancel
+        ):
+            if result is None:
+                # Teilantworten direkt in die Chat-Blase schreiben
+                yield chat_history + [(question, api_response + " ▌")], gr.update(
+                    interactive=False
+                ), gr.update(interactive=False)
+
+    # Ergebnis anzeigen und UI wieder freigeben
+    # Entfernt gezielt die "Analysiere..."-Nachricht, falls vorhanden
+    chat_uids = session.uids_for(chat_history)
+    if (
+        len(chat_history) >= 1
+        and chat_history[-1][1] == "🧠 Analysiere... Bitte warten."
+    ):
+        chat_history.pop(-1)
+        chat_uids.pop(-1)
+    elif (
+        len(chat_history) >= 2
+        and chat_history[-2][1] == "🧠 Analysiere... Bitte warten."
+    ):
+        chat_history.pop(-2)
+        chat_uids.pop(-2)
+    chat_history.append((question, api_response))
+    session.chat_uids = chat_uids + [turn.uid]
+
+    yield chat_history, gr.update(interactive=True), gr.update(interactive=True)
+
+
+def service_status_markdown(error: str) -> str:
+    if error == STATUS_CHECKING:
+        return f"### ⏳ {error}"
+    return (
+        f"### ❌ {error}\n\n"
+        "Bitte stelle sicher, dass Ollama läuft und das Modell installiert ist. "
+        "Die Analyse-Funktionen werden automatisch freigegeben, sobald der Service verfügbar ist."
+    )
+
+
+# --- Aufbau des Gradio Interfaces v2.0 ---
+def build_ui(public: bool = False) -> gr.Blocks:
+    """
+    Baut die Oberfläche; public=True zeigt den Hinweis für den ngrok-Link.
+    Öffnet weder Datenbank noch Verbindungen – das passiert erst bei der Nutzung.
+    """
+    with gr.Blocks(css=css, theme=gr.themes.Base(), title="PRO ANALYZER v2.0") as demo:
+        if public:
+            gr.Markdown(
+                "**Hinweis:** Die App ist öffentlich erreichbar, solange dieses Fenster geöffnet ist. Den Link findest du in der Konsole."
+            )
+
+        # 0. Service-Status: wird periodisch aktualisiert, die UI ist immer aufgebaut
+        service_status = gr.Markdown()
+        service_timer = gr.Timer(SERVICE_STATUS_INTERVAL)
+
+        # 1. Titel & Modell-Info
+        gr.Markdown("# PRO ANALYZER v2.0", elem_id="app-title")
+        gr.Markdown(
+            f"<div style='text-align:center;font-size:20px;'>Verwendetes Modell: <b>{MODEL_NAME}</b></div>",
+            elem_id="model-info",
+        )
+
+        # 2. Hauptlayout (3 Spalten)
+        with gr.Row(equal_height=True):
+            # LINKE SPALTE: Steuerung & Werkzeuge
+            with gr.Column(scale=1, min_width=350):
+                gr.Markdown("## 1. Steuerung")
+                # type="pil" ohne image_mode: Gradio reicht die Originaldatei durch,
+                # sodass JPEG/PNG-Uploads ohne Neukodierung übernommen werden
+                image_uploader = gr.Image(
+                    type="pil", image_mode=None, label="Bild hier hochladen"
+                )
+                image_state = gr.State(None)  # IngestedImage der Sitzung
+                session_state = gr.State(ChatSession)  # neue Sitzung pro Seitenaufruf
+
+                gr.Markdown("### ⚡ Quick Actions")
+                gr.Markdown("Klicke, um eine vordefinierte Analyse zu starten.")
+
+                # Quick Action Buttons
+                btn_detail = gr.Button("Detaillierte Beschreibung")
+                btn_list = gr.Button("Objekte auflisten")
+                btn_ocr = gr.Button("Text extrahieren (OCR)")
+                btn_quality = gr.Button("Qualität bewerten")
+                btn_all = gr.Button("⚡ Alle Analysen", variant="primary")
+
+                # --- Prompt-Assistent ---
+                gr.Markdown("### 🤖 Prompt-Assistent")
+                gr.Markdown(
+                    """
+                Nutze den Prompt-Assistenten, um strukturierte Prompts zu erstellen. Je klarer und strukturierter der Prompt – insbesondere bei multimodalen Aufgaben – desto besser und zuverlässiger sind die Ergebnisse. Gib das gewünschte Format (z.B. JSON, Tabelle, Liste) und eine präzise Aufgabenstellung an.
+                """
+                )
+                prompt_format = gr.Dropdown(
+                    ["Freitext", "Tabelle", "Liste", "JSON"],
+                    value="Freitext",
+                    label="Erwünschtes Antwortformat",
+                )
+                prompt_task = gr.Textbox(
+                    label="Deine Aufgabenstellung",
+                    placeholder="Beschreibe hier möglichst präzise, was analysiert werden soll...",
+                )
+                prompt_example = gr.Markdown(
+                    "Beispiel: 'Analysiere die Bildkomposition und gib das Ergebnis als Tabelle mit den Spalten Objekt, Position, Farbe zurück.'"
+                )
+
+                def build_prompt(format, aufgabe):
+                    if not aufgabe.strip():
+                        return ""
+                    if format == "Freitext":
+                        return aufgabe
+                    return f"{aufgabe} Gib das Ergebnis im Format: {format}."
+
+                prompt_output = gr.Textbox(label="Fertiger Prompt", interactive=False)
+                prompt_format.change(
+                    build_prompt, [prompt_format, prompt_task], prompt_output
+                )
+                prompt_task.change(
+                    build_prompt, [prompt_format, prompt_task], prompt_output
+                )
+                gr.Markdown(
+                    "Du kannst den fertigen Prompt kopieren und unten einfügen oder weiter anpassen."
+                )
+
+            # MITTLERE SPALTE: Bild-Vorschau
+            with gr.Column(scale=2, min_width=500):
+                gr.Markdown("## 2. Bild-Vorschau")
+                image_display = gr.Image(
+                    label="Aktuelles Bild", interactive=False, height=600
+                )
+
+            # RECHTE SPALTE: Analyse-Chat
+            with gr.Column(scale=2, min_width=500):
+                gr.Markdown("## 3. Analyse-Chat")
+                chatbot = gr.Chatbot(
+                    label="Protokoll",
+                    height=600,
+                    bubble_full_width=False,
+                    avatar_images=("👤", "🤖"),
+                    elem_id="chatbot-area",
+                )
+
+        # 3. Untere Leiste für manuelle Eingabe
+        with gr.Row():
+            question_input = gr.Textbox(
+                label="Eigene Frage oder Anweisung",
+                placeholder="Stelle hier eine spezifische Frage oder verfeinere die Analyse...",
+                scale=4,
+                elem_id="main-question-input",
+            )
+            submit_button = gr.Button("Analyse starten", variant="primary", scale=1)
+            cancel_button = gr.Button("⏹️ Abbrechen", variant="stop", scale=1)
+
+        # 4. Profi-Tipps Sektion
+        with gr.Accordion(
+            "💡 Profi-Tipps für bessere Ergebnisse (hier klicken zum Öffnen)",
+            open=False,
+        ):
+            gr.Markdown(
+                f"""
+                - **Sei spezifisch:** Statt "Was ist das?" frage "Welche Pflanzenart ist im Vordergrund zu sehen?".
+                - **Gib Kontext:** "Dieses Bild stammt aus einem Sicherheitsbericht. Gibt es darauf Anomalien?" funktioniert besser als eine allgemeine Frage.
+                - **Fordere ein Format an:** Du kannst die KI bitten, die Antwort als Tabelle, Liste oder JSON auszugeben.
+                - **Kombiniere Analysen:** Nutze eine Quick Action und stelle danach eine verfeinernde Frage im Textfeld.
+                - **Modell-Tipp:** Je klarer und strukturierter der Prompt – insbesondere bei multimodalen Aufgaben – desto besser und zuverlässiger sind die Ergebnisse. Die explizite Angabe des gewünschten Formats (z.B. JSON) und eine präzise Aufgabenstellung sind für optimale Resultate entscheidend. (Modell: {MODEL_NAME})
+                """
+            )
+
+        # --- Event-Handler (Verknüpfung der Logik mit der UI) ---
+
+        # Bild-Upload aktualisiert die Vorschau in der Mitte und kodiert einmalig
+        image_uploader.change(
+            ingest_upload,
+            inputs=image_uploader,
+            outputs=[image_display, image_state],
+        )
+
+        # Manuelle Eingabe per Button oder Enter-Taste
+        def scroll_and_focus(chat, *args):
+            # Gibt die Chat-Historie zurück, JS scrollt automatisch zum Ende
+            return chat
+
+        submit_button.click(
+            fn=create_interaction,
+            inputs=[image_state, question_input, chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+        question_input.submit(
+            fn=create_interaction,
+            inputs=[image_state, question_input, chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+
+        # Quick Actions
+        btn_detail.click(
+            fn=create_interaction,
+            inputs=[image_state, gr.State(detailed_prompt), chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+        btn_list.click(
+            fn=create_interaction,
+            inputs=[image_state, gr.State(list_objects_prompt), chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+        btn_ocr.click(
+            fn=create_interaction,
+            inputs=[image_state, gr.State(ocr_prompt), chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+        btn_quality.click(
+            fn=create_interaction,
+            inputs=[image_state, gr.State(quality_prompt), chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+
+        # Alle Quick Actions gleichzeitig
+        btn_all.click(
+            fn=create_all_interactions,
+            inputs=[image_state, chatbot, session_state],
+            outputs=[chatbot, question_input, submit_button],
+            postprocess=scroll_and_focus,
+        )
+
+        # Abbrechen: trennt die Verbindung zu Ollama, die Handler schließen den Chat-Eintrag ab.
+        # Ohne Warteschlange, damit der Klick auch bei voller Queue sofort wirkt.
+        cancel_button.click(fn=cancel_analyses, queue=False)
+        # Tab geschlossen/neu geladen: laufende Analysen der Sitzung ebenfalls abbrechen
+        demo.unload(cancel_analyses)
+
+        # --- Report-Download Button ---
+        def download_report(chat, session):
+            pdf_path = generate_pdf_report(chat, session=session)
+            return pdf_path  # Nur den Dateipfad als String zurückgeben!
+
+        report_btn = gr.Button("Report als PDF herunterladen", variant="secondary")
+        report_file = gr.File(label="PDF-Report", file_types=[".pdf"])
+        report_btn.click(
+            fn=download_report,
+            inputs=[chatbot, session_state],
+            outputs=[report_file],
+        )
+
+        # --- Weitere Werkzeuge ---
+        with gr.Tabs():
+            with gr.Tab("📦 Batch-Analyse"):
+                gr.Markdown(
+                    "Analysiere einen ganzen Ordner oder ein ZIP-Archiv mit den gewählten Quick Actions. "
+                    "Ein erneuter Start mit derselben Quelle setzt einen abgebrochenen Lauf fort."
+                )
+                with gr.Row():
+                    batch_zip = gr.File(
+                        label="ZIP mit Bildern", file_types=[".zip"], type="filepath"
+                    )
+                    batch_folder = gr.Textbox(
+                        label="... oder Ordner auf dem Server",
+                        placeholder="z.B. D:\\Inspektion\\2024-05",
+                    )
+                batch_actions = gr.CheckboxGroup(
+                    list(QUICK_ACTION_BUTTONS),
+                    value=list(QUICK_ACTION_BUTTONS),
+                    label="Analysen",
+                )
+                batch_workers = gr.Slider(
+                    1, 16, value=BATCH_WORKERS, step=1, label="Parallele Analysen"
+                )
+                batch_btn = gr.Button("Batch starten", variant="primary")
+                batch_status = gr.Markdown()
+                batch_results = gr.Dataframe(
+                    headers=["Bild", "Analyse", "Antwort"], wrap=True
+                )
+
+            with gr.Tab("📊 Statistik") as stats_tab:
+                gr.Markdown(
+                    "Antwortzeiten und Durchsatz je Tag, Modell und Analyse "
+                    "(nur vollständige Analysen ohne Cache-Treffer)."
+                )
+                with gr.Row():
+                    stats_period = gr.Dropdown(
+                        list(STATISTICS_PERIODS),
+                        value="Letzte 30 Tage",
+                        label="Zeitraum",
+                    )
+                    stats_btn = gr.Button("Aktualisieren", variant="secondary")
+                stats_table = gr.Dataframe(
+                    headers=[
+                        "Tag",
+                        "Modell",
+                        "Analyse",
+                        "Anzahl",
+                        "p50 (s)",
+                        "p95 (s)",
+                        "Ø Prefill (s)",
+                        "Tokens/s",
+                    ],
+                    interactive=False,
+                )
+
+            with gr.Tab("🗂️ Verlauf") as history_tab:
+                gr.Markdown(
+                    "Frühere Analysen durchsuchen: nach Stichwörtern (Volltext in Frage und Antwort) "
+                    "oder nach Bedeutung (semantische Suche über die Antworten). "
+                    "Ein Klick auf eine Zeile oder ein Vorschaubild zeigt Bild und vollständige Antwort."
+                )
+                with gr.Row():
+                    history_query = gr.Textbox(
+                        label="Suche", placeholder="z.B. Rechnung Betrag", scale=3
+                    )
+                    history_mode = gr.Radio(
+                        ["Stichwörter", "Bedeutung"],
+                        value="Stichwörter",
+                        label="Suchart",
+                        info="Bedeutung: ähnliche Antworten, z.B. 'Bilder mit Korrosion'",
+                    )
+                    history_model = gr.Dropdown(["Alle"], value="Alle", label="Modell")
+                    history_action = gr.Dropdown(
+                        list(HISTORY_ACTIONS), value="Alle", label="Analyse"
+                    )
+                    history_from = gr.Textbox(label="Von", placeholder="JJJJ-MM-TT")
+                    history_to = gr.Textbox(label="Bis", placeholder="JJJJ-MM-TT")
+                with gr.Row():
+                    history_btn = gr.Button("Suchen", variant="primary")
+                    history_newer = gr.Button("◀ Neuere", variant="secondary")
+                    history_older = gr.Button("Ältere ▶", variant="secondary")
+                history_status = gr.Markdown()
+                history_table = gr.Dataframe(
+                    headers=["Zeit", "Modell", "Analyse", "Frage", "Antwort"],
+                    datatype=["str", "str", "str", "str", "markdown"],  # Treffer fett
+                    interactive=False,
+                    wrap=True,
+                )
+                history_gallery = gr.Gallery(
+                    label="Vorschau", columns=10, height="auto", allow_preview=False
+                )
+                with gr.Row():
+                    history_image = gr.Image(
+                        label="Bild", type="pil", interactive=False
+                    )
+                    history_detail = gr.Markdown()
+                # Keyset-Cursor je besuchter Seite (None = neueste) und Zeilen der aktuellen Seite
+                history_state = gr.State({"cursors": [None], "rows": [], "more": False})
+
+        def start_batch(zip_path, folder, labels, workers, progress=gr.Progress()):
+            source = zip_path or (folder or "").strip()
+            if not source or not os.path.exists(source):
+                return (
+                    "⚠️ Bitte ein ZIP hochladen oder einen vorhandenen Ordner angeben.",
+                    None,
+                )
+            if not labels:
+                return "⚠️ Bitte mindestens eine Analyse auswählen.", None
+            prompts = {
+                QUICK_ACTIONS[QUICK_ACTION_BUTTONS[label]]: QUICK_ACTION_BUTTONS[label]
+                for label in labels
+            }
+
+            def report_progress(done, total, name):
+                if total:
+                    progress((done, total), desc=name or "Batch-Analyse")
+
+            summary = run_batch(source, prompts, int(workers), report_progress)
+            status = (
+                f"**Job {summary.job_id}:** {summary.done} erledigt, "
+                f"{summary.failed} fehlgeschlagen, {summary.skipped} aus früherem Lauf "
+                f"übernommen (gesamt {summary.total})."
+            )
+            return status, [list(row) for row in summary.results]
+
+        batch_btn.click(
+            fn=start_batch,
+            inputs=[batch_zip, batch_folder, batch_actions, batch_workers],
+            outputs=[batch_status, batch_results],
+        )
+
+        def load_statistics(period):
+            days = STATISTICS_PERIODS[period]
+            since = (
+                (datetime.now() - timedelta(days=days)).date().isoformat()
+                if days
+                else None
+            )
+
+            def seconds(ms):
+                return round(ms / 1000, 2) if ms is not None else None
+
+            return [
+                [
+                    day,
+                    model,
+                    action,
+                    n,
+                    seconds(p50),
+                    seconds(p95),
+                    seconds(prefill),
+                    tps and round(tps, 1),
+                ]
+                for day, model, action, n, p50, p95, prefill, tps in timing_statistics(
+                    get_db().connection(), since
+                )
+            ]
+
+        stats_btn.click(load_statistics, inputs=stats_period, outputs=stats_table)
+        stats_period.change(load_statistics, inputs=stats_period, outputs=stats_table)
+        stats_tab.select(load_statistics, inputs=stats_period, outputs=stats_table)
+
+        history_filters = [
+            history_query,
+            history_mode,
+            history_model,
+            history_action,
+            history_from,
+            history_to,
+        ]
+
+        def load_history(query, mode, model, action, date_from, date_to, cursors):
+            filters = (
+                None if model == "Alle" else model,
+                HISTORY_ACTIONS[action],
+                (date_from or "").strip(),
+                (date_to or "").strip(),
+            )
+            semantic = mode == "Bedeutung" and bool((query or "").strip())
+            empty = {"cursors": [None], "rows": [], "more": False}
+            try:
+                if semantic:
+                    # Ähnlichkeit vor den Ausschnitt; eine Seite, ähnlichste zuerst
+                    rows = [
+                        (*row[:6], f"({row[8]:.2f}) {row[6]}", row[7])
+                        for row in semantic_search(query, *filters)
+                    ]
+                    cursors = [None]
+                else:
+                    rows = search_history(
+                        query,
+                        *filters,
+                        cursors[-1],
+                        HISTORY_PAGE_SIZE
+                        + 1,  # eine Zeile mehr: gibt es ältere Treffer?
+                    )
+            except ValueError:
+                return "⚠️ Datum bitte als JJJJ-MM-TT angeben.", None, empty, []
+            except requests.exceptions.RequestException as e:
+                return (
+                    f"⚠️ Semantische Suche nicht möglich (ist das Embedding-Modell "
+                    f"{EMBED_MODEL} in Ollama installiert?): {e}",
+                    None,
+                    empty,
+                    [],
+                )
+            more = len(rows) > HISTORY_PAGE_SIZE
+            rows = rows[:HISTORY_PAGE_SIZE]
+            if not rows:
+                status = "Keine Treffer."
+            elif semantic:
+                status = (
+                    f"{len(rows)} inhaltlich passende Antworten, ähnlichste zuerst "
+                    f"({len(get_embedding_indexer().index)} Antworten eingebettet)."
+                )
+            else:
+                status = f"Seite {len(cursors)}: {len(rows)} Treffer" + (
+                    ", weitere ältere vorhanden" if more else ""
+                )
+            table = [
+                [timestamp[:16].replace("T", " "), model, action, prompt, excerpt]
+                for _, _, timestamp, model, action, prompt, excerpt, _ in rows
+            ]
+            state = {
+                "cursors": cursors,
+                "rows": [(row[0], row[2], row[7]) for row in rows],
+                "more": more,
+            }
+            # Vorschaubilder kommen im Folgeschritt, die Tabelle steht sofort
+            return status, table, state, []
+
+        def search_history_first(*filters):
+            return load_history(*filters, [None])
+
+        def history_page_older(*args):
+            *filters, state = args
+            cursors = state["cursors"]
+            if state["more"]:
+                cursors = cursors + [state["rows"][-1][0]]
+            return load_history(*filters, cursors)
+
+        def history_page_newer(*args):
+            *filters, state = args
+            return load_history(*filters, state["cursors"][:-1] or [None])
+
+        def load_thumbnails(state):
+            thumbnails = []
+            for _, timestamp, sha256 in state["rows"]:
+                try:
+                    thumbnail = history_thumbnail(sha256) if sha256 else None
+                except OSError:  # beschädigtes Bild: ohne Vorschau anzeigen
+                    thumbnail = None
+                if thumbnail is not None:
+                    thumbnails.append((thumbnail, timestamp[:16].replace("T", " ")))
+            return thumbnails
+
+        def history_entry(row_id):
+            row = load_interaction(get_db().connection(), row_id)
+            if row is None:
+                return None, "Eintrag nicht mehr vorhanden."
+            timestamp, model, action, prompt, response, image_bytes = row
+            image = PILImage.open(io.BytesIO(image_bytes)) if image_bytes else None
+            detail = (
+                f"**{timestamp[:19].replace('T', ' ')} · {model} · {action or 'custom'}**\n\n"
+                f"**Frage:** {prompt}\n\n{response}"
+            )
+            return image, detail
+
+        def show_history_row(state, evt: gr.SelectData):
+            index = evt.index[0]
+            if index >= len(state["rows"]):
+                return None, ""
+            return history_entry(state["rows"][index][0])
+
+        def show_history_thumbnail(state, evt: gr.SelectData):
+            # Die Galerie enthält nur Zeilen mit Bild: Index auf die Trefferliste abbilden
+            with_image = [row[0] for row in state["rows"] if row[2]]
+            if evt.index >= len(with_image):
+                return None, ""
+            return history_entry(with_image[evt.index])
+
+        def refresh_history_models():
+            return gr.update(choices=["Alle", *distinct_models(get_db().connection())])
+
+        history_outputs = [
+            history_status,
+            history_table,
+            history_state,
+            history_gallery,
+        ]
+        for trigger, handler, inputs in (
+            (history_btn.click, search_history_first, history_filters),
+            (history_query.submit, search_history_first, history_filters),
+            (
+                history_older.click,
+                history_page_older,
+                [*history_filters, history_state],
+            ),
+            (
+                history_newer.click,
+                history_page_newer,
+                [*history_filters, history_state],
+            ),
+        ):
+            trigger(handler, inputs=inputs, outputs=history_outputs).then(
+                load_thumbnails, inputs=history_state, outputs=history_gallery
+            )
+        history_tab.select(refresh_history_models, outputs=history_model).then(
+            search_history_first, inputs=history_filters, outputs=history_outputs
+        ).then(load_thumbnails, inputs=history_state, outputs=history_gallery)
+        history_table.select(
+            show_history_row,
+            inputs=history_state,
+            outputs=[history_image, history_detail],
+        )
+        history_gallery.select(
+            show_history_thumbnail,
+            inputs=history_state,
+            outputs=[history_image, history_detail],
+        )
+
+        # --- Service-Status: Steuerelemente sperren/freigeben, sobald sich Ollama ändert ---
+        # Nur bei einem Wechsel des Zustands (je Browser-Sitzung), sonst würde
+        # der Timer die während einer laufenden Analyse gesperrten Buttons freigeben
+        service_ok_state = gr.State(None)
+        service_controls = [
+            submit_button,
+            btn_detail,
+            btn_list,
+            btn_ocr,
+            btn_quality,
+            btn_all,
+            batch_btn,
+        ]
+
+        def refresh_service_status(was_ok):
+            ok, error = check_ollama_service()
+            controls = gr.update(interactive=ok) if ok != was_ok else gr.update()
+            return [
+                ok,
+                gr.update(
+                    value=service_status_markdown(error) if error else "",
+                    visible=not ok,
+                ),
+                *[controls for _ in service_controls],
+            ]
+
+        service_outputs = [service_ok_state, service_status, *service_controls]
+        demo.load(
+            refresh_service_status, inputs=service_ok_state, outputs=service_outputs
+        )
+        service_timer.tick(
+            refresh_service_status,
+            inputs=service_ok_state,
+            outputs=service_outputs,
+            show_progress="hidden",
+        )
+
+        # --- Automatisches Scrollen & Fokus per JS ---
+        gr.HTML(
+            """
+        <script>
+        function scrollChatToBottom() {
+            const chat = document.querySelector('#chatbot-area .wrap, #chatbot-area .gradio-chatbot');
+            if (chat) { chat.scrollTop = chat.scrollHeight; }
+        }
+        function focusInput() {
+            const input = document.querySelector('#main-question-input textarea');
+            if (input) { input.focus(); }
+        }
+        // Nach jedem Update scrollen und Fokus setzen
+        new MutationObserver(() => { scrollChatToBottom(); focusInput(); }).observe(document.body, {childList:true,subtree:true});
+        </script>
+        """
+        )
+
+    # Gradio-Queue: Handler dürfen parallel laufen, die Reihenfolge am Backend regelt der Scheduler
+    demo.queue(default_concurrency_limit=UI_CONCURRENCY_LIMIT)
+    return demo